@@ -0,0 +1,174 @@
+"""
+Side-by-side HTTP load test of the sync (threadpool) and async (DB_ASYNC=true) database paths.
+
+Builds one synthetic population (see pulse_sweep), then for each mode starts a
+real uvicorn server on it and drives it with a fixed number of concurrent clients
+for a fixed time. The request mix is what the dashboard and the magic-link wave
+send: status/settings polls, estate list reads, Guardian Portal views and
+one-click check-ins. Reports throughput, latency percentiles and errors per mode
+and concurrency level as JSON.
+
+    python -m backend.benchmarks.api_load --users 2000 --concurrency 16 64 256 --seconds 15
+    python -m backend.benchmarks.api_load --database-url postgresql://... --concurrency 64 256
+
+Run it from the repository root after the frontend build (main.py serves frontend/dist).
+Against SQLite the database itself is the ceiling; the difference between the modes
+shows best on Postgres, where each query is a network round trip.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+import httpx
+from backend.benchmarks.pulse_sweep import build_population, TIER_DELAYS
+
+MODES = {"sync": "false", "async": "true"}
+CONTACTS_PER_USER = len(TIER_DELAYS)
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def request_mix(users: int, rng: random.Random):
+    """Yields (method, path, params) forever: ~80% reads, ~20% check-ins."""
+    while True:
+        user_id = rng.randint(1, users)
+        roll = rng.random()
+        if roll < 0.35:
+            yield "GET", "/api/pulse/status", {"user_id": user_id}
+        elif roll < 0.50:
+            yield "GET", "/api/pulse/settings", {"user_id": user_id}
+        elif roll < 0.65:
+            yield "GET", "/api/data/assets", {"user_id": user_id}
+        elif roll < 0.80:
+            contact_id = (user_id - 1) * CONTACTS_PER_USER + rng.randint(1, CONTACTS_PER_USER)
+            yield "GET", f"/api/pulse/portal/bench-portal-{contact_id}", {}
+        else:
+            yield "GET", f"/api/pulse/verify/bench-checkin-{user_id}", {}
+
+async def drive(base_url: str, users: int, concurrency: int, seconds: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    mix = request_mix(users, rng)
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    deadline = time.perf_counter() + seconds
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        async def worker():
+            while time.perf_counter() < deadline:
+                method, path, params = next(mix)
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, path, params=params)
+                    if response.status_code >= 500:
+                        errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+                        continue
+                except httpx.HTTPError as e:
+                    errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    def percentile(p: float) -> Optional[float]:
+        return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 2) if latencies else None
+
+    return {
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "errors": errors,
+    }
+
+def start_server(database_url: str, db_async: str, port: int, log_path: str) -> subprocess.Popen:
+    env = {**os.environ, "DATABASE_URL": database_url, "DB_ASYNC": db_async}
+    log = open(log_path, "w")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--timeout-keep-alive", "120"],
+        env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited during startup, see {log_path}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/api/health", timeout=1).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"Server did not become healthy, see {log_path}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--checkins-per-user", type=int, default=12)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--modes", nargs="+", choices=sorted(MODES), default=["sync", "async"])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", help="an already populated database (default: build a SQLite one)")
+    parser.add_argument("--output", help="write the JSON report here as well as stdout")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="api-load-")
+    database_url = args.database_url
+    if database_url is None:
+        db_path = os.path.join(workdir, "load.db")
+        print(f"🏗️ Building population of {args.users} users...", file=sys.stderr)
+        # Anchored at the real "now": the server's scheduler runs on the wall clock, and a
+        # population dated T0 would have every user overdue and escalating mid-benchmark
+        build_population(db_path, args.users, args.checkins_per_user, args.seed, t0=datetime.utcnow())
+        database_url = f"sqlite:///{db_path}"
+
+    report = {
+        "benchmark": "api_load",
+        "python": platform.python_version(),
+        "database": database_url.split("://")[0],
+        "users": args.users,
+        "seconds": args.seconds,
+        "results": []
+    }
+
+    try:
+        for mode in args.modes:
+            port = _free_port()
+            server = start_server(database_url, MODES[mode], port, os.path.join(workdir, f"{mode}.log"))
+            try:
+                for concurrency in args.concurrency:
+                    result = asyncio.run(drive(f"http://127.0.0.1:{port}", args.users, concurrency, args.seconds, args.seed))
+                    report["results"].append({"mode": mode, "concurrency": concurrency, **result})
+                    print(f"   {mode} x{concurrency}: {result['requests_per_second']} req/s, "
+                          f"p50 {result['p50_ms']}ms, p99 {result['p99_ms']}ms, errors {result['errors']}", file=sys.stderr)
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+if __name__ == "__main__":
+    main()
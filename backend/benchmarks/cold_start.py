@@ -0,0 +1,154 @@
+"""
+Cold-start budget: import-time profile and time to first response.
+
+    python -m backend.benchmarks.cold_start imports [--top 25]
+    python -m backend.benchmarks.cold_start check [--runs 5] [--budget-ms 2000]
+
+`imports` runs `python -X importtime -c "import backend.main"` in a fresh
+interpreter and reports the slowest modules (cumulative, i.e. including what
+they import) and the total per top-level package, so a new eager import shows up
+by name.
+
+`check` boots a real uvicorn server several times against an already-migrated
+SQLite database and measures, from process start: the first /api/health
+response, the first database-backed response, and /api/ready turning 200.
+Exits 1 if the median time to first response is over the budget
+(COLD_START_BUDGET_MS), which is how CI catches a cold-start regression.
+
+Run it from the repository root after the frontend build (main.py serves frontend/dist).
+"""
+import argparse
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from http.client import HTTPConnection
+from typing import Dict, List, Optional, Tuple
+
+BUDGET_MS = float(os.getenv("COLD_START_BUDGET_MS", "2000"))
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+def import_profile(target: str = "backend.main") -> List[Tuple[str, int, int, int]]:
+    """[(module, self_us, cumulative_us, depth)] in import order."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {target} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+def report_imports(top: int, target: str = "backend.main"):
+    rows = import_profile(target)
+    total = next((cumulative for module, _, cumulative, _ in rows if module == target), 0)
+    print(f"📦 import {target}: {total / 1000:.0f} ms, {len(rows)} modules\n")
+
+    print(f"{'cumulative':>11} {'self':>8}  module")
+    for module, self_us, cumulative_us, depth in sorted(rows, key=lambda r: -r[2])[:top]:
+        print(f"{cumulative_us / 1000:>9.1f}ms {self_us / 1000:>6.1f}ms  {'  ' * min(depth, 6)}{module}")
+
+    packages: Dict[str, int] = defaultdict(int)
+    for module, self_us, _, _ in rows:
+        packages[module.split(".")[0]] += self_us
+    print(f"\n{'self total':>11}  package")
+    for package, self_us in sorted(packages.items(), key=lambda p: -p[1])[:top]:
+        print(f"{self_us / 1000:>9.1f}ms  {package}")
+
+def _free_port() -> int:
+    import socket
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _wait_for(port: int, path: str, started: float, deadline: float) -> Optional[float]:
+    """Polls until `path` answers 200; returns ms since `started`. Kept cheap: it shares the CPU with the server."""
+    while time.perf_counter() < deadline:
+        connection = HTTPConnection("127.0.0.1", port, timeout=1)
+        try:
+            connection.request("GET", path)
+            if connection.getresponse().status == 200:
+                return (time.perf_counter() - started) * 1000
+        except OSError:
+            pass
+        finally:
+            connection.close()
+        time.sleep(0.01)
+    return None
+
+def boot_once(database_url: str, timeout: float = 60) -> Dict[str, Optional[float]]:
+    port = _free_port()
+    env = {**os.environ, "DATABASE_URL": database_url}
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = started + timeout
+        return {
+            "first_response_ms": _wait_for(port, "/api/health", started, deadline),
+            "first_db_response_ms": _wait_for(port, "/api/pulse/settings?user_id=1", started, deadline),
+            "ready_ms": _wait_for(port, "/api/ready", started, deadline),
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+def check(runs: int, budget_ms: float, database_url: Optional[str]) -> bool:
+    workdir = tempfile.mkdtemp(prefix="cold-start-")
+    try:
+        if database_url is None:
+            database_url = f"sqlite:///{os.path.join(workdir, 'cold.db')}"
+            # Migrate once up front: the budget is for a restart, not a first deploy
+            subprocess.run(
+                [sys.executable, "-c", "from backend.database import create_db_and_tables; import backend.main; create_db_and_tables()"],
+                env={**os.environ, "DATABASE_URL": database_url}, check=True, stdout=subprocess.DEVNULL
+            )
+
+        results = [boot_once(database_url) for _ in range(runs)]
+        summary = {}
+        for key in ("first_response_ms", "first_db_response_ms", "ready_ms"):
+            values = [r[key] for r in results if r[key] is not None]
+            summary[key] = statistics.median(values) if len(values) == runs else None
+            shown = f"{summary[key]:.0f} ms" if summary[key] is not None else "timed out"
+            print(f"   {key:<22} median {shown:>9}   runs: {', '.join(f'{v:.0f}' for v in values)}")
+
+        first = summary["first_response_ms"]
+        if first is None or first > budget_ms:
+            print(f"❌ Time to first response over budget ({budget_ms:.0f} ms)", file=sys.stderr)
+            return False
+        print(f"✅ Time to first response within budget ({budget_ms:.0f} ms)")
+        return True
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    imports_cmd = sub.add_parser("imports", help="import-time profile of backend.main")
+    imports_cmd.add_argument("--top", type=int, default=25)
+    imports_cmd.add_argument("--module", default="backend.main")
+    check_cmd = sub.add_parser("check", help="boot the server and enforce the time-to-first-response budget")
+    check_cmd.add_argument("--runs", type=int, default=5)
+    check_cmd.add_argument("--budget-ms", type=float, default=BUDGET_MS)
+    check_cmd.add_argument("--database-url", help="an already migrated database (default: a fresh SQLite one)")
+    args = parser.parse_args()
+
+    if args.command == "imports":
+        report_imports(args.top, args.module)
+    else:
+        sys.exit(0 if check(args.runs, args.budget_ms, args.database_url) else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Micro-benchmark: alert email renders per second, before and after the template registry.
+
+"before" re-parses the HTML source with jinja2.Template on every render, as
+LocalEmailService.send_email used to; "after" renders the registry's compiled template.
+
+    python -m backend.benchmarks.email_render [--renders 5000] [--contacts 40]
+"""
+import argparse
+import json
+import time
+from jinja2 import Template
+from backend.email_templates import TEMPLATES, registry
+
+def contexts(count: int):
+    subject, body = registry.render_alert(4, "email", custom_message="Spare key is with Ann next door.")
+    return [
+        {
+            "subject": subject,
+            "recipient_name": f"Contact {i}",
+            "body_text": body,
+            "user_id": 1,
+            "action_url": f"http://localhost:5173/portal/token-{i}",
+            "action_label": "Open Guardian Portal"
+        }
+        for i in range(count)
+    ]
+
+def rate(fn, renders: int) -> float:
+    start = time.perf_counter()
+    fn(renders)
+    return renders / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--renders", type=int, default=5000)
+    parser.add_argument("--contacts", type=int, default=40, help="fan-out size for render_many")
+    args = parser.parse_args()
+    if args.contacts < 1:
+        parser.error("--contacts must be at least 1")
+    if args.renders < args.contacts:
+        parser.error("--renders must be at least --contacts")
+
+    source = TEMPLATES["email.html"]
+    fan_out = contexts(args.contacts)
+
+    def before(n):
+        for i in range(n):
+            Template(source).render(**fan_out[i % len(fan_out)])
+
+    def after(n):
+        template = registry.get("email.html")
+        for i in range(n):
+            template.render(**fan_out[i % len(fan_out)])
+
+    def after_bulk(n):
+        for _ in range(n // len(fan_out)):
+            registry.render_many("email.html", fan_out)
+
+    registry.get("email.html")  # compile outside the timed region, as at process start
+    report = {
+        "renders": args.renders,
+        "before_renders_per_sec": round(rate(before, args.renders)),
+        "after_renders_per_sec": round(rate(after, args.renders)),
+        "after_render_many_per_sec": round(rate(after_bulk, args.renders - args.renders % len(fan_out))),
+    }
+    report["speedup"] = round(report["after_renders_per_sec"] / report["before_renders_per_sec"], 1)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
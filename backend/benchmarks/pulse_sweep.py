@@ -0,0 +1,256 @@
+"""
+Synthetic-population benchmark for the pulse escalation sweep.
+
+Builds SQLite databases of N users with realistic check-in histories, tier
+definitions, contacts and escalation logs, then runs sweeps under a frozen clock
+(plus token lookups for the public portal/magic-link endpoints) and reports wall
+time, SQL statements and peak Python memory per scenario as JSON.
+
+    python -m backend.benchmarks.pulse_sweep --users 1000 10000 100000 --output bench.json
+    python -m backend.benchmarks.pulse_sweep --users 10000 --baseline bench.json
+
+With --baseline the run exits non-zero if any metric regressed by more than --tolerance.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+from sqlalchemy import func, insert
+from sqlmodel import Session, SQLModel, create_engine, select
+from backend import clock, metrics
+from backend.database import User
+from backend.pulse_logic import backfill_next_due, check_and_escalate_all
+from backend.pulse_state import rebuild as rebuild_pulse_state
+from backend.token_cache import checkin_tokens, portal_tokens, resolve_checkin_token, resolve_portal_token
+from backend.pulse_models import (
+    PulseSettings, PulseCheckin, PulseEscalationTier,
+    PulseContact, PulseEscalationLog
+)
+
+# Fixed "now" for every run so results are comparable between releases
+T0 = datetime(2025, 1, 15, 9, 0, 0)
+TIER_DELAYS = {1: 0, 2: 6, 3: 12, 4: 24}
+INSERT_CHUNK = 10_000
+
+def build_population(db_path: str, users: int, checkins_per_user: int, seed: int, t0: datetime = T0):
+    """
+    ~85% healthy, ~5% in their grace period, ~5% freshly overdue and ~5% mid-outage
+    (already escalated to tier 1-3), mirroring what production sweeps see.
+    Histories are relative to `t0`.
+    """
+    rng = random.Random(seed)
+    engine = create_engine(f"sqlite:///{db_path}")
+    SQLModel.metadata.create_all(engine)
+
+    rows: Dict[type, List[dict]] = {m: [] for m in (User, PulseSettings, PulseEscalationTier, PulseContact, PulseCheckin, PulseEscalationLog)}
+    tier_id = contact_id = 0
+
+    with Session(engine) as session:
+        def flush(force: bool = False):
+            for model, pending in rows.items():
+                if pending and (force or len(pending) >= INSERT_CHUNK):
+                    session.execute(insert(model.__table__), pending)
+                    pending.clear()
+
+        for user_id in range(1, users + 1):
+            frequency_days = rng.choice([1, 2, 3, 7])
+            grace_hours = rng.choice([12, 24, 48])
+            period = timedelta(days=frequency_days)
+            hard = period + timedelta(hours=grace_hours)
+
+            profile = rng.random()
+            if profile < 0.85:
+                last_checkin = t0 - rng.uniform(0, 0.95) * period
+            elif profile < 0.90:
+                last_checkin = t0 - period - rng.uniform(0.05, 0.95) * timedelta(hours=grace_hours)
+            else:
+                last_checkin = t0 - hard - timedelta(hours=rng.uniform(0.5, 36))
+
+            rows[User].append({"id": user_id, "external_id": f"bench-{user_id}", "email": f"bench{user_id}@example.com", "public_key": "PK_BENCH", "sign_count": 0, "created_at": t0})
+            rows[PulseSettings].append({"user_id": user_id, "enabled": True, "frequency_days": frequency_days, "grace_period_hours": grace_hours, "checkin_token": f"bench-checkin-{user_id}"})
+
+            for tier_number, delay in TIER_DELAYS.items():
+                tier_id += 1
+                contact_id += 1
+                rows[PulseEscalationTier].append({"id": tier_id, "user_id": user_id, "tier_number": tier_number, "delay_hours": delay, "notification_method": "email"})
+                rows[PulseContact].append({"id": contact_id, "user_id": user_id, "name": f"Contact {contact_id}", "role": "Family", "email": f"c{contact_id}@example.com", "tier_id": tier_id, "priority": 1, "portal_token": f"bench-portal-{contact_id}", "can_view_history": True, "notify_on_safety_timer": True})
+
+            for i in range(checkins_per_user):
+                rows[PulseCheckin].append({"user_id": user_id, "timestamp": last_checkin - i * period, "method": rng.choice(["manual", "biometric", "magic_link"])})
+
+            if profile >= 0.95:
+                # Mid-outage: tiers 1..k already fired after the hard deadline
+                fired_at = last_checkin + hard
+                for tier_number in range(1, rng.randint(1, 3) + 1):
+                    fired_at += timedelta(hours=TIER_DELAYS[tier_number])
+                    if fired_at >= t0:
+                        break
+                    rows[PulseEscalationLog].append({"user_id": user_id, "tier_number": tier_number, "triggered_at": fired_at, "medical_safe_pass_triggered": False})
+
+            flush()
+        flush(force=True)
+        session.commit()
+
+        with clock.frozen(t0):
+            # Bulk inserts bypass the write path, so derive the projection the way a migration would
+            rebuild_pulse_state(session)
+            backfill_next_due(session)
+            session.commit()
+    engine.dispose()
+
+def run_measured(db_path: str, work: Callable[[Session], None]) -> dict:
+    """
+    Runs `work` twice on identical copies of the database: once for wall time and
+    statement count, once under tracemalloc (which would distort the timing).
+    """
+    traced_path = db_path + ".traced"
+    shutil.copyfile(db_path, traced_path)
+    result = {}
+
+    for path, traced in ((db_path, False), (traced_path, True)):
+        engine = create_engine(f"sqlite:///{path}")
+        metrics.instrument_engine(engine)
+        with Session(engine) as session, open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            logs_before = session.exec(select(func.count(PulseEscalationLog.id))).one()
+            scanned_before = metrics.USERS_SCANNED.value()
+            statements_before = metrics.statements_issued()
+            if traced:
+                tracemalloc.start()
+            started = time.perf_counter()
+            work(session)
+            elapsed = time.perf_counter() - started
+            if traced:
+                result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            else:
+                result["wall_seconds"] = round(elapsed, 4)
+                result["statements"] = metrics.statements_issued() - statements_before
+                result["users_scanned"] = int(metrics.USERS_SCANNED.value() - scanned_before)
+                result["escalations"] = session.exec(select(func.count(PulseEscalationLog.id))).one() - logs_before
+        engine.dispose()
+
+    os.remove(traced_path)
+    return result
+
+def sweep_scenarios(db_path: str) -> List[dict]:
+    results = []
+    with clock.frozen(T0) as frozen_clock:
+        # First sweep after the population was built: every overdue user is due
+        results.append({"scenario": "sweep_initial", **run_measured(db_path, check_and_escalate_all)})
+        # The next scheduler tick: almost nobody is due, should cost next to nothing
+        frozen_clock.advance(minutes=1)
+        results.append({"scenario": "sweep_steady", **run_measured(db_path, check_and_escalate_all)})
+        # Six hours on, tier 2 delays have elapsed for the users escalated at T0
+        frozen_clock.advance(hours=6)
+        results.append({"scenario": "sweep_tier_followup", **run_measured(db_path, check_and_escalate_all)})
+    return results
+
+def token_scenarios(db_path: str, lookups: int = 2000) -> List[dict]:
+    """Public-endpoint token resolution (portal + magic link), with a cold and then a warm token cache."""
+    engine = create_engine(f"sqlite:///{db_path}")
+    with Session(engine) as session:
+        users = session.exec(select(func.count(PulseSettings.user_id))).one()
+    engine.dispose()
+
+    rng = random.Random(lookups)
+    tokens = [
+        (resolve_portal_token, f"bench-portal-{rng.randint(1, users * len(TIER_DELAYS))}") if i % 2 else
+        (resolve_checkin_token, f"bench-checkin-{rng.randint(1, users)}")
+        for i in range(lookups)
+    ]
+
+    def resolve_all(session: Session):
+        for resolve, token in tokens:
+            if resolve(session, token) is None:
+                raise RuntimeError(f"token {token} did not resolve")
+
+    def resolve_cold(session: Session):
+        portal_tokens.clear()
+        checkin_tokens.clear()
+        resolve_all(session)
+
+    return [
+        {"scenario": "token_lookup_cold", **run_measured(db_path, resolve_cold)},
+        # The cold run above left every token cached
+        {"scenario": "token_lookup_warm", **run_measured(db_path, resolve_all)},
+    ]
+
+SCENARIOS = [sweep_scenarios, token_scenarios]
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Lists every (users, scenario, metric) that got worse than baseline by more than `tolerance`."""
+    previous = {(r["users"], r["scenario"]): r for r in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        before = previous.get((result["users"], result["scenario"]))
+        if not before:
+            continue
+        for key in ("wall_seconds", "statements", "peak_memory_bytes"):
+            if key in before and before[key] and result[key] > before[key] * (1 + tolerance):
+                regressions.append(f"{result['scenario']} @ {result['users']} users: {key} {before[key]} -> {result[key]}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--checkins-per-user", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", help="where to build the databases (default: a temp dir)")
+    parser.add_argument("--output", help="write the JSON report here as well as stdout")
+    parser.add_argument("--baseline", help="previous report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="pulse-bench-")
+    report = {
+        "benchmark": "pulse_sweep",
+        "t0": T0.isoformat(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "checkins_per_user": args.checkins_per_user,
+        "seed": args.seed,
+        "results": []
+    }
+
+    for users in args.users:
+        db_path = os.path.join(workdir, f"pulse_{users}.db")
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        print(f"🏗️ Building population of {users} users...", file=sys.stderr)
+        started = time.perf_counter()
+        build_population(db_path, users, args.checkins_per_user, args.seed)
+        print(f"   built in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+        for scenario in SCENARIOS:
+            for result in scenario(db_path):
+                report["results"].append({"users": users, **result})
+                print(f"   {result['scenario']}: {result['wall_seconds']}s, {result['statements']} statements", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+    if args.workdir is None:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"❌ Regression: {line}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
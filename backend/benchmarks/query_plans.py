@@ -0,0 +1,290 @@
+"""
+Query-plan regression check: fails if any query the app issues does a full table scan.
+
+Builds a small synthetic population in SQLite, drives every router endpoint
+through a TestClient and runs the background jobs (sweep, outbox dispatch,
+safety timers, group commit, projection rebuild) while recording each SQL
+statement. Then it runs EXPLAIN QUERY PLAN on every distinct statement, with
+the parameters it was issued with, and reports any "SCAN <table>" step on a real
+table. An index-ordered full scan counts as a scan too.
+
+    python -m backend.benchmarks.query_plans            # exit 1 on any unexpected scan
+    python -m backend.benchmarks.query_plans --verbose  # print every plan
+
+Statements that scan on purpose (whole-table maintenance jobs) are listed in
+EXPECTED_SCANS with the reason.
+"""
+import argparse
+import hashlib
+import os
+import re
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+# A vault chunk for the estate_sync calls
+CHUNK = b"bench vault chunk"
+CHUNK_HASH = hashlib.sha256(CHUNK).hexdigest()
+
+# Whole-table work where a scan is the right plan. Keyed by (scenario, table).
+EXPECTED_SCANS = {
+    ("pulse_state_rebuild", "pulse_settings"): "rebuild recomputes every user with history",
+    ("pulse_state_rebuild", "pulse_checkins"): "rebuild recomputes every user with history",
+    ("pulse_state_rebuild", "pulse_escalation_log"): "rebuild recomputes every user with history",
+    ("pulse_state_rebuild", "pulse_state"): "rebuild lists the existing projection rows",
+    ("backfill_next_due", "pulse_settings"): "backfill recomputes every user's next_due_at",
+    ("backfill_next_due", "pulse_escalation_tiers"): "backfill reads every user's tier ladder",
+    ("safety_timer_sync", "pulse_safety_timers"): "engine start-up loads every active timer once",
+    ("blob_gc", "estate_vault_chunks"): "garbage collection reads every referenced chunk",
+    ("blob_gc", "pulse_vault"): "garbage collection reads every vault item's manifest",
+}
+
+SKIPPED_PREFIXES = ("PRAGMA", "SAVEPOINT", "RELEASE", "ROLLBACK", "BEGIN", "COMMIT", "CREATE", "ALTER", "DROP")
+SCAN = re.compile(r"^SCAN (\w+)")
+
+def seed_extras(engine, users: int):
+    """Rows build_population doesn't create: estate items, messages, vault, an expired timer."""
+    from sqlalchemy import insert
+    from sqlmodel import Session
+    from backend.database import Estate
+    from backend.routers.estate_data import MODEL_MAP
+    from backend.pulse_models import PulseMessage, PulseVault, PulseSafetyTimer
+    from backend.bulk_import import _validate
+
+    samples = {
+        "assets": {"name": "House"}, "financial_accounts": {"institution": "Bank", "account_type": "checking"},
+        "vendors": {"name": "Plumber", "category": "plumbing"}, "home_access": {"location": "Front door", "code_encrypted": "x"},
+        "utilities": {"provider": "Water Co", "service_type": "water"}, "documents": {"title": "Will", "category": "will"},
+        "letters": {"title": "To Sam", "content": "..."}, "journal_entries": {"title": "Day 1", "content": "..."},
+        "subscriptions": {"name": "News"}, "calendar_events": {"title": "Taxes", "date": "2025-04-15T00:00:00"},
+    }
+    with Session(engine) as session:
+        for user_id in range(1, users + 1):
+            session.add(Estate(user_id=user_id))
+            for name, model in MODEL_MAP.items():
+                valid, _ = _validate(model, user_id, [samples[name]] * 3, ())
+                session.execute(insert(model.__table__), [values for _, values, _ in valid])
+            contact_id = (user_id - 1) * 4 + 1
+            session.execute(insert(PulseMessage.__table__), [
+                {"user_id": user_id, "contact_id": contact_id, "direction": "user_to_contact", "message": f"m{i}", "sent_at": datetime.utcnow() - timedelta(hours=i)}
+                for i in range(5)
+            ])
+            session.add(PulseVault(user_id=user_id, name="Safe", encrypted_content=b"\x00", unlock_condition="tier_4_escalation"))
+        session.add(PulseSafetyTimer(user_id=2, expires_at=datetime.utcnow() - timedelta(minutes=1)))
+        session.commit()
+
+def api_calls() -> List[Tuple[str, str, str, dict]]:
+    """(scenario, method, path, request kwargs) for every router endpoint."""
+    calls = [
+        ("pulse", "POST", "/api/pulse/checkin", {"params": {"user_id": 1}}),
+        ("pulse", "GET", "/api/pulse/status", {"params": {"user_id": 1}}),
+        ("pulse", "GET", "/api/pulse/settings", {"params": {"user_id": 1}}),
+        ("pulse", "POST", "/api/pulse/settings", {"params": {"user_id": 1}, "json": {"user_id": 1, "frequency_days": 3}}),
+        ("pulse", "GET", "/api/pulse/history", {"params": {"user_id": 1}}),
+        ("pulse", "GET", "/api/pulse/history", {"params": {"user_id": 1, "page_size": 2}}),
+        ("pulse", "GET", "/api/pulse/contacts", {"params": {"user_id": 1, "page_size": 2}}),
+        ("pulse", "POST", "/api/pulse/contacts", {"params": {"user_id": 1}, "json": {"user_id": 1, "name": "New"}}),
+        ("pulse", "PUT", "/api/pulse/contacts/2", {"params": {"user_id": 1}, "json": {"user_id": 1, "name": "Renamed"}}),
+        ("pulse", "GET", "/api/pulse/portal/bench-portal-1", {}),
+        ("pulse", "POST", "/api/pulse/respond/bench-portal-1", {"params": {"action": "snooze"}}),
+        ("pulse", "GET", "/api/pulse/messages", {"params": {"user_id": 1}}),
+        ("pulse", "GET", "/api/pulse/messages", {"params": {"user_id": 1, "page_size": 2}}),
+        ("pulse", "POST", "/api/pulse/messages", {"params": {"user_id": 1, "contact_id": 1, "message": "hi"}}),
+        ("pulse", "GET", "/api/pulse/vault", {"params": {"user_id": 1}}),
+        ("pulse", "DELETE", "/api/pulse/vault/1", {"params": {"user_id": 1}}),
+        ("pulse", "POST", "/api/pulse/nudge", {"params": {"contact_id": 1}}),
+        ("pulse", "POST", "/api/pulse/confirm/bench-portal-1", {}),
+        ("pulse", "POST", "/api/pulse/safety/start", {"params": {"user_id": 1, "minutes": 30}}),
+        ("pulse", "GET", "/api/pulse/safety/status", {"params": {"user_id": 1}}),
+        ("pulse", "POST", "/api/pulse/safety/cancel", {"params": {"user_id": 1}}),
+        ("pulse", "GET", "/api/pulse/verify/bench-checkin-1", {}),
+        ("pulse", "GET", "/api/pulse/tiers", {"params": {"user_id": 1}}),
+        ("pulse", "GET", "/api/pulse/tiers", {"params": {"user_id": 999}}),
+        ("pulse", "PUT", "/api/pulse/tiers/1", {"params": {"user_id": 1}, "json": {"user_id": 1, "tier_number": 1, "delay_hours": 2}}),
+        ("pulse", "DELETE", "/api/pulse/contacts/3", {"params": {"user_id": 1}}),
+        ("contacts", "GET", "/api/contacts/", {"params": {"user_id": 1}}),
+        ("contacts", "GET", "/api/contacts/", {"params": {"user_id": 1, "page_size": 2}}),
+        ("contacts", "POST", "/api/contacts/", {"params": {"user_id": 1}, "json": {"user_id": 1, "name": "Other"}}),
+        ("contacts", "PUT", "/api/contacts/4", {"params": {"user_id": 1}, "json": {"user_id": 1, "name": "Renamed"}}),
+        ("contacts", "DELETE", "/api/contacts/4", {"params": {"user_id": 1}}),
+        ("estate_sync", "POST", "/api/estate/vault/chunks/missing", {"params": {"user_id": 1}, "json": [CHUNK_HASH]}),
+        ("estate_sync", "PUT", f"/api/estate/vault/chunks/{CHUNK_HASH}", {"params": {"user_id": 1}, "content": CHUNK}),
+        ("estate_sync", "GET", f"/api/estate/vault/chunks/{CHUNK_HASH}", {"params": {"user_id": 1}}),
+        ("estate_sync", "PATCH", "/api/estate", {"params": {"user_id": 1}, "json": {
+            "base_version": 0, "transparent_patch": [{"op": "add", "path": "/bench", "value": 1}], "vault_manifest": [CHUNK_HASH]
+        }}),
+        ("estate_sync", "PATCH", "/api/estate", {"params": {"user_id": 999}, "json": {"base_version": 0, "transparent_patch": []}}),
+        ("estate_sync", "PUT", "/api/estate/vault", {"params": {"user_id": 1, "base_version": 1}, "content": CHUNK * 3}),
+        ("estate_sync", "GET", "/api/estate/vault", {"params": {"user_id": 1}}),
+        ("pulse", "PUT", "/api/pulse/vault/1/content", {"params": {"user_id": 1}, "content": CHUNK}),
+        ("pulse", "GET", "/api/pulse/vault/1/content", {"params": {"user_id": 1}}),
+        ("export", "GET", "/api/export", {"params": {"user_id": 1}}),
+    ]
+    calls.append(("estate_data", "GET", "/api/data/summary", {"params": {"user_id": 1}}))
+    calls += [
+        ("search", "GET", "/api/search", {"params": {"user_id": 1, "q": "plumb"}}),
+        ("search", "GET", "/api/search", {"params": {"user_id": 1, "q": '"To Sam"', "type": ["letters", "vendors"], "page_size": 1}}),
+    ]
+    from backend.routers.estate_data import MODEL_MAP
+    for name in MODEL_MAP:
+        calls += [
+            ("estate_data", "GET", f"/api/data/{name}", {"params": {"user_id": 1}}),
+            ("estate_data", "GET", f"/api/data/{name}", {"params": {"user_id": 1, "page_size": 2}}),
+            ("estate_data", "POST", f"/api/data/{name}/bulk", {"params": {"user_id": 1, "upsert": True}, "content": "[]"}),
+        ]
+    return calls
+
+def collect(db_path: str, users: int) -> Dict[str, Tuple[str, object, set]]:
+    """Runs everything; returns {statement: (scenario, first parameters, scenarios)}."""
+    from sqlalchemy import event
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from sqlmodel import Session, select
+    from backend.database import engine, create_db_and_tables
+    from backend.pulse_models import PulseSafetyTimer
+    from backend.routers import pulse, contacts, estate_data, export, estate_sync, search
+    from backend.routers.estate_data import MODEL_MAP
+    from backend.benchmarks.pulse_sweep import build_population
+    from backend.bulk_import import NATURAL_KEYS
+
+    build_population(db_path, users, 6, 7, t0=datetime.utcnow())
+    create_db_and_tables()
+    seed_extras(engine, users)
+
+    statements: Dict[str, Tuple[str, object, set]] = {}
+    current = ["setup"]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(SKIPPED_PREFIXES):
+            return
+        if executemany and parameters and isinstance(parameters[0], (tuple, list, dict)):
+            parameters = parameters[0]
+        if statement in statements:
+            statements[statement][2].add(current[0])
+        else:
+            statements[statement] = (current[0], parameters, {current[0]})
+
+    app = FastAPI()
+    for module in (pulse, contacts, estate_data, export, estate_sync, search):
+        app.include_router(module.router)
+
+    with TestClient(app) as client:
+        for scenario, method, path, kwargs in api_calls():
+            current[0] = scenario
+            response = client.request(method, path, **kwargs)
+            if response.status_code >= 500:
+                raise RuntimeError(f"{method} {path} failed: {response.status_code} {response.text[:200]}")
+
+        # Item-level endpoints need real ids, and a bulk upsert that matches something
+        current[0] = "estate_data"
+        for name in MODEL_MAP:
+            existing = client.get(f"/api/data/{name}", params={"user_id": 1}).json()[0]
+            item_id = existing.pop("id")
+            client.post(f"/api/data/{name}", params={"user_id": 1}, json=existing)
+            # PUT applies the body as-is, so only send a text column
+            column = NATURAL_KEYS[name][0]
+            client.put(f"/api/data/{name}/{item_id}", params={"user_id": 1}, json={column: existing[column]})
+            client.post(f"/api/data/{name}/bulk", params={"user_id": 1, "upsert": True}, json=[existing])
+            client.delete(f"/api/data/{name}/{item_id}", params={"user_id": 1})
+
+    from backend.pulse_logic import check_and_escalate_all, backfill_next_due
+    from backend.notification_dispatcher import dispatch_ids, dispatch_pending
+    from backend.safety_timers import timer_engine
+    from backend.checkin_writer import checkin_writer
+    from backend.pulse_state import rebuild
+    from backend.vault_blobs import collect_garbage
+    from backend.compression import recompress
+    from backend.search import reindex
+    from concurrent.futures import Future
+
+    jobs = [
+        ("sweep", lambda session: check_and_escalate_all(session)),
+        ("dispatch", lambda session: dispatch_pending(session)),
+        ("dispatch", lambda session: dispatch_ids([1, 2, 3])),
+        ("backfill_next_due", lambda session: backfill_next_due(session)),
+        ("pulse_state_rebuild", lambda session: rebuild(session)),
+        ("pulse_state_rebuild", lambda session: rebuild(session, [1, 2])),
+        ("blob_gc", lambda session: collect_garbage(session)),
+        ("recompress", lambda session: recompress(engine, pause=0)),
+        ("search_rebuild", lambda session: reindex(session)),
+        ("search_rebuild", lambda session: reindex(session, ["letters"], 1)),
+    ]
+    for scenario, job in jobs:
+        current[0] = scenario
+        with Session(engine) as session:
+            job(session)
+            session.commit()
+
+    current[0] = "safety_timer_sync"
+    timer_engine.sync()
+    current[0] = "safety_timer_poll"
+    timer_engine.sync()
+    current[0] = "safety_timer_fire"
+    with Session(engine) as session:
+        timer_id = session.exec(select(PulseSafetyTimer.id).where(PulseSafetyTimer.user_id == 2)).first()
+    if timer_id:
+        timer_engine._fire(timer_id)
+
+    current[0] = "group_commit"
+    checkin_writer._flush([(user_id, "magic_link", None, Future()) for user_id in range(1, users + 1)])
+    event.remove(engine, "before_cursor_execute", record)
+    return statements
+
+def explain(engine, statement: str, parameters) -> List[str]:
+    # Straight to the DBAPI cursor: the parameters are already in driver form
+    connection = engine.raw_connection()
+    try:
+        rows = connection.cursor().execute("EXPLAIN QUERY PLAN " + statement, parameters or ()).fetchall()
+    finally:
+        connection.close()
+    return [row[-1] for row in rows]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--verbose", action="store_true", help="print the plan of every statement")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="query-plans-")
+    db_path = os.path.join(workdir, "plans.db")
+    # Configure the app's engine before anything imports backend.database
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["DB_ASYNC"] = "false"
+    cwd = os.getcwd()
+    os.chdir(workdir)  # the email outbox writes under ./backend/outbox
+
+    try:
+        from sqlmodel import SQLModel
+        from backend.database import engine
+        statements = collect(db_path, args.users)
+        tables = set(SQLModel.metadata.tables)
+
+        failures = 0
+        for statement, (scenario, parameters, scenarios) in statements.items():
+            plan = explain(engine, statement, parameters)
+            scans = []
+            for step in plan:
+                match = SCAN.match(step)
+                table = match.group(1) if match else None
+                # A subquery aliased like a table ("... ) AS users") shows up under that name
+                if table in tables and not re.search(rf"\)\s+AS\s+{table}\b", statement):
+                    if not any((s, table) in EXPECTED_SCANS for s in scenarios):
+                        scans.append(step)
+            one_line = " ".join(statement.split())
+            if scans:
+                failures += 1
+                print(f"❌ Full scan in {', '.join(sorted(scenarios))}: {'; '.join(scans)}\n   {one_line[:300]}", file=sys.stderr)
+            elif args.verbose:
+                print(f"✅ {', '.join(sorted(scenarios))}: {' | '.join(plan) or '(no plan)'}\n   {one_line[:300]}")
+
+        print(f"{len(statements)} distinct statements checked, {failures} with unexpected full scans", file=sys.stderr)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Content-addressed storage for client-encrypted vault data.
+
+A blob is an opaque byte string named by its sha256, so storing the same bytes
+twice keeps a single copy. The database only holds manifests, the ordered list
+of blob hashes that make up a vault (see backend/vault_blobs.py).
+
+BlobStore is the interface. LocalBlobStore keeps each blob as a file under
+BLOB_STORE_PATH, fanned out by hash prefix (ab/cd/abcd...). Another backend
+(an object store, say) implements the same methods and is picked with BLOB_STORE.
+"""
+import hashlib
+import mmap
+import os
+import re
+import tempfile
+from typing import Iterator, Optional, Tuple
+
+BLOB_STORE = os.getenv("BLOB_STORE", "local")
+BLOB_STORE_PATH = os.getenv("BLOB_STORE_PATH", os.path.join("backend", "blobs"))
+# Bytes per slice when streaming a blob out
+READ_BYTES = 64 * 1024
+
+HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+class BlobWriter:
+    """An upload in progress: bytes are hashed as they are written, and commit() names the blob."""
+    def __init__(self):
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    @property
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+    def write(self, data: bytes):
+        self._hash.update(data)
+        self.size += len(data)
+
+    def commit(self) -> str:
+        """Stores the blob (or keeps the copy already stored) and returns its hash."""
+        raise NotImplementedError
+
+    def abort(self):
+        raise NotImplementedError
+
+class BlobStore:
+    def writer(self) -> BlobWriter:
+        raise NotImplementedError
+
+    def size(self, blob_hash: str) -> Optional[int]:
+        """Size in bytes, or None if the blob isn't stored."""
+        raise NotImplementedError
+
+    def read(self, blob_hash: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Yields bytes [start, end) of the blob in READ_BYTES slices."""
+        raise NotImplementedError
+
+    def delete(self, blob_hash: str):
+        raise NotImplementedError
+
+    def stored_at(self, blob_hash: str) -> Optional[float]:
+        """Unix time the blob was last stored (a dedup hit counts), or None if it isn't stored."""
+        raise NotImplementedError
+
+    def list(self) -> Iterator[Tuple[str, float]]:
+        """(hash, unix time it was last stored) for every blob; garbage collection uses the time."""
+        raise NotImplementedError
+
+    def discard_stale_uploads(self, older_than: float):
+        """Removes uploads abandoned before `older_than` (unix time)."""
+
+    def exists(self, blob_hash: str) -> bool:
+        return self.size(blob_hash) is not None
+
+    def put(self, data: bytes) -> str:
+        writer = self.writer()
+        writer.write(data)
+        return writer.commit()
+
+class LocalBlobWriter(BlobWriter):
+    def __init__(self, store: "LocalBlobStore"):
+        super().__init__()
+        self.store = store
+        os.makedirs(store.upload_dir, exist_ok=True)
+        self._file = tempfile.NamedTemporaryFile(dir=store.upload_dir, delete=False)
+
+    def write(self, data: bytes):
+        super().write(data)
+        self._file.write(data)
+
+    def commit(self) -> str:
+        blob_hash = self.hexdigest
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        target = self.store.path(blob_hash)
+        if os.path.exists(target):
+            # Already stored: keep that copy, but refresh its time so a garbage
+            # collection running right now doesn't take it away from this upload
+            os.utime(target)
+            os.unlink(self._file.name)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(self._file.name, target)
+        return blob_hash
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.unlink(self._file.name)
+        except FileNotFoundError:
+            pass
+
+class LocalBlobStore(BlobStore):
+    def __init__(self, root: str):
+        self.root = root
+        self.upload_dir = os.path.join(root, "uploads")
+
+    def path(self, blob_hash: str) -> str:
+        if not HASH_PATTERN.match(blob_hash):
+            raise ValueError(f"Invalid blob hash {blob_hash!r}")
+        return os.path.join(self.root, blob_hash[:2], blob_hash[2:4], blob_hash)
+
+    def writer(self) -> LocalBlobWriter:
+        return LocalBlobWriter(self)
+
+    def size(self, blob_hash: str) -> Optional[int]:
+        try:
+            return os.stat(self.path(blob_hash)).st_size
+        except FileNotFoundError:
+            return None
+
+    def read(self, blob_hash: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        with open(self.path(blob_hash), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            end = size if end is None else min(end, size)
+            if start >= end:
+                return
+            # Mapped rather than read: only the pages a slice touches are loaded,
+            # and they come from the page cache, not a copy per request
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for position in range(start, end, READ_BYTES):
+                    yield mapped[position:min(position + READ_BYTES, end)]
+
+    def delete(self, blob_hash: str):
+        try:
+            os.unlink(self.path(blob_hash))
+        except FileNotFoundError:
+            pass
+
+    def stored_at(self, blob_hash: str) -> Optional[float]:
+        try:
+            return os.stat(self.path(blob_hash)).st_mtime
+        except FileNotFoundError:
+            return None
+
+    def list(self) -> Iterator[Tuple[str, float]]:
+        for directory, subdirectories, files in os.walk(self.root):
+            if directory == self.root and "uploads" in subdirectories:
+                subdirectories.remove("uploads")
+            for name in files:
+                if HASH_PATTERN.match(name):
+                    try:
+                        yield name, os.stat(os.path.join(directory, name)).st_mtime
+                    except FileNotFoundError:
+                        pass
+
+    def discard_stale_uploads(self, older_than: float):
+        if not os.path.isdir(self.upload_dir):
+            return
+        for name in os.listdir(self.upload_dir):
+            path = os.path.join(self.upload_dir, name)
+            try:
+                if os.stat(path).st_mtime < older_than:
+                    os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+def get_blob_store() -> BlobStore:
+    if BLOB_STORE == "local":
+        return LocalBlobStore(BLOB_STORE_PATH)
+    raise ValueError(f"Unknown BLOB_STORE {BLOB_STORE!r}")
+
+# Singleton instance
+blob_store = get_blob_store()
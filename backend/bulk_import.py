@@ -0,0 +1,166 @@
+"""
+Bulk import for the estate data types (POST /api/data/{data_type}/bulk).
+
+Rows are validated up front, then written in chunks of BULK_CHUNK_SIZE: one
+executemany INSERT (plus one UPDATE per column set when upserting) and one
+commit per chunk. A row that fails validation or the database is reported back
+by its position in the request; it never aborts the rows around it.
+"""
+import json
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+from pydantic import ValidationError
+from sqlalchemy import bindparam, insert, tuple_, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import Session, select
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "10000"))
+
+# Columns that identify "the same item" when a user re-imports a spreadsheet
+NATURAL_KEYS = {
+    "assets": ("name",),
+    "financial_accounts": ("institution", "account_type"),
+    "vendors": ("name", "category"),
+    "home_access": ("location",),
+    "utilities": ("provider", "service_type"),
+    "documents": ("title", "category"),
+    "letters": ("title",),
+    "journal_entries": ("title", "created_at"),
+    "subscriptions": ("name",),
+    "calendar_events": ("title", "date"),
+}
+
+class BulkError(ValueError):
+    """The request as a whole is unusable (as opposed to a single bad row)."""
+
+def parse_rows(body: bytes) -> List:
+    """
+    Accepts a JSON array or NDJSON (one object per line). Returns one entry per
+    row: the parsed object, or the JSONDecodeError for a malformed NDJSON line.
+    """
+    text = body.decode("utf-8").strip()
+    if not text:
+        return []
+    if text.startswith("["):
+        try:
+            rows = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise BulkError(f"Invalid JSON array: {e}")
+    else:
+        rows = []
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                rows.append(e)
+    if len(rows) > BULK_MAX_ROWS:
+        raise BulkError(f"Too many rows ({len(rows)}), the limit is {BULK_MAX_ROWS}")
+    return rows
+
+def _describe(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in error.errors())
+    if isinstance(error, SQLAlchemyError):
+        return str(getattr(error, "orig", None) or error).splitlines()[0]
+    return str(error)
+
+def _validate(model, user_id: int, rows: Sequence, key: Tuple[str, ...]):
+    """Returns ([(row_number, values, provided_columns)], errors)."""
+    valid, errors = [], []
+    for number, raw in enumerate(rows):
+        try:
+            if isinstance(raw, Exception):
+                raise raw
+            if not isinstance(raw, dict):
+                raise ValueError("Row must be a JSON object")
+            item = {k: v for k, v in raw.items() if k != "id"}
+            item["user_id"] = user_id
+            values = model.model_validate(item).model_dump(exclude={"id"})
+            # Given explicitly: a default filled in here (journal_entries.created_at
+            # is "now") would never match an existing item, so the upsert would duplicate it
+            if key and any(k not in item or values[k] is None for k in key):
+                raise ValueError(f"Upsert key {', '.join(key)} must be given and not empty")
+            provided = tuple(sorted(k for k in item if k in values and k not in key and k != "user_id"))
+            valid.append((number, values, provided))
+        except Exception as e:
+            errors.append({"row": number, "error": _describe(e)})
+    return valid, errors
+
+def _write_chunk(session: Session, model, user_id: int, chunk: List, key: Tuple[str, ...]) -> Dict[str, int]:
+    table = model.__table__
+    existing: Dict[tuple, int] = {}
+    if key:
+        key_columns = [table.c[k] for k in key]
+        wanted = {tuple(values[k] for k in key) for _, values, _ in chunk}
+        found = session.execute(
+            select(table.c.id, *key_columns)
+            .where(table.c.user_id == user_id)
+            .where(tuple_(*key_columns).in_(list(wanted)))
+        ).all()
+        existing = {tuple(row[1:]): row.id for row in found}
+
+    inserts: List[dict] = []
+    # Only the columns the client sent are updated; the UPDATE is batched per distinct column set
+    updates: Dict[tuple, List[dict]] = {}
+    for _, values, provided in chunk:
+        item_id = existing.get(tuple(values[k] for k in key)) if key else None
+        if item_id is None:
+            inserts.append(values)
+        elif provided:
+            updates.setdefault(provided, []).append({"b_id": item_id, **{c: values[c] for c in provided}})
+
+    if inserts:
+        session.execute(insert(table), inserts)
+    for columns, params in updates.items():
+        statement = (
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values({c: bindparam(c) for c in columns})
+        )
+        session.connection().execute(statement, params)
+    return {"inserted": len(inserts), "updated": len(chunk) - len(inserts)}
+
+def import_rows(session: Session, model, user_id: int, rows: Sequence, key: Optional[Tuple[str, ...]] = None) -> dict:
+    """
+    Writes `rows` for `user_id`, committing per chunk. With `key`, rows matching
+    an existing item on those columns update it instead of inserting a duplicate.
+    """
+    key = tuple(key or ())
+    valid, errors = _validate(model, user_id, rows, key)
+
+    if key:
+        # Within one request the last row for a key wins
+        last_for_key = {tuple(values[k] for k in key): number for number, values, _ in valid}
+        keep = set(last_for_key.values())
+        for number, _, _ in valid:
+            if number not in keep:
+                errors.append({"row": number, "error": "Duplicate key in request, superseded by a later row"})
+        valid = [entry for entry in valid if entry[0] in keep]
+
+    counts = {"inserted": 0, "updated": 0}
+    for start in range(0, len(valid), BULK_CHUNK_SIZE):
+        chunk = valid[start:start + BULK_CHUNK_SIZE]
+        try:
+            written = _write_chunk(session, model, user_id, chunk, key)
+            session.commit()
+        except SQLAlchemyError:
+            session.rollback()
+            # Something in the chunk was rejected: retry row by row to find it
+            written = {"inserted": 0, "updated": 0}
+            for entry in chunk:
+                try:
+                    one = _write_chunk(session, model, user_id, [entry], key)
+                    session.commit()
+                    written["inserted"] += one["inserted"]
+                    written["updated"] += one["updated"]
+                except SQLAlchemyError as e:
+                    session.rollback()
+                    errors.append({"row": entry[0], "error": _describe(e)})
+        counts["inserted"] += written["inserted"]
+        counts["updated"] += written["updated"]
+
+    errors.sort(key=lambda e: e["row"])
+    return {**counts, "failed": len(errors), "errors": errors}
@@ -0,0 +1,149 @@
+"""
+Optional group-commit write path for check-ins (PULSE_GROUP_COMMIT=1).
+
+The one-click magic-link wave sends thousands of check-ins within seconds, and
+committing each one separately costs an fsync apiece on SQLite. With group commit
+on, request threads queue their check-in and block; one writer thread collects
+whatever arrives within PULSE_GROUP_COMMIT_WINDOW_MS and commits the batch once.
+A request only returns after its batch is durable, so callers get the same
+guarantee as before.
+
+If a batch fails, its check-ins are retried one per transaction, so one bad row
+(e.g. an unknown user_id) fails only its own request.
+"""
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlmodel import Session, select
+from backend.database import engine, Database
+from backend.pulse_logic import record_checkin
+from backend.pulse_models import PulseSettings, PulseState
+
+GROUP_COMMIT_ENABLED = os.getenv("PULSE_GROUP_COMMIT", "0").lower() in ("1", "true", "yes")
+WINDOW_SECONDS = float(os.getenv("PULSE_GROUP_COMMIT_WINDOW_MS", "5")) / 1000
+MAX_BATCH = int(os.getenv("PULSE_GROUP_COMMIT_MAX_BATCH", "500"))
+# How long a request waits for its batch before giving up
+WAIT_SECONDS = float(os.getenv("PULSE_GROUP_COMMIT_WAIT_SECONDS", "10"))
+
+PendingCheckin = Tuple[int, str, Optional[str], Future]
+
+class CheckinWriter:
+    def __init__(self):
+        self._queue: "queue.Queue[Optional[PendingCheckin]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="checkin-writer", daemon=True)
+        self._thread.start()
+        print(f"✍️ Check-in Group Commit Started (window {WINDOW_SECONDS * 1000:.0f}ms, max batch {MAX_BATCH})")
+
+    def stop(self):
+        """Flushes everything already queued, then stops the writer thread."""
+        if not self._running:
+            return
+        self._running = False
+        self._queue.put(None)
+        if self._thread:
+            self._thread.join(timeout=WAIT_SECONDS)
+
+    def write(self, session: Session, user_id: int, method: str, note: Optional[str] = None) -> datetime:
+        """
+        Records a check-in durably and returns its timestamp. Goes through the writer
+        when it is running, otherwise commits on the caller's session as before.
+        """
+        if not self._running:
+            checkin = record_checkin(session, user_id, method, note)
+            session.commit()
+            return checkin.timestamp
+
+        future: Future = Future()
+        self._queue.put((user_id, method, note, future))
+        return future.result(timeout=WAIT_SECONDS)
+
+    async def write_async(self, db: Database, user_id: int, method: str, note: Optional[str] = None) -> datetime:
+        """write() for async handlers: waits for the batch without blocking the event loop."""
+        if not self._running:
+            return await db.run_sync(self.write, user_id, method, note)
+
+        future: Future = Future()
+        self._queue.put((user_id, method, note, future))
+        return await asyncio.wait_for(asyncio.wrap_future(future), WAIT_SECONDS)
+
+    def _collect(self) -> Tuple[List[PendingCheckin], bool]:
+        """Blocks for the first check-in, then gathers more until the window closes or the batch is full."""
+        first = self._queue.get()
+        if first is None:
+            return self._drain(), True
+
+        batch = [first]
+        deadline = time.monotonic() + WINDOW_SECONDS
+        while len(batch) < MAX_BATCH:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch + self._drain(), True
+            batch.append(item)
+        return batch, False
+
+    def _drain(self) -> List[PendingCheckin]:
+        items = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return items
+            if item is not None:
+                items.append(item)
+
+    def _run(self):
+        while True:
+            batch, stopping = self._collect()
+            for start in range(0, len(batch), MAX_BATCH):
+                self._flush(batch[start:start + MAX_BATCH])
+            if stopping:
+                return
+
+    def _flush(self, batch: List[PendingCheckin]):
+        if not batch:
+            return
+        try:
+            with Session(engine) as session:
+                # Load every settings/state row in two queries so record_checkin's lookups hit the identity map
+                # (which only holds weak references, hence keeping these lists alive for the batch)
+                user_ids = list({user_id for user_id, _, _, _ in batch})
+                preloaded = (
+                    session.exec(select(PulseSettings).where(PulseSettings.user_id.in_(user_ids))).all(),
+                    session.exec(select(PulseState).where(PulseState.user_id.in_(user_ids))).all()
+                )
+
+                timestamps = [record_checkin(session, user_id, method, note).timestamp for user_id, method, note, _ in batch]
+                session.commit()
+            for (_, _, _, future), timestamp in zip(batch, timestamps):
+                future.set_result(timestamp)
+        except Exception as e:
+            print(f"⚠️ Group commit of {len(batch)} check-ins failed ({e}), retrying individually")
+            for user_id, method, note, future in batch:
+                try:
+                    with Session(engine) as session:
+                        checkin = record_checkin(session, user_id, method, note)
+                        session.commit()
+                        future.set_result(checkin.timestamp)
+                except Exception as item_error:
+                    future.set_exception(item_error)
+
+# Singleton instance
+checkin_writer = CheckinWriter()
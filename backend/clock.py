@@ -0,0 +1,42 @@
+"""
+Injectable UTC clock for the pulse pipeline.
+
+Production reads the wall clock. Benchmarks and simulations swap in a FrozenClock
+so sweeps are deterministic and time can be advanced without sleeping.
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable
+
+class FrozenClock:
+    def __init__(self, now: datetime):
+        self.now = now
+
+    def __call__(self) -> datetime:
+        return self.now
+
+    def advance(self, **delta) -> datetime:
+        self.now += timedelta(**delta)
+        return self.now
+
+_source: Callable[[], datetime] = datetime.utcnow
+
+def utcnow() -> datetime:
+    return _source()
+
+def set_clock(source: Callable[[], datetime]):
+    global _source
+    _source = source
+
+def reset_clock():
+    set_clock(datetime.utcnow)
+
+@contextmanager
+def frozen(at: datetime):
+    """Freezes utcnow() at `at` for the duration of the block; yields the clock so it can be advanced."""
+    clock = FrozenClock(at)
+    set_clock(clock)
+    try:
+        yield clock
+    finally:
+        reset_clock()
@@ -0,0 +1,341 @@
+"""
+Transparent compression for large text columns.
+
+CompressedText is a column type: the model field stays a plain `str`, and values
+of COMPRESS_MIN_BYTES or more are stored compressed. The codec is zstd when the
+zstandard package is installed and zlib otherwise (COMPRESSION_CODEC forces
+one). It can use a zstd dictionary trained on the column's own rows, which is
+what makes short letters and messages worth compressing. Smaller values, and
+ones that don't shrink, are stored as plain UTF-8. Values are decompressed when
+the column is loaded, so queries that don't select it (delta-sync version
+checks, counts) never pay for it.
+
+Stored value (a BLOB / bytea column):
+    plain UTF-8 text               never starts with a NUL byte
+    b"\\x00" + codec + payload     codec b"z" zlib, b"s" zstd,
+                                   b"d" zstd with a dictionary (4-byte id + frame),
+                                   b"p" plain text that itself starts with NUL
+Rows written before the column was compressed are TEXT and read back as they are;
+the background recompressor converts them in small batches after startup.
+
+    python -m backend.compression report                 # space saved, per column
+    python -m backend.compression recompress [--all]     # compress existing rows now
+    python -m backend.compression train letters.content  # train and activate a zstd dictionary
+                                                         # (running workers switch within a minute)
+"""
+import argparse
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import LargeBinary, bindparam, func, literal, select, type_coerce, update
+from sqlalchemy.types import TypeDecorator
+from sqlmodel import Field, SQLModel
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "256"))
+COMPRESSION_CODEC = os.getenv("COMPRESSION_CODEC", "auto")  # auto, zstd, zlib
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "6"))
+ZLIB_LEVEL = int(os.getenv("ZLIB_LEVEL", "6"))
+DICTIONARY_BYTES = int(os.getenv("COMPRESSION_DICTIONARY_BYTES", str(64 * 1024)))
+# How soon a running worker starts writing with a dictionary trained elsewhere (e.g. by the CLI)
+DICTIONARY_RELOAD_SECONDS = float(os.getenv("COMPRESSION_DICTIONARY_RELOAD_SECONDS", "60"))
+RECOMPRESS_BATCH = int(os.getenv("RECOMPRESS_BATCH", "200"))
+RECOMPRESS_PAUSE_SECONDS = float(os.getenv("RECOMPRESS_PAUSE_SECONDS", "0.05"))
+RECOMPRESS_IN_BACKGROUND = os.getenv("RECOMPRESS_IN_BACKGROUND", "true").lower() == "true"
+
+# Every CompressedText column, as "table.column"
+COLUMNS = ["estates.transparent_data", "letters.content", "journal_entries.content", "pulse_messages.message"]
+
+MARKER = b"\x00"
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+def _codec() -> str:
+    if COMPRESSION_CODEC == "zlib" or zstandard is None:
+        return "zlib"
+    return "zstd"
+
+class CompressionDictionary(SQLModel, table=True):
+    """A trained zstd dictionary. The newest one for a column compresses its new values."""
+    __tablename__ = "compression_dictionaries"
+    id: Optional[int] = Field(default=None, primary_key=True)
+    column: str = Field(index=True)  # "table.column"
+    data: bytes
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class _Dictionaries:
+    """
+    Every trained dictionary. Loaded on first use, then topped up with newer ones
+    (a primary-key seek) when an unknown id turns up, and every
+    DICTIONARY_RELOAD_SECONDS so that new writes pick up a newly trained one.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_id: Dict[int, "zstandard.ZstdCompressionDict"] = {}
+        self._active: Dict[str, int] = {}
+        self._loaded_at: Optional[float] = None
+
+    def load(self):
+        from backend.database import engine
+        loaded_at = time.monotonic()
+        with self._lock:
+            newest = max(self._by_id, default=0)
+        with engine.connect() as connection:
+            rows = connection.execute(
+                select(CompressionDictionary.id, CompressionDictionary.column, CompressionDictionary.data)
+                .where(CompressionDictionary.id > newest)
+                .order_by(CompressionDictionary.id)
+            ).all()
+        with self._lock:
+            for row in rows:
+                if row.id not in self._by_id:
+                    self._by_id[row.id] = zstandard.ZstdCompressionDict(row.data)
+                self._active[row.column] = max(row.id, self._active.get(row.column, 0))
+            self._loaded_at = loaded_at
+
+    def active(self, column: Optional[str]) -> Optional[Tuple[int, "zstandard.ZstdCompressionDict"]]:
+        if column is None:
+            return None
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= DICTIONARY_RELOAD_SECONDS:
+            self.load()
+        dictionary_id = self._active.get(column)
+        return (dictionary_id, self._by_id[dictionary_id]) if dictionary_id else None
+
+    def get(self, dictionary_id: int) -> "zstandard.ZstdCompressionDict":
+        if dictionary_id not in self._by_id:
+            self.load()  # trained by another worker since this one loaded
+        return self._by_id[dictionary_id]
+
+dictionaries = _Dictionaries()
+
+def compress(text: str, column: Optional[str] = None) -> bytes:
+    raw = text.encode()
+    if len(raw) < COMPRESS_MIN_BYTES:
+        return MARKER + b"p" + raw if raw.startswith(MARKER) else raw
+    if _codec() == "zstd":
+        # Compressor objects aren't thread-safe, and are cheap to make: one per value
+        dictionary = dictionaries.active(column)
+        if dictionary:
+            dictionary_id, data = dictionary
+            stored = MARKER + b"d" + struct.pack(">I", dictionary_id) + zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=data).compress(raw)
+        else:
+            stored = MARKER + b"s" + zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    else:
+        stored = MARKER + b"z" + zlib.compress(raw, ZLIB_LEVEL)
+    if len(stored) < len(raw):
+        return stored
+    return MARKER + b"p" + raw if raw.startswith(MARKER) else raw
+
+def decompress(value) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value  # NULL, or a row from before the column was compressed
+    value = bytes(value)  # psycopg2 hands back a memoryview
+    if not value.startswith(MARKER):
+        return value.decode()
+    codec, payload = value[1:2], value[2:]
+    if codec == b"p":
+        return payload.decode()
+    if codec == b"z":
+        return zlib.decompress(payload).decode()
+    if zstandard is None:
+        raise RuntimeError("This value is zstd-compressed: install the zstandard package to read it")
+    if codec == b"s":
+        return zstandard.ZstdDecompressor().decompress(payload).decode()
+    if codec == b"d":
+        (dictionary_id,) = struct.unpack(">I", payload[:4])
+        return zstandard.ZstdDecompressor(dict_data=dictionaries.get(dictionary_id)).decompress(payload[4:]).decode()
+    raise ValueError(f"Unknown compression codec {codec!r}")
+
+class _RawBinary(LargeBinary):
+    """The stored value untouched, either way: bytes, or str for rows not yet converted."""
+    cache_ok = True
+
+    def bind_processor(self, dialect):
+        return None
+
+    def result_processor(self, dialect, coltype):
+        return None
+
+class CompressedText(TypeDecorator):
+    """A str column stored compressed (see the module docstring). `column` is "table.column"."""
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, column: str):
+        super().__init__()
+        self.column = column
+
+    def load_dialect_impl(self, dialect):
+        return dialect.type_descriptor(_RawBinary())
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else compress(value, self.column)
+
+    def process_result_value(self, value, dialect):
+        return decompress(value)
+
+# --- Existing rows ---
+
+def _column(name: str):
+    table_name, column_name = name.split(".")
+    table = SQLModel.metadata.tables[table_name]
+    return table, table.c[column_name]
+
+def recompress(engine, columns: List[str] = COLUMNS, everything: bool = False,
+               batch_size: int = RECOMPRESS_BATCH, pause: float = RECOMPRESS_PAUSE_SECONDS,
+               stop: Optional[threading.Event] = None) -> Dict[str, int]:
+    """
+    Rewrites stored values that aren't in their best form, one short transaction
+    per batch so the app's own writes never wait long. By default, only rows that
+    are still uncompressed and big enough. With `everything`, every row, e.g.
+    after training a dictionary. Returns rows rewritten, per column.
+    """
+    rewritten = {}
+    for name in columns:
+        table, column = _column(name)
+        raw = type_coerce(column, _RawBinary())
+        statement = select(table.c.id, raw.label("raw"))
+        if not everything:
+            statement = statement.where(
+                func.substr(raw, 1, 1) != literal(MARKER, _RawBinary()),
+                func.length(raw) >= COMPRESS_MIN_BYTES
+            )
+        # Only if the value is still what was read: a concurrent save wins
+        write = update(table).where(table.c.id == bindparam("row_id"), raw == bindparam("old", type_=_RawBinary())) \
+            .values({column.name: bindparam("new", type_=_RawBinary())})
+        after, count = 0, 0
+        while not (stop and stop.is_set()):
+            with engine.begin() as connection:
+                rows = connection.execute(statement.where(table.c.id > after).order_by(table.c.id).limit(batch_size)).all()
+                changes = []
+                for row in rows:
+                    value = decompress(row.raw)
+                    new = None if value is None else compress(value, name)
+                    if new != row.raw:
+                        changes.append({"row_id": row.id, "old": row.raw, "new": new})
+                if changes:
+                    result = connection.execute(write, changes)
+                    count += result.rowcount if result.rowcount >= 0 else len(changes)
+            if len(rows) < batch_size:
+                break
+            after = rows[-1].id
+            time.sleep(pause)
+        rewritten[name] = count
+    return rewritten
+
+def report(engine, columns: List[str] = COLUMNS, batch_size: int = 1000) -> List[dict]:
+    """Per column: rows, compressed rows, text bytes and stored bytes. Reads every row."""
+    results = []
+    for name in columns:
+        table, column = _column(name)
+        statement = select(table.c.id, type_coerce(column, _RawBinary()).label("raw"))
+        rows = compressed = text_bytes = stored_bytes = 0
+        after = 0
+        with engine.connect() as connection:
+            while True:
+                batch = connection.execute(statement.where(table.c.id > after).order_by(table.c.id).limit(batch_size)).all()
+                for row in batch:
+                    if row.raw is None:
+                        continue
+                    stored = row.raw.encode() if isinstance(row.raw, str) else bytes(row.raw)
+                    rows += 1
+                    compressed += stored.startswith(MARKER) and stored[1:2] != b"p"
+                    stored_bytes += len(stored)
+                    text_bytes += len(decompress(stored).encode())
+                if len(batch) < batch_size:
+                    break
+                after = batch[-1].id
+        results.append({"column": name, "rows": rows, "compressed_rows": compressed,
+                        "text_bytes": text_bytes, "stored_bytes": stored_bytes})
+    return results
+
+def train(engine, column: str, samples: int = 5000, size: int = DICTIONARY_BYTES) -> int:
+    """Trains a dictionary on the column's newest rows and makes it the active one. Returns its id."""
+    if zstandard is None:
+        raise RuntimeError("Dictionaries need the zstandard package")
+    table, sa_column = _column(column)
+    with engine.connect() as connection:
+        texts = connection.execute(
+            select(sa_column).where(sa_column.is_not(None)).order_by(table.c.id.desc()).limit(samples)
+        ).scalars().all()
+    data = zstandard.train_dictionary(size, [text.encode() for text in texts if text]).as_bytes()
+    with engine.begin() as connection:
+        dictionary_id = connection.execute(
+            CompressionDictionary.__table__.insert().values(column=column, data=data, created_at=datetime.utcnow())
+        ).inserted_primary_key[0]
+    dictionaries.load()
+    return dictionary_id
+
+class BackgroundRecompressor:
+    """Converts rows written before compression, in a daemon thread after startup."""
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if not RECOMPRESS_IN_BACKGROUND or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="recompressor", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        from backend.database import engine
+        try:
+            rewritten = recompress(engine, stop=self._stop)
+            if any(rewritten.values()):
+                print(f"🗜️ [COMPRESSION] Recompressed {sum(rewritten.values())} row(s): {rewritten}")
+        except Exception as e:
+            print(f"❌ [COMPRESSION] Background recompression stopped: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+# Singleton instance
+recompressor = BackgroundRecompressor()
+
+def main():
+    from backend.database import engine
+    import backend.estate_models, backend.pulse_models  # every COLUMNS table has to be on the metadata
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("report", help="text vs stored bytes per column")
+    recompress_cmd = sub.add_parser("recompress", help="compress existing rows now")
+    recompress_cmd.add_argument("--all", action="store_true", help="rewrite every row (e.g. after training a dictionary)")
+    recompress_cmd.add_argument("--column", action="append", choices=COLUMNS)
+    train_cmd = sub.add_parser("train", help="train a zstd dictionary for a column and activate it")
+    train_cmd.add_argument("column", choices=COLUMNS)
+    train_cmd.add_argument("--samples", type=int, default=5000)
+    train_cmd.add_argument("--size", type=int, default=DICTIONARY_BYTES)
+    args = parser.parse_args()
+
+    if args.command == "report":
+        total_text = total_stored = 0
+        print(f"{'column':<26} {'rows':>8} {'compressed':>11} {'text':>12} {'stored':>12} {'saved':>7}")
+        for r in report(engine):
+            saved = 1 - r["stored_bytes"] / r["text_bytes"] if r["text_bytes"] else 0
+            print(f"{r['column']:<26} {r['rows']:>8} {r['compressed_rows']:>11} {r['text_bytes']:>12} {r['stored_bytes']:>12} {saved:>6.1%}")
+            total_text += r["text_bytes"]
+            total_stored += r["stored_bytes"]
+        saved = 1 - total_stored / total_text if total_text else 0
+        print(f"📦 {total_text - total_stored} bytes saved in total ({saved:.1%}, codec {_codec()})")
+    elif args.command == "recompress":
+        print(f"🗜️ Rewritten: {recompress(engine, args.column or COLUMNS, everything=args.all, pause=0)}")
+    else:
+        print(f"📚 Dictionary {train(engine, args.column, args.samples, args.size)} is now active for {args.column}")
+
+if __name__ == "__main__":
+    # Run as a script this module is __main__; the models' import of
+    # backend.compression must find it, not define its table a second time
+    sys.modules.setdefault("backend.compression", sys.modules[__name__])
+    main()
@@ -1,7 +1,9 @@
 import os
 from datetime import datetime
 from typing import Optional, List
+from sqlalchemy import UniqueConstraint
 from sqlmodel import Field, SQLModel, create_engine, Session, select
+from backend.compression import CompressedText
 
 class User(SQLModel, table=True):
     __tablename__ = "users"
@@ -15,17 +17,36 @@ class User(SQLModel, table=True):
 class Estate(SQLModel, table=True):
     __tablename__ = "estates"
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="users.id")
+    user_id: int = Field(foreign_key="users.id", index=True)
     
     # Transparent data (Accessibly to server/AI)
-    transparent_data: str = Field(default="{}") 
+    transparent_data: str = Field(default="{}", sa_type=CompressedText("estates.transparent_data"))
     
     # Secret Box (Encrypted on Client, Opaque to server)
     encrypted_vault: bytes = Field(default=b"") 
     
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
-from sqlalchemy import inspect, text
+    # Bumped by every save; delta saves (PATCH /api/estate) name the version they were made against
+    version: int = Field(default=0)
+    # The vault itself lives in the blob store (backend/vault_blobs.py): this is the
+    # JSON array of its chunk hashes, in order. encrypted_vault stays empty.
+    vault_manifest: Optional[str] = None
+
+class EstateVaultChunk(SQLModel, table=True):
+    """A vault chunk the user has uploaded. The bytes are in the blob store, shared by every owner."""
+    __tablename__ = "estate_vault_chunks"
+    __table_args__ = (UniqueConstraint("user_id", "hash", name="uq_estate_vault_chunks_user_hash"),)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="users.id")
+    hash: str  # sha256 of the chunk, hex
+    size: int = Field(default=0)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+import anyio
+from fastapi.concurrency import run_in_threadpool
+from backend.metrics import instrument_engine
+from backend.sqlite_profile import is_sqlite_file, tune_sqlite
 from backend.estate_models import (
     Asset, FinancialAccount, Vendor, HomeAccess, Utility, 
     Document, Letter, JournalEntry, Subscription, CalendarEvent
@@ -40,8 +61,9 @@ if "postgresql" in DATABASE_URL:
     connect_args["sslmode"] = "require"
 
 engine = create_engine(DATABASE_URL, connect_args=connect_args)
-
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
+instrument_engine(engine)
+if is_sqlite_file(DATABASE_URL):
+    tune_sqlite(engine)
 
 import time
 from sqlalchemy.exc import OperationalError
@@ -51,8 +73,9 @@ def create_db_and_tables():
     for i in range(retries):
         try:
             print(f"🔄 Attempting Database Connection ({i+1}/{retries})...")
-            SQLModel.metadata.create_all(engine)
-            migrate_db()
+            # Versioned steps (backend/migrations.py); a current schema costs one query
+            from backend.migrations import upgrade
+            upgrade(engine)
             print("✅ Database Connected & Initialized!")
             break
         except OperationalError as e:
@@ -62,106 +85,68 @@ def create_db_and_tables():
             print(f"⚠️ Connection Refused. Database might be sleeping. Retrying in 3s...")
             time.sleep(3)
 
-def migrate_db():
-    """Simple migration helper to add missing columns for SQLite/Postgres"""
-    inspector = inspect(engine)
-    with Session(engine) as session:
-        # Generic Migration for all models
-        table_cols = {
-            "assets": {
-                "valuation": "FLOAT",
-                "status": "TEXT",
-                "ownershipDetails": "TEXT",
-                "documents": "TEXT"
-            },
-            "subscriptions": {
-                "cycle": "TEXT",
-                "difficulty": "TEXT",
-                "paymentMethod": "TEXT"
-            },
-            "documents": {
-                "name": "TEXT",
-                "status": "TEXT",
-                "location": "TEXT"
-            },
-            "utilities": {
-                "location": "TEXT"
-            }
-        }
-
-        for table, cols in table_cols.items():
-            try:
-                # Ensure table exists
-                inspector.get_columns(table)
-                existing = [c["name"] for c in inspector.get_columns(table)]
-                for col_name, col_type in cols.items():
-                    if col_name not in existing:
-                        print(f"🔧 Migrating: Adding {col_name} to {table}")
-                        session.execute(text(f"ALTER TABLE {table} ADD COLUMN {col_name} {col_type}"))
-            except Exception as e:
-                print(f"⚠️ Migration skipping {table}: {e}")
-
-        # Check pulse_settings columns
-        columns = [c["name"] for c in inspector.get_columns("pulse_settings")]
-        
-        # New columns in v0.5.x
-        new_cols = {
-            "checkin_token": "TEXT",
-            "ghost_mode_until": "DATETIME",
-            "pet_protocol_enabled": "BOOLEAN DEFAULT 0",
-            "pet_details": "TEXT",
-            "safety_timer_active_until": "DATETIME",
-            "legacy_heartbeat_enabled": "BOOLEAN DEFAULT 0",
-            "medical_safe_pass_enabled": "BOOLEAN DEFAULT 1",
-            "location_vault_enabled": "BOOLEAN DEFAULT 0",
-            "last_known_location_lat": "FLOAT",
-            "last_known_location_lon": "FLOAT",
-            "last_known_location_time": "DATETIME",
-            "biometric_extension_enabled": "BOOLEAN DEFAULT 0",
-            "biometric_extension_hours": "INTEGER DEFAULT 24"
-        }
-        
-        for col_name, col_type in new_cols.items():
-            if col_name not in columns:
-                print(f"🔧 Migrating: Adding column {col_name} to pulse_settings")
-                try:
-                    session.execute(text(f"ALTER TABLE pulse_settings ADD COLUMN {col_name} {col_type}"))
-                except Exception as e:
-                    print(f"⚠️ Migration Error adding {col_name}: {e}")
-
-        # Check pulse_contacts columns
-        try:
-             # Verify table exists first
-            inspector.get_columns("pulse_contacts")
-            contact_columns = [c["name"] for c in inspector.get_columns("pulse_contacts")]
-            
-            contact_new_cols = {
-                "individual_delay_hours": "INTEGER",
-                "notify_on_safety_timer": "BOOLEAN DEFAULT 1",
-                "role": "TEXT DEFAULT 'Family'",
-                "relation": "TEXT",
-                "notes": "TEXT",
-                "avatar": "TEXT"
-            }
-            
-            for col_name, col_type in contact_new_cols.items():
-                if col_name not in contact_columns:
-                    print(f"🔧 Migrating: Adding column {col_name} to pulse_contacts")
-                    try:
-                        session.execute(text(f"ALTER TABLE pulse_contacts ADD COLUMN {col_name} {col_type}"))
-                    except Exception as e:
-                        print(f"⚠️ Migration Error adding {col_name}: {e}")
-            
-            # Note: Making tier_id nullable is harder in SQLite (requires recreate). 
-            # ideally we would do: session.execute(text("ALTER TABLE pulse_contacts ALTER COLUMN tier_id DROP NOT NULL"))
-            # For now in Dev, if we insert without tier_id it might fail if schema enforces it. 
-            # We will assume SQLite logic allows null if not stricter defined or we might need a workaround for dev.
-            # (SQLModel by default doesn't enforce NOT NULL on DB level for Optional fields unless specified, so we might be safe for new rows)
-        except Exception:
-            pass # Table might not exist yet
-        
-        session.commit()
-
 def get_session():
     with Session(engine) as session:
         yield session
+
+# --- Async Database Path (DB_ASYNC=true) ---
+# The routers run their Session code through get_db(). With DB_ASYNC on, that code
+# runs on the event loop via AsyncSession.run_sync (asyncpg / aiosqlite), so a request
+# waiting on the database holds a pool connection but no worker thread. Off, it runs
+# on FastAPI's threadpool exactly as sync handlers did. Background jobs always use `engine`.
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() in ("1", "true", "yes")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+
+def async_database_url(url: str) -> str:
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return url.replace(prefix, "postgresql+asyncpg://", 1)
+    return url
+
+async_engine = None
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import create_async_engine
+    # asyncpg takes ssl= rather than libpq's sslmode=
+    async_connect_args = {"ssl": "require"} if "postgresql" in DATABASE_URL else {}
+    pool_args = {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW} if "postgresql" in DATABASE_URL else {}
+    async_engine = create_async_engine(async_database_url(DATABASE_URL), connect_args=async_connect_args, **pool_args)
+    instrument_engine(async_engine.sync_engine)
+    if is_sqlite_file(DATABASE_URL):
+        # Pragmas only: the write lock blocks its thread, which here is the event loop
+        tune_sqlite(async_engine.sync_engine, single_writer=False)
+
+class Database:
+    """
+    Per-request handle the routers use instead of a bare Session.
+    `await db.run_sync(fn, *args)` calls fn(session, *args) on whichever path is
+    configured. fn must return plain data or loaded objects: sessions here don't
+    expire on commit, so nothing lazy-loads after fn returns.
+    """
+    def __init__(self, session):
+        self.session = session
+
+    async def run_sync(self, fn, *args, **kwargs):
+        if async_engine is not None:
+            return await self.session.run_sync(fn, *args, **kwargs)
+        return await run_in_threadpool(fn, self.session, *args, **kwargs)
+
+# Threads for closing request sessions, apart from the shared threadpool. At most one
+# close per pool connection can be in flight, so the pool's size bounds them
+session_close_limiter = anyio.CapacityLimiter(DB_POOL_SIZE + DB_MAX_OVERFLOW)
+
+async def get_db():
+    if async_engine is not None:
+        from sqlmodel.ext.asyncio.session import AsyncSession
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield Database(session)
+    else:
+        session = Session(engine, expire_on_commit=False)
+        try:
+            yield Database(session)
+        finally:
+            # Not on the shared threadpool: if every worker thread is waiting for a pool
+            # connection, the close that would return one must not queue behind them
+            await anyio.to_thread.run_sync(session.close, limiter=session_close_limiter)
@@ -1,59 +1,28 @@
 import os
 from datetime import datetime
-from jinja2 import Template
+from typing import List
+from backend.email_templates import registry
 
 OUTBOX_DIR = "backend/outbox"
 
 class LocalEmailService:
     def __init__(self):
-        if not os.path.exists(OUTBOX_DIR):
-            os.makedirs(OUTBOX_DIR)
-            
-        # Basic HTML Template
-        self.template = """
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body { font-family: sans-serif; background: #f0fdfa; padding: 20px; }
-                .container { max-width: 600px; margin: 0 auto; background: white; border-radius: 10px; overflow: hidden; box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1); }
-                .header { background: #0f172a; padding: 20px; text-align: center; }
-                .header h1 { color: #14b8a6; margin: 0; font-family: serif; }
-                .content { padding: 30px; color: #334155; line-height: 1.6; }
-                .btn { display: inline-block; background: #0d9488; color: white; padding: 12px 24px; text-decoration: none; border-radius: 8px; font-weight: bold; margin-top: 20px; }
-                .footer { background: #f8fafc; padding: 15px; text-align: center; font-size: 12px; color: #94a3b8; }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>Continuum Pulse</h1>
-                </div>
-                <div class="content">
-                    <h2>{{ subject }}</h2>
-                    <p>Dear {{ recipient_name }},</p>
-                    <p>{{ body_text }}</p>
-                    
-                    {% if action_url %}
-                    <div style="text-align: center;">
-                        <a href="{{ action_url }}" class="btn">{{ action_label }}</a>
-                    </div>
-                    {% endif %}
-                </div>
-                <div class="footer">
-                    This is an automated message from the Digital Guardian system regarding User {{ user_id }}.
-                </div>
-            </div>
-        </body>
-        </html>
-        """
+        # Outbox directory and template are set up on the first send, not at import
+        self._template = None
+        self._outbox_ready = False
+
+    @property
+    def template(self):
+        # Compiled once by the registry and reused for every send
+        if self._template is None:
+            self._template = registry.get("email.html")
+        return self._template
 
     def send_email(self, to_email: str, recipient_name: str, subject: str, body: str, user_id: int, action_url: str = None, action_label: str = "View Status"):
         """
         Generates an HTML email and saves it to the outbox directory for inspection.
         """
-        t = Template(self.template)
-        html_content = t.render(
+        html_content = self.template.render(
             subject=subject,
             recipient_name=recipient_name,
             body_text=body,
@@ -61,11 +30,39 @@ class LocalEmailService:
             action_url=action_url,
             action_label=action_label
         )
-        
+        return self._write(to_email, subject, html_content)
+
+    def render_many(self, messages: List[dict]) -> List[str]:
+        """
+        The HTML of many emails in one pass over the compiled template (a claimed
+        outbox batch, e.g. a Tier 4 fan-out). Each message dict takes send_email's
+        keyword arguments; send each result with send_rendered.
+        """
+        contexts = [
+            {
+                "subject": m["subject"],
+                "recipient_name": m["recipient_name"],
+                "body_text": m["body"],
+                "user_id": m["user_id"],
+                "action_url": m.get("action_url"),
+                "action_label": m.get("action_label") or "View Status"
+            }
+            for m in messages
+        ]
+        return registry.render_many("email.html", contexts)
+
+    def send_rendered(self, to_email: str, subject: str, html_content: str) -> str:
+        """Sends an email rendered by render_many."""
+        return self._write(to_email, subject, html_content)
+
+    def _write(self, to_email: str, subject: str, html_content: str) -> str:
         timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
         safe_subject = subject.replace(" ", "_").lower()[:30]
         filename = f"{timestamp}_{safe_subject}_{to_email}.html"
         filepath = os.path.join(OUTBOX_DIR, filename)
+        if not self._outbox_ready:
+            os.makedirs(OUTBOX_DIR, exist_ok=True)
+            self._outbox_ready = True
         
         with open(filepath, "w") as f:
             f.write(html_content)
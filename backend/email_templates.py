@@ -0,0 +1,130 @@
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from jinja2 import Environment, Template
+
+# All outgoing message templates, keyed "<name>.<part>".
+# Alerts are "tier_<n>.<channel>.subject|body" (and "safety_timer.<channel>..."); channels are "email" and "sms".
+TEMPLATES = {
+    "email.html": """
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <style>
+                body { font-family: sans-serif; background: #f0fdfa; padding: 20px; }
+                .container { max-width: 600px; margin: 0 auto; background: white; border-radius: 10px; overflow: hidden; box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1); }
+                .header { background: #0f172a; padding: 20px; text-align: center; }
+                .header h1 { color: #14b8a6; margin: 0; font-family: serif; }
+                .content { padding: 30px; color: #334155; line-height: 1.6; }
+                .btn { display: inline-block; background: #0d9488; color: white; padding: 12px 24px; text-decoration: none; border-radius: 8px; font-weight: bold; margin-top: 20px; }
+                .footer { background: #f8fafc; padding: 15px; text-align: center; font-size: 12px; color: #94a3b8; }
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <div class="header">
+                    <h1>Continuum Pulse</h1>
+                </div>
+                <div class="content">
+                    <h2>{{ subject }}</h2>
+                    <p>Dear {{ recipient_name }},</p>
+                    <p>{{ body_text }}</p>
+
+                    {% if action_url %}
+                    <div style="text-align: center;">
+                        <a href="{{ action_url }}" class="btn">{{ action_label }}</a>
+                    </div>
+                    {% endif %}
+                </div>
+                <div class="footer">
+                    This is an automated message from the Digital Guardian system regarding User {{ user_id }}.
+                </div>
+            </div>
+        </body>
+        </html>
+        """,
+
+    # Shared tail: the user's own words, if they left any
+    "custom_message.txt": "{% if custom_message %} Their personal message to you: \"{{ custom_message }}\"{% endif %}",
+
+    "tier_1.email.subject": "Continuum Pulse: Standard Welfare Check",
+    "tier_1.email.body": "We have not received a check-in from the user within the standard timeframe. As a Tier 1 contact, simply confirming you have heard from them recently will reset the timer.{% include 'custom_message.txt' %}",
+    "tier_2.email.subject": "Continuum Pulse: Level 2 Escalation",
+    "tier_2.email.body": "The user has missed the standard check-in window by a significant margin. Please attempt to contact them directly.{% include 'custom_message.txt' %}",
+    "tier_3.email.subject": "Continuum Pulse: URGENT - Medical/Legal Release",
+    "tier_3.email.body": "We have escalated to Tier 3. Critical medical directives and entry codes have now been unlocked for your viewing in the Guardian Portal.{% include 'custom_message.txt' %}",
+    "tier_4.email.subject": "Continuum Pulse: EMERGENCY - Full Vault Access",
+    "tier_4.email.body": "This is a Tier 4 Emergency. Full access to the digital vault has been granted. Please verify the user's safety immediately.{% include 'custom_message.txt' %}",
+
+    "tier_1.sms.subject": "Continuum Pulse: Welfare Check",
+    "tier_1.sms.body": "Continuum Pulse: we haven't heard from {{ user_name or 'your contact' }}. Have you? Confirm here: {{ action_url }}",
+    "tier_2.sms.subject": "Continuum Pulse: Level 2",
+    "tier_2.sms.body": "Continuum Pulse: still no check-in from {{ user_name or 'your contact' }}. Please try to reach them directly. {{ action_url }}",
+    "tier_3.sms.subject": "Continuum Pulse: URGENT",
+    "tier_3.sms.body": "Continuum Pulse URGENT: medical/legal directives are now unlocked in the Guardian Portal: {{ action_url }}",
+    "tier_4.sms.subject": "Continuum Pulse: EMERGENCY",
+    "tier_4.sms.body": "Continuum Pulse EMERGENCY: full vault access granted. Verify their safety now: {{ action_url }}",
+
+    # Safety timer ("walking home") expired without being cancelled
+    "safety_timer.email.subject": "Continuum Pulse: Safety Timer Expired",
+    "safety_timer.email.body": "A \"{{ purpose or 'safety' }}\" timer the user started expired at {{ expires_at }} UTC without being cancelled. Please check on them right away.{% include 'custom_message.txt' %}",
+    "safety_timer.sms.subject": "Continuum Pulse: Safety Timer",
+    "safety_timer.sms.body": "Continuum Pulse: a \"{{ purpose or 'safety' }}\" timer expired without check-in. Please check on them now: {{ action_url }}",
+}
+
+class TemplateRegistry:
+    """
+    Compiles each template once and keeps the compiled object.
+    Jinja's own cache still stats the loader on every lookup; this one is a plain dict.
+    The Jinja environment (and jinja2 itself) is created on the first render, not at import.
+    """
+    def __init__(self, templates: Dict[str, str]):
+        self.templates = templates
+        self._env: Optional["Environment"] = None
+        self._compiled: Dict[str, "Template"] = {}
+
+    @property
+    def env(self) -> "Environment":
+        if self._env is None:
+            from jinja2 import DictLoader, Environment, select_autoescape
+            self._env = Environment(
+                loader=DictLoader(self.templates),
+                autoescape=select_autoescape(["html"]),
+                auto_reload=False
+            )
+        return self._env
+
+    def get(self, name: str) -> "Template":
+        template = self._compiled.get(name)
+        if template is None:
+            template = self._compiled[name] = self.env.get_template(name)
+        return template
+
+    def render(self, name: str, **context) -> str:
+        return self.get(name).render(**context)
+
+    def render_many(self, name: str, contexts: Iterable[dict]) -> List[str]:
+        """Renders one compiled template for many recipients (e.g. a Tier 4 fan-out)."""
+        template = self.get(name)
+        return [template.render(**context) for context in contexts]
+
+    def render_messages(self, kind: str, channel: str = "email", custom_message: Optional[str] = None,
+                        contexts: Iterable[dict] = ()) -> List[Tuple[str, str]]:
+        """render_message for a fan-out: (subject, body) per context, each part rendered in one render_many call."""
+        prefix = f"{kind}.{channel}"
+        contexts = [dict(context, custom_message=custom_message) for context in contexts]
+        return list(zip(self.render_many(f"{prefix}.subject", contexts), self.render_many(f"{prefix}.body", contexts)))
+
+    def render_alert(self, tier_number: int, channel: str = "email", custom_message: Optional[str] = None, **context) -> Tuple[str, str]:
+        """Returns (subject, body) for an escalation alert."""
+        return self.render_message(f"tier_{tier_number}", channel, custom_message, **context)
+
+    def render_message(self, kind: str, channel: str = "email", custom_message: Optional[str] = None, **context) -> Tuple[str, str]:
+        """Returns (subject, body) for any "<kind>.<channel>" template pair."""
+        prefix = f"{kind}.{channel}"
+        subject = self.render(f"{prefix}.subject", **context)
+        body = self.render(f"{prefix}.body", custom_message=custom_message, **context)
+        return subject, body
+
+# Singleton instance
+registry = TemplateRegistry(TEMPLATES)
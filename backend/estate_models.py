@@ -1,12 +1,13 @@
 from typing import Optional
 from sqlmodel import Field, SQLModel
 from datetime import datetime
+from backend.compression import CompressedText
 
 # --- ASSETS & FINANCE ---
 class Asset(SQLModel, table=True):
     __tablename__ = "assets"
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="users.id")
+    user_id: int = Field(foreign_key="users.id", index=True)
     name: str
     type: str = "other" # real_estate, vehicle, financial, digital, physical
     valuation: Optional[float] = None # Added for compatibility
@@ -19,7 +20,7 @@ class Asset(SQLModel, table=True):
 class FinancialAccount(SQLModel, table=True):
     __tablename__ = "financial_accounts"
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="users.id")
+    user_id: int = Field(foreign_key="users.id", index=True)
     institution: str
     account_type: str # checking, savings, investment, credit
     account_number_encrypted: Optional[str] = None # We might want to encrypt this
@@ -30,7 +31,7 @@ class FinancialAccount(SQLModel, table=True):
 class Vendor(SQLModel, table=True):
     __tablename__ = "vendors"
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="users.id")
+    user_id: int = Field(foreign_key="users.id", index=True)
     name: str
     category: str # plumber, electrician, etc
     phone: Optional[str] = None
@@ -41,7 +42,7 @@ class Vendor(SQLModel, table=True):
 class HomeAccess(SQLModel, table=True):
     __tablename__ = "home_access"
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="users.id")
+    user_id: int = Field(foreign_key="users.id", index=True)
     location: str # Front Door, Wifi, Safe
     code_encrypted: str # "1234" (should ideally be encrypted)
     instructions: Optional[str] = None
@@ -49,7 +50,7 @@ class HomeAccess(SQLModel, table=True):
 class Utility(SQLModel, table=True):
     __tablename__ = "utilities"
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="users.id")
+    user_id: int = Field(foreign_key="users.id", index=True)
     provider: str
     service_type: str # water, electric, gas
     location: Optional[str] = None # Added for frontend compatibility
@@ -60,7 +61,7 @@ class Utility(SQLModel, table=True):
 class Document(SQLModel, table=True):
     __tablename__ = "documents"
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="users.id")
+    user_id: int = Field(foreign_key="users.id", index=True)
     title: str
     name: Optional[str] = None # Added for compatibility
     category: str # will, trust, deed, insurance
@@ -75,20 +76,20 @@ class Document(SQLModel, table=True):
 class Letter(SQLModel, table=True):
     __tablename__ = "letters"
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="users.id")
+    user_id: int = Field(foreign_key="users.id", index=True)
     recipient_name: Optional[str] = None # Or link to Contact
     title: str
-    content: str # content or encrypted content
+    content: str = Field(sa_type=CompressedText("letters.content")) # content or encrypted content
     release_condition: str = "death" # death, specific_date
     status: str = "draft" # draft, final
 
 class JournalEntry(SQLModel, table=True):
     __tablename__ = "journal_entries"
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="users.id")
+    user_id: int = Field(foreign_key="users.id", index=True)
     type: str = "reflection" # reflection, life_lesson, ethical_will
     title: Optional[str] = None
-    content: str
+    content: str = Field(sa_type=CompressedText("journal_entries.content"))
     tags: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -96,7 +97,7 @@ class JournalEntry(SQLModel, table=True):
 class Subscription(SQLModel, table=True):
     __tablename__ = "subscriptions"
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="users.id")
+    user_id: int = Field(foreign_key="users.id", index=True)
     name: str
     cost: Optional[float] = None
     frequency: str = "monthly"
@@ -109,7 +110,7 @@ class Subscription(SQLModel, table=True):
 class CalendarEvent(SQLModel, table=True):
     __tablename__ = "calendar_events"
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="users.id")
+    user_id: int = Field(foreign_key="users.id", index=True)
     title: str
     date: datetime
     type: str = "event" # birthday, tax, maintenance
@@ -0,0 +1,115 @@
+"""
+The estate dashboard's summary: for every type in MODEL_MAP, the item count, one
+key total and the few most relevant items, in a single query.
+
+Each type contributes two branches to one UNION ALL: a grouped row (count and
+total) and its top SUMMARY_RECENT rows (id, label, date). Every branch is a
+seek on the table's user_id index; no content column (letters, journal) is read.
+
+Summaries are cached per user. The estate_data router calls forget_summary
+after every write it commits; other workers serve a stale summary for at most
+SUMMARY_CACHE_TTL_SECONDS.
+"""
+import os
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+from sqlalchemy import DateTime, Float, Integer, String, case, cast, func, literal, null, union_all
+from sqlmodel import Session, select
+from backend.cache import TTLCache
+from backend.estate_models import (
+    Asset, FinancialAccount, Vendor, HomeAccess, Utility,
+    Document, Letter, JournalEntry, Subscription, CalendarEvent
+)
+
+SUMMARY_RECENT = int(os.getenv("SUMMARY_RECENT", "3"))
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "10000"))
+SUMMARY_CACHE_TTL_SECONDS = float(os.getenv("SUMMARY_CACHE_TTL_SECONDS", "300"))
+
+def _monthly_cost(now: datetime):
+    # Subscriptions are entered per billing cycle; the dashboard shows a monthly figure
+    frequency = func.lower(Subscription.frequency)
+    return func.sum(case(
+        (frequency.in_(("yearly", "annual", "annually")), Subscription.cost / 12),
+        (frequency == "quarterly", Subscription.cost / 3),
+        (frequency == "weekly", Subscription.cost * 52 / 12),
+        else_=Subscription.cost
+    ))
+
+# type -> (model, label column, date column or None, total name, total(now) or None)
+SUMMARY_SPEC: Dict[str, Tuple] = {
+    "assets": (Asset, Asset.name, None, "valuation", lambda now: func.sum(Asset.valuation)),
+    "financial_accounts": (FinancialAccount, FinancialAccount.institution, None, "balance_estimate",
+                           lambda now: func.sum(FinancialAccount.balance_estimate)),
+    "vendors": (Vendor, Vendor.name, None, None, None),
+    "home_access": (HomeAccess, HomeAccess.location, None, None, None),
+    "utilities": (Utility, Utility.provider, None, None, None),
+    "documents": (Document, Document.title, None, "digitized",
+                  lambda now: func.sum(case((Document.is_digitized, 1), else_=0))),
+    "letters": (Letter, Letter.title, None, "final", lambda now: func.sum(case((Letter.status == "final", 1), else_=0))),
+    "journal_entries": (JournalEntry, func.coalesce(JournalEntry.title, JournalEntry.type), JournalEntry.created_at, None, None),
+    "subscriptions": (Subscription, Subscription.name, Subscription.renewal_date, "monthly_cost", _monthly_cost),
+    # Upcoming rather than recent: the next events from now, soonest first
+    "calendar_events": (CalendarEvent, CalendarEvent.title, CalendarEvent.date, "upcoming",
+                        lambda now: func.sum(case((CalendarEvent.date >= now, 1), else_=0))),
+}
+
+def _items_query(name: str, model, label, date, user_id: int, now: datetime):
+    statement = select(
+        literal(name, String).label("type"), literal("item", String).label("kind"),
+        cast(null(), Integer).label("count"), cast(null(), Float).label("total"),
+        model.id.label("id"), cast(label, String).label("label"),
+        (date if date is not None else cast(null(), DateTime)).label("at")
+    ).where(model.user_id == user_id)
+    if model is CalendarEvent:
+        statement = statement.where(CalendarEvent.date >= now).order_by(CalendarEvent.date, CalendarEvent.id)
+    else:
+        statement = statement.order_by(model.id.desc())
+    # A subquery, so each branch keeps its own ORDER BY and LIMIT inside the UNION ALL
+    return select(statement.limit(SUMMARY_RECENT).subquery())
+
+def _totals_query(name: str, model, total: Optional[Callable], user_id: int, now: datetime):
+    return select(
+        literal(name, String).label("type"), literal("totals", String).label("kind"),
+        func.count().label("count"), cast(total(now) if total else null(), Float).label("total"),
+        cast(null(), Integer).label("id"), cast(null(), String).label("label"), cast(null(), DateTime).label("at")
+    ).where(model.user_id == user_id)
+
+def build_summary(session: Session, user_id: int) -> dict:
+    now = datetime.utcnow()
+    branches = []
+    for name, (model, label, date, _, total) in SUMMARY_SPEC.items():
+        branches.append(_totals_query(name, model, total, user_id, now))
+        branches.append(_items_query(name, model, label, date, user_id, now))
+
+    types = {
+        name: {"count": 0, "totals": {total_name: None} if total_name else {}, "items": []}
+        for name, (_, _, _, total_name, _) in SUMMARY_SPEC.items()
+    }
+    for row in session.execute(union_all(*branches)).all():
+        entry = types[row.type]
+        if row.kind == "totals":
+            entry["count"] = row.count
+            total_name = SUMMARY_SPEC[row.type][3]
+            if total_name:
+                entry["totals"][total_name] = row.total
+        else:
+            entry["items"].append({"id": row.id, "label": row.label, "at": row.at})
+    return {"user_id": user_id, "generated_at": now, "types": types}
+
+summaries = TTLCache(SUMMARY_CACHE_SIZE, SUMMARY_CACHE_TTL_SECONDS)  # user_id -> summary
+# Bumped by forget_summary: a summary computed across a write isn't cached
+_generations: Dict[int, int] = {}
+
+def get_summary(session: Session, user_id: int) -> dict:
+    summary = summaries.get(user_id)
+    if summary is None:
+        generation = _generations.get(user_id, 0)
+        summary = build_summary(session, user_id)
+        if _generations.get(user_id, 0) == generation:
+            summaries.set(user_id, summary)
+    return summary
+
+def forget_summary(user_id: int):
+    """Call after committing any change to the user's estate items."""
+    _generations[user_id] = _generations.get(user_id, 0) + 1
+    summaries.pop(user_id)
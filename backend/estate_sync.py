@@ -0,0 +1,161 @@
+"""
+Delta sync for the estate document: a save sends only what changed.
+
+- transparent_data: an RFC 6902 JSON Patch against the stored document.
+- encrypted_vault: the client splits the encrypted vault into chunks and names
+  them by sha256. The estate keeps the ordered list of hashes (vault_manifest);
+  the bytes go to the blob store, once per distinct chunk, and
+  estate_vault_chunks records which chunks each user has uploaded.
+- Optimistic concurrency: every save bumps Estate.version, and a delta save
+  states the version it was computed against. If another device saved in
+  between, the save is refused (409) rather than silently merged; the client
+  refetches, rebases its edit and retries.
+
+A client save is:
+  1. POST /api/estate/vault/chunks/missing with the new manifest's hashes
+  2. PUT /api/estate/vault/chunks/{hash} for each one the server lacks
+  3. PATCH /api/estate with base_version, the JSON Patch and the new manifest
+A client without its own chunking can PUT the whole vault to /api/estate/vault
+instead: the server chunks the stream, and unchanged chunks still dedupe.
+"""
+import json
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+from sqlalchemy import update, delete
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from backend.database import Estate, EstateVaultChunk
+from backend.blob_store import HASH_PATTERN
+from backend.json_patch import apply_patch
+from backend.vault_blobs import CHUNK_GRACE_SECONDS, VAULT_CHUNK_MAX_BYTES, VAULT_MAX_CHUNKS, Chunks, dump_manifest, load_manifest
+
+LOOKUP_BATCH = 500
+
+class VersionConflict(Exception):
+    def __init__(self, current_version: int):
+        super().__init__(f"Estate is at version {current_version}")
+        self.current_version = current_version
+
+class MissingChunks(Exception):
+    def __init__(self, missing: List[str]):
+        super().__init__(f"{len(missing)} chunk(s) not uploaded")
+        self.missing = missing
+
+def validate_manifest(manifest: List[str]) -> List[str]:
+    if len(manifest) > VAULT_MAX_CHUNKS:
+        raise ValueError(f"Too many chunks ({len(manifest)}), the limit is {VAULT_MAX_CHUNKS}")
+    for h in manifest:
+        if not isinstance(h, str) or not HASH_PATTERN.match(h):
+            raise ValueError(f"Invalid chunk hash {h!r} (expected lowercase hex sha256)")
+    return manifest
+
+def missing_chunks(session: Session, user_id: int, hashes: Iterable[str]) -> List[str]:
+    """The distinct hashes in `hashes` this user hasn't uploaded, in first-seen order."""
+    wanted = list(dict.fromkeys(hashes))
+    found = set()
+    for start in range(0, len(wanted), LOOKUP_BATCH):
+        found.update(session.exec(
+            select(EstateVaultChunk.hash).where(
+                EstateVaultChunk.user_id == user_id,
+                EstateVaultChunk.hash.in_(wanted[start:start + LOOKUP_BATCH])
+            )
+        ).all())
+    return [h for h in wanted if h not in found]
+
+def register_chunks(session: Session, user_id: int, chunks: Chunks) -> int:
+    """
+    Records chunks already in the blob store as uploaded by this user. Returns how
+    many were new. Doesn't commit.
+    """
+    missing = set(missing_chunks(session, user_id, [h for h, _ in chunks]))
+    added = 0
+    for chunk_hash, size in chunks:
+        if chunk_hash in missing:
+            session.add(EstateVaultChunk(user_id=user_id, hash=chunk_hash, size=size))
+            missing.discard(chunk_hash)
+            added += 1
+    return added
+
+def register_chunk(session: Session, user_id: int, chunk_hash: str, size: int) -> bool:
+    """register_chunks for one uploaded chunk, committed. Returns True if it was new."""
+    try:
+        added = register_chunks(session, user_id, [(chunk_hash, size)])
+        session.commit()
+    except IntegrityError:
+        # The same chunk uploaded concurrently (e.g. a retry): content-addressed, so that's fine
+        session.rollback()
+        return False
+    return bool(added)
+
+def owns_chunk(session: Session, user_id: int, chunk_hash: str) -> bool:
+    return not missing_chunks(session, user_id, [chunk_hash])
+
+def release_unused_chunks(session: Session, user_id: int, manifest: List[str]):
+    """
+    Drops the user's claim on chunks the vault no longer uses (past the grace
+    period); the blobs go once nothing references them (vault_blobs.collect_garbage).
+    """
+    session.execute(
+        delete(EstateVaultChunk).where(
+            EstateVaultChunk.user_id == user_id,
+            EstateVaultChunk.hash.not_in(manifest),
+            EstateVaultChunk.created_at < datetime.utcnow() - timedelta(seconds=CHUNK_GRACE_SECONDS)
+        )
+    )
+
+def vault_manifest(session: Session, user_id: int) -> Optional[List[str]]:
+    """The estate vault's chunk hashes, or None if the user has no estate."""
+    row = session.exec(select(Estate.id, Estate.vault_manifest).where(Estate.user_id == user_id)).first()
+    if row is None:
+        return None
+    return load_manifest(row.vault_manifest)
+
+def apply_delta(
+    session: Session,
+    user_id: int,
+    base_version: int,
+    transparent_patch: Optional[List[dict]] = None,
+    vault_manifest: Optional[List[str]] = None
+) -> int:
+    """
+    Applies one delta save and returns the new version. Raises VersionConflict,
+    PatchError/PatchConflict (json_patch), MissingChunks or ValueError; nothing
+    is written in that case.
+    """
+    # Only the columns this save needs
+    columns = [Estate.id, Estate.version]
+    if transparent_patch is not None:
+        columns.append(Estate.transparent_data)
+    row = session.exec(select(*columns).where(Estate.user_id == user_id)).first()
+    if row is None:
+        if base_version != 0:
+            raise VersionConflict(0)
+        estate = Estate(user_id=user_id)
+        session.add(estate)
+        session.flush()
+        row = session.exec(select(*columns).where(Estate.id == estate.id)).one()
+    if row.version != base_version:
+        raise VersionConflict(row.version)
+
+    values = {"version": Estate.version + 1, "updated_at": datetime.utcnow()}
+    if transparent_patch is not None:
+        # A freshly parsed document: patch it in place instead of copying it
+        document = apply_patch(json.loads(row.transparent_data or "{}"), transparent_patch, in_place=True)
+        values["transparent_data"] = json.dumps(document, ensure_ascii=False, separators=(",", ":"))
+    if vault_manifest is not None:
+        missing = missing_chunks(session, user_id, validate_manifest(vault_manifest))
+        if missing:
+            raise MissingChunks(missing)
+        values["vault_manifest"] = dump_manifest(vault_manifest)
+
+    updated = session.execute(
+        update(Estate).where(Estate.id == row.id, Estate.version == base_version).values(**values)
+    ).rowcount
+    if not updated:
+        session.rollback()
+        raise VersionConflict(session.exec(select(Estate.version).where(Estate.id == row.id)).one())
+
+    if vault_manifest is not None:
+        release_unused_chunks(session, user_id, vault_manifest)
+    session.commit()
+    return base_version + 1
@@ -0,0 +1,40 @@
+"""
+Conditional GET support for endpoints the dashboard polls.
+
+ETags are built from the per-user version counters on pulse_state (bumped on
+every write), so checking freshness is a primary-key read rather than a rebuild
+of the response body.
+"""
+from typing import Optional
+from fastapi import Request, Response
+
+def etag_for(*parts) -> str:
+    # ETag characters exclude spaces and quotes
+    return '"' + "-".join(str(p).replace(" ", "T").replace('"', "") for p in parts) + '"'
+
+def if_none_match(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 prescribes for If-None-Match
+    candidates = [c.strip() for c in header.split(",")]
+    return any(c.removeprefix("W/") == etag for c in candidates)
+
+def stamp(response: Response, etag: str):
+    # no-cache: browsers keep the body but revalidate on every poll
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+
+def conditional(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    Returns a 304 response if the client already has `etag`; otherwise stamps
+    `response` with it and returns None so the endpoint builds the body as usual.
+    """
+    if if_none_match(request, etag):
+        not_modified = Response(status_code=304)
+        stamp(not_modified, etag)
+        return not_modified
+    stamp(response, etag)
+    return None
@@ -1,4 +1,5 @@
-from backend.database import migrate_db
+from backend.database import engine
+from backend.migrations import upgrade
 print("Forcing DB Migration...")
-migrate_db()
+upgrade(engine)
 print("Done.")
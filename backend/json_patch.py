@@ -0,0 +1,138 @@
+"""
+RFC 6902 JSON Patch (with RFC 6901 JSON Pointers), for delta saves of Estate.transparent_data.
+
+apply_patch works on a deep copy and is all-or-nothing: if any operation fails,
+the document is left untouched and PatchError says which operation and why.
+A failed "test" operation raises PatchConflict, so callers can tell "the
+document changed under you" apart from a malformed patch.
+"""
+import copy
+from typing import Any, List, Tuple
+
+class PatchError(ValueError):
+    """The patch is malformed or doesn't apply to this document."""
+
+class PatchConflict(PatchError):
+    """A "test" operation failed: the document isn't in the state the client assumed."""
+
+def _parse_pointer(pointer: str) -> List[str]:
+    if not isinstance(pointer, str) or (pointer and not pointer.startswith("/")):
+        raise PatchError(f"Invalid JSON pointer {pointer!r}")
+    if pointer == "":
+        return []
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+def _array_index(container: list, token: str, for_insert: bool = False) -> int:
+    if for_insert and token == "-":
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith("0")):
+        raise PatchError(f"Invalid array index {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not for_insert):
+        raise PatchError(f"Array index {index} out of range")
+    return index
+
+def _resolve(document: Any, tokens: List[str]) -> Any:
+    current = document
+    for token in tokens:
+        if isinstance(current, dict):
+            if token not in current:
+                raise PatchError(f"Path segment {token!r} not found")
+            current = current[token]
+        elif isinstance(current, list):
+            current = current[_array_index(current, token)]
+        else:
+            raise PatchError(f"Cannot descend into {type(current).__name__} at {token!r}")
+    return current
+
+def _parent(document: Any, pointer: str) -> Tuple[Any, str]:
+    tokens = _parse_pointer(pointer)
+    if not tokens:
+        raise PatchError("Operation on the document root needs a non-empty path here")
+    return _resolve(document, tokens[:-1]), tokens[-1]
+
+def _add(document: Any, pointer: str, value: Any) -> Any:
+    if pointer == "":
+        return value
+    parent, key = _parent(document, pointer)
+    if isinstance(parent, dict):
+        parent[key] = value
+    elif isinstance(parent, list):
+        parent.insert(_array_index(parent, key, for_insert=True), value)
+    else:
+        raise PatchError(f"Cannot add to {type(parent).__name__}")
+    return document
+
+def _remove(document: Any, pointer: str) -> Tuple[Any, Any]:
+    """Returns (document, removed value)."""
+    if pointer == "":
+        raise PatchError("Cannot remove the document root")
+    parent, key = _parent(document, pointer)
+    if isinstance(parent, dict):
+        if key not in parent:
+            raise PatchError(f"Path {pointer!r} not found")
+        return document, parent.pop(key)
+    if isinstance(parent, list):
+        return document, parent.pop(_array_index(parent, key))
+    raise PatchError(f"Cannot remove from {type(parent).__name__}")
+
+def _equal(a: Any, b: Any) -> bool:
+    # JSON equality: 1 == 1.0, but true != 1
+    if isinstance(a, bool) or isinstance(b, bool):
+        return type(a) is type(b) and a == b
+    if isinstance(a, dict):
+        return isinstance(b, dict) and a.keys() == b.keys() and all(_equal(a[k], b[k]) for k in a)
+    if isinstance(a, list):
+        return isinstance(b, list) and len(a) == len(b) and all(_equal(x, y) for x, y in zip(a, b))
+    return a == b
+
+def apply_patch(document: Any, patch: List[dict], in_place: bool = False) -> Any:
+    """
+    Returns the patched copy of `document`. With in_place, patches `document`
+    itself (no copy of a large document) and may leave it half-applied on error:
+    only for a document the caller throws away on failure, like one just parsed.
+    """
+    if not isinstance(patch, list):
+        raise PatchError("A JSON Patch must be an array of operations")
+    result = document if in_place else copy.deepcopy(document)
+    for number, operation in enumerate(patch):
+        try:
+            if not isinstance(operation, dict) or "op" not in operation or "path" not in operation:
+                raise PatchError("Each operation needs \"op\" and \"path\"")
+            op, path = operation["op"], operation["path"]
+            tokens = _parse_pointer(path)
+            if op in ("add", "replace", "test") and "value" not in operation:
+                raise PatchError(f"\"{op}\" needs a \"value\"")
+
+            if op == "add":
+                result = _add(result, path, copy.deepcopy(operation["value"]))
+            elif op == "remove":
+                result, _ = _remove(result, path)
+            elif op == "replace":
+                if path == "":
+                    result = copy.deepcopy(operation["value"])
+                else:
+                    result, _ = _remove(result, path)
+                    result = _add(result, path, copy.deepcopy(operation["value"]))
+            elif op in ("move", "copy"):
+                source = operation.get("from")
+                if source is None:
+                    raise PatchError(f"\"{op}\" needs a \"from\"")
+                source_tokens = _parse_pointer(source)
+                if op == "move":
+                    if len(source_tokens) < len(tokens) and tokens[:len(source_tokens)] == source_tokens:
+                        raise PatchError("Cannot move a value into one of its own children")
+                    result, value = _remove(result, source)
+                else:
+                    value = copy.deepcopy(_resolve(result, source_tokens))
+                result = _add(result, path, value)
+            elif op == "test":
+                if not _equal(_resolve(result, tokens), operation["value"]):
+                    raise PatchConflict(f"Test failed at {path!r}")
+            else:
+                raise PatchError(f"Unknown operation {op!r}")
+        except PatchConflict as e:
+            raise PatchConflict(f"Operation {number}: {e}")
+        except PatchError as e:
+            raise PatchError(f"Operation {number}: {e}")
+    return result
@@ -1,29 +1,59 @@
 from fastapi import FastAPI, Depends, HTTPException, status, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-import uvicorn
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
 import os
+import threading
+from datetime import datetime
 from typing import List, Optional
 from pydantic import BaseModel
 from sqlmodel import Session
-from backend.database import engine, create_db_and_tables, get_session, User, Estate
+from backend.database import engine, create_db_and_tables, get_session, get_db, Database, User, Estate
 from backend.security import get_registration_options, verify_registration, get_authentication_options, verify_authentication
-from backend.routers import pulse, contacts, estate_data
+from backend.routers import pulse, contacts, estate_data, export, estate_sync, search
+from backend.estate_sync import register_chunks, release_unused_chunks
+from backend.vault_blobs import Chunks, dump_manifest, store_bytes
+from backend.compression import recompressor
 from backend.pulse_scheduler import start_scheduler, stop_scheduler
+from backend.safety_timers import timer_engine
+from backend.checkin_writer import checkin_writer, GROUP_COMMIT_ENABLED
+from backend.metrics import render_latest
 
 app = FastAPI(title="Continuum SaaS API", version="0.7.0")
 
 app.include_router(pulse.router)
 app.include_router(contacts.router)
 app.include_router(estate_data.router)
+app.include_router(export.router)
+app.include_router(estate_sync.router)
+app.include_router(search.router)
+
+# Readiness of each subsystem, reported by /api/ready. /api/health only says the process is up.
+readiness = {"database": False, "safety_timers": False, "scheduler": False}
 
 # Initialize database on startup
 @app.on_event("startup")
 def on_startup():
+    # Only what requests need runs before the server starts accepting connections;
+    # a current schema is a single query (backend/migrations.py)
     create_db_and_tables()
-    seed_dev_user()
-    start_scheduler()
+    readiness["database"] = True
+    if GROUP_COMMIT_ENABLED:
+        checkin_writer.start()
+    threading.Thread(target=start_deferred, name="deferred-startup", daemon=True).start()
+
+def start_deferred():
+    """Background subsystems, started once the server is already answering."""
+    try:
+        seed_dev_user()
+        timer_engine.start()
+        readiness["safety_timers"] = True
+        start_scheduler()
+        readiness["scheduler"] = True
+        recompressor.start()
+    except Exception as e:
+        print(f"❌ Deferred startup failed: {e}")
 
 def seed_dev_user():
     with Session(engine) as session:
@@ -42,7 +72,10 @@ def seed_dev_user():
 
 @app.on_event("shutdown")
 def on_shutdown():
+    checkin_writer.stop()
+    timer_engine.stop()
     stop_scheduler()
+    recompressor.stop()
 
 # Configure CORS
 origins = [
@@ -72,6 +105,17 @@ class RegistrationResponse(BaseModel):
 def health_check():
     return {"status": "healthy", "service": "continuum-saas"}
 
+@app.get("/api/ready")
+def readiness_check():
+    # 503 until every subsystem is up, so a load balancer holds traffic meanwhile
+    ready = all(readiness.values())
+    return JSONResponse({"ready": ready, **readiness}, status_code=200 if ready else 503)
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    # Prometheus text exposition format
+    return PlainTextResponse(render_latest(), media_type="text/plain; version=0.0.4")
+
 @app.post("/api/auth/register/challenge")
 def register_challenge(request: ChallengeRequest):
     # In a real app, generate a unique ID for the user
@@ -92,16 +136,18 @@ def send_magic_link(request: ChallengeRequest):
     print(f"📧 Sending Magic Link to {request.email}...")
     return {"status": "sent", "email": request.email}
 
-@app.get("/api/estate")
-def get_estate(user_id: int, session: Session = Depends(get_session)):
+def _get_estate(session: Session, user_id: int):
     # In real SaaS, get user_id from JWT token
     estate = session.query(Estate).filter(Estate.user_id == user_id).first()
     if not estate:
         raise HTTPException(status_code=404, detail="Estate not found")
     return estate
 
-@app.post("/api/estate")
-def save_estate(estate_data: dict, user_id: int, session: Session = Depends(get_session)):
+@app.get("/api/estate")
+async def get_estate(user_id: int, db: Database = Depends(get_db)):
+    return await db.run_sync(_get_estate, user_id)
+
+def _save_estate(session: Session, estate_data: dict, user_id: int, chunks: Optional[Chunks]):
     # In real SaaS, get user_id from JWT token
     estate = session.query(Estate).filter(Estate.user_id == user_id).first()
     if not estate:
@@ -109,9 +155,27 @@ def save_estate(estate_data: dict, user_id: int, session: Session = Depends(get_
         session.add(estate)
     
     estate.transparent_data = estate_data.get("transparent_data", "{}")
-    estate.encrypted_vault = estate_data.get("encrypted_vault", b"")
+    # Whole-document save. A client that leaves the vault out (the vault syncs
+    # separately) keeps it, instead of wiping it; one sent inline arrives here
+    # already chunked into the blob store, like PUT /api/estate/vault
+    if chunks is not None:
+        manifest = [h for h, _ in chunks]
+        register_chunks(session, user_id, chunks)
+        release_unused_chunks(session, user_id, manifest)
+        estate.vault_manifest = dump_manifest(manifest)
+    estate.version = (estate.version or 0) + 1
+    estate.updated_at = datetime.utcnow()
     session.commit()
-    return {"status": "saved"}
+    return {"status": "saved", "version": estate.version}
+
+@app.post("/api/estate")
+async def save_estate(estate_data: dict, user_id: int, db: Database = Depends(get_db)):
+    chunks = None
+    if "encrypted_vault" in estate_data:
+        vault = estate_data["encrypted_vault"] or b""
+        # Hashing and fsyncs stay off the event loop (db.run_sync runs on it with DB_ASYNC)
+        chunks = await run_in_threadpool(store_bytes, vault.encode() if isinstance(vault, str) else vault)
+    return await db.run_sync(_save_estate, estate_data, user_id, chunks)
 
 
 # --- SPA Static File Serving ---
@@ -149,5 +213,6 @@ async def serve_spa(full_path: str):
     return FileResponse("frontend/dist/index.html")
 
 if __name__ == "__main__":
+    import uvicorn
     port = int(os.environ.get("PORT", 8000))
     uvicorn.run("main:app", host="0.0.0.0", port=port, reload=False)
@@ -0,0 +1,135 @@
+"""
+Minimal in-process metrics with Prometheus text exposition (served at /api/metrics).
+
+Hot-path cost is a lock and a dict update per observation; rendering happens only
+when scraped. Values are per process, as with prometheus_client's default mode.
+"""
+import bisect
+import threading
+from typing import Dict, List, Sequence, Tuple
+from sqlalchemy import event
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _format_labels(key: LabelKey, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(k)} {v}" for k, v in items]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = value
+
+class Histogram(Metric):
+    kind = "histogram"
+    DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[LabelKey, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, (list(v[0]), v[1], v[2])) for k, v in self._values.items()]
+        lines = self.header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(list(self.buckets) + ["+Inf"], counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', str(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+REGISTRY: List[Metric] = []
+
+def render_latest() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# --- SQL statement counting ---
+_statements = threading.local()
+
+def statements_issued() -> int:
+    """Statements executed on the current thread since it started (diff two readings to scope a unit of work)."""
+    return getattr(_statements, "count", 0)
+
+def instrument_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count_statement(conn, cursor, statement, parameters, context, executemany):
+        _statements.count = getattr(_statements, "count", 0) + 1
+        DB_STATEMENTS.inc()
+
+# --- Pulse pipeline metrics ---
+DB_STATEMENTS = Counter("continuum_db_statements_total", "SQL statements executed.")
+USERS_SCANNED = Counter("pulse_users_scanned_total", "Users evaluated by the escalation sweep.")
+GRACE_PERIOD_USERS = Counter("pulse_grace_period_users_total", "Swept users found inside their grace period.")
+ESCALATIONS = Counter("pulse_escalations_total", "Escalations triggered, by tier.")
+NOTIFICATIONS = Counter("pulse_notifications_total", "Outbox deliveries, by result (sent, retry, failed).")
+SWEEP_DURATION = Histogram("pulse_sweep_duration_seconds", "Wall time of a full escalation sweep.")
+SWEEP_STATEMENTS = Gauge("pulse_sweep_sql_statements", "SQL statements issued by the most recent sweep.")
+USER_PROCESSING = Histogram(
+    "pulse_user_processing_seconds", "Time to evaluate (and escalate) one user in the sweep.",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1)
+)
+SCHEDULER_LAG = Gauge("pulse_scheduler_lag_seconds", "Delay between a job's scheduled run time and its start, by job.")
+SQLITE_WRITE_LOCK_WAIT = Histogram(
+    "sqlite_write_lock_wait_seconds", "Time a connection waited for the single-writer lock (SQLITE_SINGLE_WRITER).",
+    buckets=(0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+)
+SQLITE_WRITE_LOCK_TIMEOUTS = Counter("sqlite_write_lock_timeouts_total", "Writes that gave up on the single-writer lock and went ahead without it.")
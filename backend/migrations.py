@@ -0,0 +1,300 @@
+"""
+Versioned schema migrations.
+
+Each step in MIGRATIONS runs once per database, in order, and is recorded in
+schema_migrations. When the database is current, startup costs a single
+`SELECT max(version)`: no reflection, no DDL.
+
+Workers booting at the same time take turns: every step runs in its own
+transaction behind a database-wide lock (a Postgres advisory lock, or SQLite's
+write lock via BEGIN IMMEDIATE) and re-reads the version once it holds the lock,
+so a step another worker just applied is skipped rather than run twice.
+
+Adding a change: append a step with the next version number. New tables need a
+step too (create_tables), since create_all only runs for a brand-new database.
+
+    python -m backend.migrations           # apply pending steps
+    python -m backend.migrations status    # current vs latest version
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+from sqlalchemy import inspect, literal, text
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlmodel import Field, Session, SQLModel
+import backend.estate_models, backend.pulse_models  # every table has to be on the metadata
+
+# How long a worker waits for another one's migration before giving up
+LOCK_TIMEOUT_SECONDS = float(os.getenv("MIGRATION_LOCK_TIMEOUT_SECONDS", "600"))
+# Arbitrary, but fixed: every worker must ask for the same advisory lock
+PG_LOCK_KEY = 4_711_230_519
+
+class SchemaMigration(SQLModel, table=True):
+    __tablename__ = "schema_migrations"
+    version: int = Field(primary_key=True)
+    name: str
+    applied_at: datetime = Field(default_factory=datetime.utcnow)
+
+# --- Step helpers ---
+
+def create_tables(session: Session, *names: str):
+    """Creates the given model tables (and their indexes) if missing."""
+    tables = [SQLModel.metadata.tables[name] for name in names] if names else None
+    SQLModel.metadata.create_all(session.connection(), tables=tables)
+
+def add_columns(session: Session, table_name: str, *column_names: str):
+    """
+    Adds model columns an older database lacks. The DDL comes from the model
+    (type and scalar default rendered for the current dialect), so the same step
+    works on SQLite and Postgres.
+    """
+    connection = session.connection()
+    dialect = connection.dialect
+    existing = {c["name"] for c in inspect(connection).get_columns(table_name)}
+    table = SQLModel.metadata.tables[table_name]
+    for name in column_names:
+        if name in existing:
+            continue
+        column = table.c[name]
+        ddl = f"{column.type.compile(dialect=dialect)}"
+        default = column.default.arg if column.default is not None and column.default.is_scalar else None
+        if default is not None:
+            ddl += f" DEFAULT {literal(default).compile(dialect=dialect, compile_kwargs={'literal_binds': True})}"
+            if not column.nullable:
+                ddl += " NOT NULL"
+        print(f"🔧 Migrating: Adding column {name} to {table_name}")
+        session.execute(text(f'ALTER TABLE {table_name} ADD COLUMN "{name}" {ddl}'))
+
+def create_index(session: Session, name: str, table: str, columns: str, unique: bool = False):
+    session.execute(text(f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+
+# --- Steps ---
+# Databases from before this runner start at version 0 and replay every step;
+# each one is written to be a no-op where its change is already in place.
+
+def _base_schema(session: Session):
+    create_tables(session)
+
+def _estate_columns(session: Session):
+    add_columns(session, "assets", "valuation", "status", "ownershipDetails", "documents")
+    add_columns(session, "subscriptions", "cycle", "difficulty", "paymentMethod")
+    add_columns(session, "documents", "name", "status", "location")
+    add_columns(session, "utilities", "location")
+
+def _pulse_settings_columns(session: Session):
+    add_columns(
+        session, "pulse_settings",
+        "checkin_token", "ghost_mode_until", "pet_protocol_enabled", "pet_details",
+        "safety_timer_active_until", "legacy_heartbeat_enabled", "medical_safe_pass_enabled",
+        "location_vault_enabled", "last_known_location_lat", "last_known_location_lon",
+        "last_known_location_time", "biometric_extension_enabled", "biometric_extension_hours"
+    )
+
+def _pulse_contact_columns(session: Session):
+    add_columns(session, "pulse_contacts", "individual_delay_hours", "notify_on_safety_timer", "role", "relation", "notes", "avatar")
+
+def _pulse_state_projection(session: Session):
+    add_columns(session, "pulse_state", "settings_version", "tiers_version", "timers_version")
+    # Fill the projection from history once
+    if session.exec(text("SELECT 1 FROM pulse_state LIMIT 1")).first() is None:
+        from backend.pulse_state import rebuild
+        written = rebuild(session)
+        if written:
+            print(f"🔧 Migrating: Built pulse_state for {written} users from history")
+
+def _next_due(session: Session):
+    # Lets the pulse sweep only touch overdue users
+    add_columns(session, "pulse_settings", "next_due_at")
+    create_index(session, "ix_pulse_settings_next_due_at", "pulse_settings", "next_due_at")
+    from backend.pulse_logic import backfill_next_due
+    backfill_next_due(session)
+
+def _token_indexes(session: Session):
+    # Public token lookups (portal, magic link) go through unique indexes
+    for index_name, table, column in (
+        ("ix_pulse_settings_checkin_token", "pulse_settings", "checkin_token"),
+        ("ix_pulse_contacts_portal_token", "pulse_contacts", "portal_token"),
+    ):
+        try:
+            with session.begin_nested():
+                create_index(session, index_name, table, column, unique=True)
+        except DBAPIError as e:
+            # Duplicate tokens in old data: leave unindexed rather than refuse to boot
+            print(f"⚠️ Migration Error creating {index_name}: {e}")
+
+def _keyset_indexes(session: Session):
+    # Keyset pagination for history and messages
+    create_index(session, "ix_pulse_checkins_user_timestamp", "pulse_checkins", "user_id, timestamp, id")
+    create_index(session, "ix_pulse_messages_user_sent_at", "pulse_messages", "user_id, sent_at, id")
+
+def _model_indexes(session: Session):
+    # Every index declared on the models (user_id on each per-user table, hot-path composites)
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            if not index.unique:
+                index.create(session.connection(), checkfirst=True)
+
+def _estate_delta_sync(session: Session):
+    add_columns(session, "estates", "version", "vault_manifest")
+    create_tables(session, "estate_vault_chunks")
+
+def _vault_blobs(session: Session):
+    # Vault bytes move to the blob store (backend/vault_blobs.py); the tables keep manifests
+    from backend.blob_store import blob_store
+    from backend.estate_sync import register_chunks
+    from backend.vault_blobs import dump_manifest, store_bytes
+    add_columns(session, "estate_vault_chunks", "size")
+    add_columns(session, "pulse_vault", "content_manifest", "content_size")
+
+    # One row at a time: a vault can be large, and only one is held in memory
+    chunk_columns = {c["name"] for c in inspect(session.connection()).get_columns("estate_vault_chunks")}
+    if "data" in chunk_columns:
+        after = 0
+        while row := session.execute(text(
+            "SELECT id, data FROM estate_vault_chunks WHERE id > :after ORDER BY id LIMIT 1"
+        ), {"after": after}).first():
+            blob_store.put(row.data)
+            session.execute(text("UPDATE estate_vault_chunks SET size = :size WHERE id = :id"),
+                            {"size": len(row.data), "id": row.id})
+            after = row.id
+        session.execute(text("ALTER TABLE estate_vault_chunks DROP COLUMN data"))
+
+    while row := session.execute(text(
+        "SELECT id, user_id, encrypted_vault FROM estates WHERE length(encrypted_vault) > 0 LIMIT 1"
+    )).first():
+        chunks = store_bytes(bytes(row.encrypted_vault))
+        register_chunks(session, row.user_id, chunks)
+        session.execute(text("UPDATE estates SET vault_manifest = :manifest, encrypted_vault = :empty WHERE id = :id"),
+                        {"manifest": dump_manifest([h for h, _ in chunks]), "empty": b"", "id": row.id})
+
+    while row := session.execute(text(
+        "SELECT id, encrypted_content FROM pulse_vault WHERE length(encrypted_content) > 0 LIMIT 1"
+    )).first():
+        content = bytes(row.encrypted_content)
+        chunks = store_bytes(content)
+        session.execute(text(
+            "UPDATE pulse_vault SET content_manifest = :manifest, content_size = :size, encrypted_content = :empty WHERE id = :id"
+        ), {"manifest": dump_manifest([h for h, _ in chunks]), "size": len(content), "empty": b"", "id": row.id})
+
+def _compressed_text(session: Session):
+    # Compressed values are bytes. SQLite stores them in the existing TEXT columns
+    # as they are; Postgres needs bytea. Existing rows are compressed afterwards,
+    # in the background (backend/compression.py)
+    create_tables(session, "compression_dictionaries")
+    if session.connection().dialect.name == "postgresql":
+        from backend.compression import COLUMNS
+        for name in COLUMNS:
+            table, column = name.split(".")
+            types = {c["name"]: c["type"] for c in inspect(session.connection()).get_columns(table)}
+            if types[column].python_type is bytes:
+                continue  # created as bytea already
+            session.execute(text(
+                f'ALTER TABLE {table} ALTER COLUMN "{column}" TYPE bytea USING convert_to("{column}", \'UTF8\')'
+            ))
+
+def _search_index(session: Session):
+    # Filled from Python rather than SQL: some of the indexed columns are compressed
+    from backend.search import create_index, reindex
+    create_index(session)
+    reindex(session)
+
+def _safety_timer_poll_index(session: Session):
+    # Workers poll for timers started elsewhere by started_at, not by id
+    create_index(session, "ix_pulse_safety_timers_started_at", "pulse_safety_timers", "started_at")
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Session], None]]] = [
+    (1, "base schema", _base_schema),
+    (2, "estate columns", _estate_columns),
+    (3, "pulse_settings columns (v0.5)", _pulse_settings_columns),
+    (4, "pulse_contacts columns (v0.5)", _pulse_contact_columns),
+    (5, "pulse_state projection and version counters (v0.7)", _pulse_state_projection),
+    (6, "pulse_settings.next_due_at (v0.7)", _next_due),
+    (7, "unique token indexes (v0.7)", _token_indexes),
+    (8, "keyset pagination indexes (v0.7)", _keyset_indexes),
+    (9, "per-user and composite model indexes (v0.8)", _model_indexes),
+    (10, "estate version and chunked vault (v0.8)", _estate_delta_sync),
+    (11, "vault contents to the blob store (v0.8)", _vault_blobs),
+    (12, "compressed text columns (v0.8)", _compressed_text),
+    (13, "full-text search index (v0.8)", _search_index),
+    (14, "safety timer poll index (v0.8)", _safety_timer_poll_index),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# --- Runner ---
+
+def current_version(session: Session) -> Optional[int]:
+    """The applied version, or None when the database predates schema_migrations."""
+    try:
+        return session.exec(text("SELECT max(version) FROM schema_migrations")).one()[0] or 0
+    except DBAPIError:
+        session.rollback()
+        return None
+
+def _lock(session: Session):
+    """Blocks until this transaction holds the migration lock (released on commit/rollback)."""
+    connection = session.connection()
+    if connection.dialect.name == "postgresql":
+        session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PG_LOCK_KEY})
+    elif connection.dialect.name == "sqlite":
+        # Takes the write lock up front; busy_timeout waits for it, we keep retrying past that
+        deadline = time.monotonic() + LOCK_TIMEOUT_SECONDS
+        while True:
+            try:
+                connection.exec_driver_sql("BEGIN IMMEDIATE")
+                return
+            except OperationalError as e:
+                if "locked" not in str(e) or time.monotonic() > deadline:
+                    raise
+                session.rollback()
+                connection = session.connection()
+                print("⏳ Waiting for another worker's migration...")
+
+def upgrade(engine) -> int:
+    """Applies pending steps; returns the number applied."""
+    with Session(engine) as session:
+        version = current_version(session)
+        if version == LATEST_VERSION:
+            return 0
+        if version is not None and version > LATEST_VERSION:
+            print(f"⚠️ Database schema is at version {version}, newer than this code ({LATEST_VERSION})")
+            return 0
+        session.rollback()
+
+        applied = 0
+        for step_version, name, step in MIGRATIONS:
+            _lock(session)
+            create_tables(session, SchemaMigration.__tablename__)
+            if (current_version(session) or 0) >= step_version:
+                session.rollback()  # another worker got here first
+                continue
+            started = time.perf_counter()
+            try:
+                step(session)
+                session.add(SchemaMigration(version=step_version, name=name))
+                session.commit()
+            except Exception:
+                session.rollback()
+                print(f"❌ Migration {step_version} ({name}) failed")
+                raise
+            applied += 1
+            print(f"🔧 Migrated to schema version {step_version}: {name} ({time.perf_counter() - started:.2f}s)")
+        return applied
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply or inspect schema migrations.")
+    parser.add_argument("command", nargs="?", choices=["upgrade", "status"], default="upgrade")
+    args = parser.parse_args()
+
+    from backend.database import engine
+
+    if args.command == "status":
+        with Session(engine) as session:
+            print(f"Schema version {current_version(session) or 0} (latest {LATEST_VERSION})")
+        return
+    applied = upgrade(engine)
+    print(f"✅ Applied {applied} migration(s), schema at version {LATEST_VERSION}")
+
+if __name__ == "__main__":
+    main()
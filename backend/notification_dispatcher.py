@@ -0,0 +1,155 @@
+"""
+Drains the pulse_notifications outbox.
+
+Escalations only write outbox rows; this dispatcher claims them in batches, renders
+each batch in one pass over the compiled email template, delivers it on a bounded
+thread pool and records per-message status. Failed sends are
+retried with exponential backoff until NOTIFY_MAX_ATTEMPTS, then marked 'failed'.
+Claims are plain conditional UPDATEs, so several workers can dispatch at once.
+"""
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from sqlalchemy import update
+from sqlmodel import Session, select
+from backend.database import engine
+from backend.pulse_models import PulseNotification
+from backend.email_service import email_service
+from backend import clock, metrics
+
+DISPATCH_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "50"))
+DISPATCH_WORKERS = int(os.getenv("NOTIFY_WORKERS", "4"))
+MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "5"))
+BACKOFF_BASE_SECONDS = int(os.getenv("NOTIFY_BACKOFF_SECONDS", "30"))
+# A 'sending' row whose worker died becomes claimable again after this long
+CLAIM_SECONDS = int(os.getenv("NOTIFY_CLAIM_SECONDS", "300"))
+
+executor = ThreadPoolExecutor(max_workers=DISPATCH_WORKERS, thread_name_prefix="notify")
+
+def dispatch_pending(session: Session) -> int:
+    """Delivers everything currently due in the outbox. Returns the number of messages attempted."""
+    attempted = 0
+    while True:
+        batch = claim_batch(session, clock.utcnow(), DISPATCH_BATCH_SIZE)
+        if not batch:
+            return attempted
+
+        results = list(executor.map(deliver, batch, render_batch(batch)))
+        record_results(session, batch, results)
+        attempted += len(batch)
+
+def dispatch_soon(notification_ids: List[int]):
+    """
+    Delivers just these newly queued messages on the dispatcher's pool and returns
+    at once, for callers that mustn't wait on delivery (the safety timer thread).
+    Anything this misses is left to the dispatch job.
+    """
+    if notification_ids:
+        executor.submit(dispatch_ids, list(notification_ids))
+
+def dispatch_ids(notification_ids: List[int]) -> int:
+    """Delivers the given messages if they are still due, and nothing else from the outbox."""
+    try:
+        with Session(engine) as session:
+            batch = claim_batch(session, clock.utcnow(), len(notification_ids), notification_ids)
+            if batch:
+                # Usually already on a pool thread: send here rather than queue behind ourselves
+                results = [deliver(n, html) for n, html in zip(batch, render_batch(batch))]
+                record_results(session, batch, results)
+            return len(batch)
+    except Exception as e:
+        print(f"ERROR dispatching notifications {notification_ids}: {e}")
+        return 0
+
+def claim_batch(session: Session, now: datetime, limit: int, notification_ids: Optional[List[int]] = None) -> List[dict]:
+    """Marks up to `limit` due rows (of `notification_ids`, if given) as 'sending' for this call and returns them as plain dicts."""
+    claim = uuid.uuid4().hex
+    due_ids = (
+        select(PulseNotification.id)
+        .where(
+            PulseNotification.status.in_(["pending", "sending"]),
+            PulseNotification.next_attempt_at <= now
+        )
+        .order_by(PulseNotification.next_attempt_at)
+        .limit(limit)
+    )
+    if notification_ids is not None:
+        due_ids = due_ids.where(PulseNotification.id.in_(notification_ids))
+    session.execute(
+        update(PulseNotification)
+        .where(
+            PulseNotification.id.in_(due_ids),
+            # Re-checked per row, so a concurrent claimer can't take the same message
+            PulseNotification.status.in_(["pending", "sending"]),
+            PulseNotification.next_attempt_at <= now
+        )
+        .values(status="sending", claimed_by=claim, next_attempt_at=now + timedelta(seconds=CLAIM_SECONDS))
+    )
+    session.commit()
+
+    # Detach into dicts: the pool threads must not share this session
+    claimed = session.exec(
+        select(PulseNotification).where(
+            PulseNotification.claimed_by == claim,
+            PulseNotification.status == "sending"
+        )
+    ).all()
+    return [n.model_dump() for n in claimed]
+
+def render_batch(batch: List[dict]) -> List[Optional[str]]:
+    """The batch's HTML in one render_many call; None for each if that fails, so deliver renders them one by one."""
+    try:
+        return email_service.render_many([
+            {
+                "recipient_name": n["recipient_name"], "subject": n["subject"], "body": n["body"],
+                "user_id": n["user_id"], "action_url": n["action_url"], "action_label": n["action_label"]
+            }
+            for n in batch
+        ])
+    except Exception as e:
+        print(f"⚠️ [NOTIFY] Batch render failed, rendering messages one by one: {e}")
+        return [None] * len(batch)
+
+def deliver(notification: dict, html: Optional[str] = None) -> Tuple[int, Optional[str]]:
+    """Sends one message, pre-rendered or not. Returns (id, error) with error None on success."""
+    try:
+        if html is not None:
+            email_service.send_rendered(notification["to_address"], notification["subject"], html)
+            return notification["id"], None
+        email_service.send_email(
+            to_email=notification["to_address"],
+            recipient_name=notification["recipient_name"],
+            subject=notification["subject"],
+            body=notification["body"],
+            user_id=notification["user_id"],
+            action_url=notification["action_url"],
+            action_label=notification["action_label"] or "View Status"
+        )
+        return notification["id"], None
+    except Exception as e:
+        return notification["id"], str(e)
+
+def record_results(session: Session, batch: List[dict], results: List[Tuple[int, Optional[str]]]):
+    now = clock.utcnow()
+    attempts = {n["id"]: n["attempts"] + 1 for n in batch}
+    updates = []
+    for notification_id, error in results:
+        attempt = attempts[notification_id]
+        row = {"id": notification_id, "attempts": attempt, "last_error": error, "next_attempt_at": now, "sent_at": None}
+        if error is None:
+            row.update(status="sent", sent_at=now)
+            metrics.NOTIFICATIONS.inc(result="sent")
+        elif attempt >= MAX_ATTEMPTS:
+            print(f"❌ [NOTIFY] Giving up on notification {notification_id} after {attempt} attempts: {error}")
+            row.update(status="failed")
+            metrics.NOTIFICATIONS.inc(result="failed")
+        else:
+            row.update(status="pending", next_attempt_at=now + timedelta(seconds=BACKOFF_BASE_SECONDS * 2 ** (attempt - 1)))
+            metrics.NOTIFICATIONS.inc(result="retry")
+        updates.append(row)
+
+    # ORM bulk UPDATE by primary key: one executemany for the whole batch
+    session.execute(update(PulseNotification), updates)
+    session.commit()
@@ -0,0 +1,78 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+Pages are fetched with `WHERE (k1, k2) < (:last_k1, :last_k2) ORDER BY k1, k2 LIMIT n`
+instead of OFFSET, so page N costs the same as page 1 when an index covers
+(user_id, k1, k2). Cursors are opaque base64url JSON of the last row's keys.
+
+List endpoints opt in when the client passes page_size and/or cursor, and then
+return {"items": [...], "next_cursor": "..." | null}; without them they keep
+returning a plain list.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Generic, List, Optional, Sequence, TypeVar
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import tuple_
+from sqlmodel import Session
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+T = TypeVar("T")
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+def wants_page(page_size: Optional[int], cursor: Optional[str]) -> bool:
+    return page_size is not None or cursor is not None
+
+def encode_cursor(values: Sequence) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, keys: Sequence) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError("wrong number of keys")
+        return typed_keys(keys, values)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def typed_keys(keys: Sequence, values: Sequence) -> list:
+    """Restores the column types JSON flattened (datetimes travel as ISO strings)."""
+    return [
+        datetime.fromisoformat(v) if key.type.python_type is datetime else v
+        for key, v in zip(keys, values)
+    ]
+
+def paginate(
+    session: Session,
+    statement,
+    keys: Sequence,
+    page_size: Optional[int],
+    cursor: Optional[str],
+    descending: bool = False
+) -> dict:
+    """
+    Applies keyset pagination on `keys` (unique together, e.g. (sent_at, id)) to
+    `statement`, which must not already be ordered or limited.
+    """
+    size = min(max(page_size or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+    position = tuple_(*keys)
+    if cursor:
+        after = tuple_(*decode_cursor(cursor, keys))
+        statement = statement.where(position < after if descending else position > after)
+
+    statement = statement.order_by(*(key.desc() if descending else key.asc() for key in keys)).limit(size + 1)
+    rows = session.exec(statement).all()
+
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor([getattr(rows[-1], key.key) for key in keys])
+    return {"items": rows, "next_cursor": next_cursor}
@@ -0,0 +1,86 @@
+"""
+Per-user sweep leases so several workers (uvicorn processes or replicas) can share
+the pulse sweep without escalating the same user twice.
+
+- Postgres: due rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED and stay
+  locked until the batch commits, so other workers simply skip them.
+- SQLite: there are no row locks, so claims are recorded in pulse_sweep_leases and
+  committed up-front. A crashed worker's leases expire after PULSE_LEASE_SECONDS.
+"""
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+from sqlalchemy import delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select
+from backend.pulse_models import PulseSettings, PulseSweepLease
+
+# Unique per process so leases from a restarted worker are never mistaken for ours
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+LEASE_SECONDS = int(os.getenv("PULSE_LEASE_SECONDS", "300"))
+SWEEP_PARTITIONS = int(os.getenv("PULSE_SWEEP_PARTITIONS", "8"))
+
+def partition_order() -> List[int]:
+    """Every partition once, starting at a worker-specific offset so workers fan out instead of colliding."""
+    start = hash(WORKER_ID) % SWEEP_PARTITIONS
+    return [(start + i) % SWEEP_PARTITIONS for i in range(SWEEP_PARTITIONS)]
+
+def due_in_partition(now: datetime, partition: int, limit: int):
+    return (
+        select(PulseSettings.user_id)
+        .where(
+            PulseSettings.enabled == True,
+            PulseSettings.next_due_at < now,
+            PulseSettings.user_id % SWEEP_PARTITIONS == partition
+        )
+        .order_by(PulseSettings.next_due_at)
+        .limit(limit)
+    )
+
+def claim_due_users(session: Session, now: datetime, partition: int, limit: int) -> List[int]:
+    """
+    Claims up to `limit` due users in a partition for this worker.
+    The claim is held until release_leases() + commit (or, on Postgres, just the commit).
+    """
+    if session.get_bind().dialect.name == "postgresql":
+        statement = due_in_partition(now, partition, limit).with_for_update(skip_locked=True)
+        return list(session.exec(statement))
+
+    candidates = list(session.exec(due_in_partition(now, partition, limit)))
+    if not candidates:
+        return []
+
+    # Take free or expired leases only; a live lease held by another worker is left alone
+    expires_at = now + timedelta(seconds=LEASE_SECONDS)
+    statement = sqlite_insert(PulseSweepLease).values([
+        {"user_id": user_id, "owner": WORKER_ID, "expires_at": expires_at}
+        for user_id in candidates
+    ])
+    statement = statement.on_conflict_do_update(
+        index_elements=[PulseSweepLease.user_id],
+        set_={"owner": statement.excluded.owner, "expires_at": statement.excluded.expires_at},
+        where=PulseSweepLease.expires_at < now
+    )
+    session.execute(statement)
+    session.commit()
+
+    return list(session.exec(
+        select(PulseSweepLease.user_id).where(
+            PulseSweepLease.owner == WORKER_ID,
+            PulseSweepLease.user_id.in_(candidates)
+        )
+    ))
+
+def release_leases(session: Session, user_ids: List[int]):
+    """Drops this worker's leases (no commit; released together with the batch's work)."""
+    if session.get_bind().dialect.name == "postgresql" or not user_ids:
+        return
+    session.execute(
+        delete(PulseSweepLease).where(
+            PulseSweepLease.owner == WORKER_ID,
+            PulseSweepLease.user_id.in_(user_ids)
+        )
+    )
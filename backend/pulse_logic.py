@@ -1,118 +1,267 @@
+import os
+import time
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import List, Optional, Tuple
+from sqlalchemy import and_, func, update
 from sqlmodel import Session, select, col
 from backend.pulse_models import (
     PulseSettings, PulseCheckin, PulseEscalationTier, 
-    PulseContact, PulseEscalationLog, PulseMessage
+    PulseContact, PulseEscalationLog, PulseMessage, PulseNotification,
+    PulseSafetyTimer, PulseState
 )
+from backend.pulse_state import apply_checkin, apply_escalation
+from backend.email_templates import registry
+from backend import clock, metrics
+from backend.pulse_leases import partition_order, claim_due_users, release_leases
+
+# Rows fetched per round trip while streaming the sweep
+SWEEP_CHUNK_SIZE = int(os.getenv("PULSE_SWEEP_CHUNK_SIZE", "500"))
+MAX_TIER = 4
+ESCALATION_RETRY_MINUTES = int(os.getenv("PULSE_ESCALATION_RETRY_MINUTES", "5"))
 
 def check_and_escalate_all(session: Session):
     """
     Main entry point for the scheduler.
-    Iterates through all users with Pulse enabled and checks/escalates status.
+    Only looks at users whose indexed next_due_at has passed, so the cost of a sweep
+    scales with the number of overdue users rather than the number of enabled users.
+    Users are claimed in batches per partition, so any number of workers can run
+    this concurrently without double escalations.
     """
-    print(f"[{datetime.utcnow()}] 💓 Running Pulse Health Check...")
-    
-    # Get all enabled settings
-    statement = select(PulseSettings).where(PulseSettings.enabled == True)
-    all_settings = session.exec(statement).all()
-    
-    for settings in all_settings:
+    now = clock.utcnow()
+    print(f"[{now}] 💓 Running Pulse Health Check...")
+    started, statements_before = time.perf_counter(), metrics.statements_issued()
+
+    for partition in partition_order():
+        while True:
+            user_ids = claim_due_users(session, now, partition, SWEEP_CHUNK_SIZE)
+            if not user_ids:
+                break
+            sweep_batch(session, user_ids, now)
+
+    metrics.SWEEP_DURATION.observe(time.perf_counter() - started)
+    metrics.SWEEP_STATEMENTS.set(metrics.statements_issued() - statements_before)
+
+def sweep_batch(session: Session, user_ids: List[int], now: datetime):
+    """
+    Evaluates a batch of claimed users and commits once, which also releases the claim.
+    Each escalation runs in a savepoint so one failing user doesn't roll back the others.
+    """
+    rescheduled = []
+    for row in session.exec(sweep_statement(user_ids)).all():
+        started = time.perf_counter()
+        metrics.USERS_SCANNED.inc()
+        state = sweep_row_state(row)
+        escalation = next_escalation(now, **state)
+        if not escalation:
+            # Woken early (e.g. a tier delay changed): just move the user's due time
+            if in_grace_period(now, **state):
+                metrics.GRACE_PERIOD_USERS.inc()
+            rescheduled.append({"user_id": row.user_id, "next_due_at": next_due_time(**state)})
+            metrics.USER_PROCESSING.observe(time.perf_counter() - started)
+            continue
+
+        tier_number, reference_time = escalation
         try:
-            process_user_pulse(session, settings)
+            with session.begin_nested():
+                trigger_escalation(session, row.user_id, tier_number, str(reference_time), commit=False)
         except Exception as e:
-            print(f"ERROR processing user {settings.user_id}: {e}")
+            print(f"ERROR processing user {row.user_id}: {e}")
+            # Back off instead of re-claiming the user in this same sweep
+            rescheduled.append({"user_id": row.user_id, "next_due_at": now + timedelta(minutes=ESCALATION_RETRY_MINUTES)})
+        metrics.USER_PROCESSING.observe(time.perf_counter() - started)
 
-def process_user_pulse(session: Session, settings: PulseSettings):
-    user_id = settings.user_id
-    
-    # 1. Get last check-in
-    statement = select(PulseCheckin).where(PulseCheckin.user_id == user_id).order_by(PulseCheckin.timestamp.desc())
-    last_checkin = session.exec(statement).first()
-    
-    last_checkin_time = last_checkin.timestamp if last_checkin else datetime.min
-    
-    # 2. Calculate Deadlines
-    frequency_delta = timedelta(days=settings.frequency_days)
-    grace_delta = timedelta(hours=settings.grace_period_hours)
-    
-    soft_deadline = last_checkin_time + frequency_delta
-    hard_deadline = soft_deadline + grace_delta
-    
-    now = datetime.utcnow()
-    
-    # If within safe zone, do nothing (or reset escalation if needed)
-    if now < soft_deadline:
-        return
-        
-    # If in Grace Period (Overdue but not Escalating)
-    if soft_deadline < now < hard_deadline:
-        # TODO: Send "Soft Nudge" to USER if not sent recently
-        # print(f"User {user_id} is in Grace Period (Overdue)")
-        return
-        
-    # 3. Escalation Logic (Past Hard Deadline)
-    # Check the Escalation Log to see what we've already done *for this specific outage*
-    # We define "this outage" as any log created AFTER the last valid check-in
-    
-    log_stmt = select(PulseEscalationLog).where(
-        PulseEscalationLog.user_id == user_id,
-        PulseEscalationLog.triggered_at > last_checkin_time
-    ).order_by(PulseEscalationLog.tier_number.desc())
-    
-    last_log = session.exec(log_stmt).first()
-    
-    current_tier_number = last_log.tier_number if last_log else 0
-    
-    # Decide if we need to escalate to the NEXT tier
+    if rescheduled:
+        session.execute(update(PulseSettings), rescheduled)
+    release_leases(session, user_ids)
+    session.commit()
+
+def sweep_statement(user_ids: Optional[List[int]] = None):
+    """
+    One row per enabled user with everything the escalation decision needs:
+    latest check-in and current outage tier (both from the pulse_state projection)
+    and the delay of the next tier definition, if one exists.
+    Passing user_ids restricts every subquery, not just the outer select.
+    """
+    def restrict(statement, column):
+        return statement.where(column.in_(user_ids)) if user_ids is not None else statement
+
+    # First definition of each (user, tier) pair, matching the per-user `.first()` lookup
+    tier_defs = (
+        restrict(select(
+            PulseEscalationTier.user_id,
+            PulseEscalationTier.tier_number,
+            PulseEscalationTier.delay_hours,
+            func.row_number().over(
+                partition_by=(PulseEscalationTier.user_id, PulseEscalationTier.tier_number),
+                order_by=PulseEscalationTier.id
+            ).label("rank")
+        ), PulseEscalationTier.user_id)
+        .subquery("tier_defs")
+    )
+
+    current_tier = func.coalesce(PulseState.current_tier, 0)
+
+    return restrict(
+        select(
+            PulseSettings.user_id,
+            PulseSettings.frequency_days,
+            PulseSettings.grace_period_hours,
+            PulseState.last_checkin_at,
+            PulseState.current_tier,
+            PulseState.current_tier_at.label("current_triggered_at"),
+            tier_defs.c.delay_hours.label("next_tier_delay_hours")
+        )
+        .join(PulseState, PulseState.user_id == PulseSettings.user_id, isouter=True)
+        .join(tier_defs, and_(
+            tier_defs.c.user_id == PulseSettings.user_id,
+            tier_defs.c.tier_number == current_tier + 1,
+            tier_defs.c.rank == 1
+        ), isouter=True)
+        .where(PulseSettings.enabled == True),
+        PulseSettings.user_id
+    )
+
+def sweep_row_state(row) -> dict:
+    """Maps a sweep_statement row onto the keyword arguments of next_escalation/next_due_time."""
+    return dict(
+        last_checkin_time=row.last_checkin_at,
+        frequency_days=row.frequency_days,
+        grace_period_hours=row.grace_period_hours,
+        current_tier_number=row.current_tier or 0,
+        current_triggered_at=row.current_triggered_at,
+        next_tier_delay_hours=row.next_tier_delay_hours,
+    )
+
+def in_grace_period(now: datetime, last_checkin_time: Optional[datetime], frequency_days: int, grace_period_hours: int, **_) -> bool:
+    """Overdue (past the soft deadline) but not yet escalating."""
+    soft_deadline = (last_checkin_time or datetime.min) + timedelta(days=frequency_days)
+    return soft_deadline <= now < hard_deadline_for(last_checkin_time, frequency_days, grace_period_hours)
+
+def hard_deadline_for(last_checkin_time: Optional[datetime], frequency_days: int, grace_period_hours: int) -> datetime:
+    soft_deadline = (last_checkin_time or datetime.min) + timedelta(days=frequency_days)
+    return soft_deadline + timedelta(hours=grace_period_hours)
+
+def next_escalation(
+    now: datetime,
+    last_checkin_time: Optional[datetime],
+    frequency_days: int,
+    grace_period_hours: int,
+    current_tier_number: int,
+    current_triggered_at: Optional[datetime],
+    next_tier_delay_hours: Optional[int]
+) -> Optional[Tuple[int, datetime]]:
+    """
+    Pure escalation decision shared by the sweep and the single-user path.
+    Returns (tier_number, reference_time) when the next tier should fire, otherwise None.
+    """
+    # 1. Calculate Deadlines
+    hard_deadline = hard_deadline_for(last_checkin_time, frequency_days, grace_period_hours)
+
+    # Within safe zone or grace period (Overdue but not Escalating)
+    # TODO: Send "Soft Nudge" to USER during the grace period if not sent recently
+    if now < hard_deadline:
+        return None
+
+    # 2. Escalation Logic (Past Hard Deadline)
     next_tier_number = current_tier_number + 1
-    
-    if next_tier_number > 4:
+    if next_tier_number > MAX_TIER:
         # We've reached max escalation
-        return
+        return None
 
-    # Get the definition for the next tier
-    tier_def = session.exec(
-        select(PulseEscalationTier).where(
-            PulseEscalationTier.user_id == user_id,
-            PulseEscalationTier.tier_number == next_tier_number
-        )
-    ).first()
-    
-    # If Tier definition doesn't exist, we can't escalate to it.
-    if not tier_def:
-        # Try to skip? Or stop? For now, we stop.
-        return
+    # If Tier definition doesn't exist, we can't escalate to it. For now, we stop.
+    if next_tier_delay_hours is None:
+        return None
 
-    # Check timing
     if current_tier_number == 0:
-        # We are just entering Tier 1. 
+        # We are just entering Tier 1.
         # Trigger immediately since we are past hard_deadline
-        trigger_escalation(session, user_id, 1, str(hard_deadline))
-    else:
-        # We are at Tier X, checking if we should upgrade to Tier X+1
-        # Check delay associated with the *previous* tier (or the current one? Plan says "Delay after previous")
-        # Plan: "Tier 2 ... +6 hours". This implies 6 hours after Tier 1.
-        
-        # Get the config for the NEW tier to see its delay
-        # Actually usually 'delay' on Tier 2 means "Wait X hours after Tier 1"
-        
-        delay_hours = tier_def.delay_hours
-        trigger_threshold = last_log.triggered_at + timedelta(hours=delay_hours)
-        
-        if now > trigger_threshold:
-            trigger_escalation(session, user_id, next_tier_number, str(last_log.triggered_at))
-
-def trigger_escalation(session: Session, user_id: int, tier_number: int, reference_time: str):
+        return 1, hard_deadline
+
+    # 'delay' on Tier X+1 means "Wait X hours after Tier X"
+    trigger_threshold = current_triggered_at + timedelta(hours=next_tier_delay_hours)
+    if now > trigger_threshold:
+        return next_tier_number, current_triggered_at
+    return None
+
+def next_due_time(
+    last_checkin_time: Optional[datetime],
+    frequency_days: int,
+    grace_period_hours: int,
+    current_tier_number: int,
+    current_triggered_at: Optional[datetime],
+    next_tier_delay_hours: Optional[int]
+) -> Optional[datetime]:
+    """
+    When the sweep next needs to look at a user: the hard deadline while no tier has fired
+    in this outage, then the next tier's delay after the current one.
+    None parks the user until a check-in, settings or tier change recomputes it.
+    """
+    if current_tier_number >= MAX_TIER or next_tier_delay_hours is None:
+        return None
+
+    hard_deadline = hard_deadline_for(last_checkin_time, frequency_days, grace_period_hours)
+    if current_tier_number == 0:
+        return hard_deadline
+    return max(hard_deadline, current_triggered_at + timedelta(hours=next_tier_delay_hours))
+
+def refresh_next_due(session: Session, user_id: int) -> Optional[datetime]:
+    """Recomputes next_due_at for one user after a settings, tier or escalation change (no commit)."""
+    settings = session.get(PulseSettings, user_id)
+    if not settings:
+        return None
+
+    row = session.exec(sweep_statement([user_id])).first()
+    settings.next_due_at = next_due_time(**sweep_row_state(row)) if row else None
+    session.add(settings)
+    return settings.next_due_at
+
+def record_checkin(session: Session, user_id: int, method: str, note: Optional[str] = None) -> PulseCheckin:
+    """
+    Adds a check-in and pushes the user's next_due_at out to the new hard deadline (no commit).
+    A check-in always starts a fresh outage window, which apply_checkin records in pulse_state.
+    """
+    checkin = PulseCheckin(user_id=user_id, method=method, note=note, timestamp=clock.utcnow())
+    session.add(checkin)
+    apply_checkin(session, checkin)
+
+    settings = session.get(PulseSettings, user_id)
+    if settings and settings.enabled:
+        settings.next_due_at = hard_deadline_for(checkin.timestamp, settings.frequency_days, settings.grace_period_hours)
+        session.add(settings)
+    return checkin
+
+def backfill_next_due(session: Session):
+    """Computes next_due_at for every enabled user from history (used when the column is first added)."""
+    updates = [
+        {"user_id": row.user_id, "next_due_at": next_due_time(**sweep_row_state(row))}
+        for row in session.exec(sweep_statement().execution_options(yield_per=SWEEP_CHUNK_SIZE))
+    ]
+    for start in range(0, len(updates), SWEEP_CHUNK_SIZE):
+        session.execute(update(PulseSettings), updates[start:start + SWEEP_CHUNK_SIZE])
+
+def process_user_pulse(session: Session, settings: PulseSettings):
+    """Evaluates a single user: the same sweep row, restricted to them (primary-key reads on pulse_state)."""
+    row = session.exec(sweep_statement([settings.user_id])).first()
+    if row is None:
+        return
+
+    escalation = next_escalation(clock.utcnow(), **sweep_row_state(row))
+    if escalation:
+        tier_number, reference_time = escalation
+        trigger_escalation(session, settings.user_id, tier_number, str(reference_time))
+
+def trigger_escalation(session: Session, user_id: int, tier_number: int, reference_time: str, commit: bool = True):
     print(f"🚨 [ESCALATION] Triggering Tier {tier_number} for User {user_id} (Ref: {reference_time})")
+    metrics.ESCALATIONS.inc(tier=tier_number)
     
     # 1. Log the event
     log_entry = PulseEscalationLog(
         user_id=user_id,
         tier_number=tier_number,
-        triggered_at=datetime.utcnow()
+        triggered_at=clock.utcnow()
     )
     session.add(log_entry)
+    apply_escalation(session, log_entry)
     
     # 2. Notify Contacts
     contacts = session.exec(
@@ -125,52 +274,80 @@ def trigger_escalation(session: Session, user_id: int, tier_number: int, referen
         )
     ).all()
     
-    for contact in contacts:
-        send_notification(session, contact, tier_number)
-        
-    session.commit()
+    settings = session.get(PulseSettings, user_id)
+    custom_message = settings.custom_message if settings else None
+    send_notifications(session, contacts, tier_number, custom_message)
 
-from backend.email_service import email_service
-import os
+    # 3. Schedule the next look at this user (next tier delay, or parked at max tier)
+    refresh_next_due(session, user_id)
 
-def send_notification(session: Session, contact: PulseContact, tier_number: int):
-    print(f"   --> 📧 Generating Tier {tier_number} Alert for {contact.name}...")
-    
+    if commit:
+        session.commit()
+
+def send_notifications(session: Session, contacts: List[PulseContact], tier_number: int, custom_message: Optional[str] = None):
+    """Queues a tier alert for every contact; the whole fan-out renders in one render_messages call."""
+    links = [portal_link_for(contact) for contact in contacts]
+    rendered = registry.render_messages(
+        f"tier_{tier_number}", "email", custom_message, [{"action_url": link} for link in links]
+    )
+    for contact, portal_link, (subject, body) in zip(contacts, links, rendered):
+        print(f"   --> 📧 Generating Tier {tier_number} Alert for {contact.name}...")
+        enqueue_email(session, contact, subject, body, portal_link, log_message=f"[System Alert Tier {tier_number}] {subject}")
+
+def notify_safety_contacts(session: Session, timer: PulseSafetyTimer) -> List[PulseNotification]:
+    """Alerts every contact opted into safety timers that `timer` expired (no commit). Returns the queued notifications."""
+    settings = session.get(PulseSettings, timer.user_id)
+    contacts = session.exec(
+        select(PulseContact).where(
+            PulseContact.user_id == timer.user_id,
+            PulseContact.notify_on_safety_timer == True
+        )
+    ).all()
+
+    links = [portal_link_for(contact) for contact in contacts]
+    expires_at = timer.expires_at.strftime("%Y-%m-%d %H:%M:%S")
+    rendered = registry.render_messages(
+        "safety_timer", "email", settings.custom_message if settings else None,
+        [{"purpose": timer.purpose, "expires_at": expires_at, "action_url": link} for link in links]
+    )
+    notifications = []
+    for contact, portal_link, (subject, body) in zip(contacts, links, rendered):
+        print(f"   --> 📧 Generating Safety Timer Alert for {contact.name}...")
+        notifications.append(enqueue_email(session, contact, subject, body, portal_link, log_message=f"[Safety Timer] {subject}"))
+    return notifications
+
+def portal_link_for(contact: PulseContact) -> str:
     frontend_url = os.getenv("FRONTEND_URL", "http://localhost:5173")
-    portal_link = f"{frontend_url}/portal/{contact.portal_token}"
-    
-    subject = ""
-    body = ""
-    
-    if tier_number == 1:
-        subject = "Continuum Pulse: Standard Welfare Check"
-        body = f"We have not received a check-in from the user within the standard timeframe. As a Tier 1 contact, simply confirming you have heard from them recently will reset the timer."
-    elif tier_number == 2:
-        subject = "Continuum Pulse: Level 2 Escalation"
-        body = f"The user has missed the standard check-in window by a significant margin. Please attempt to contact them directly."
-    elif tier_number == 3:
-        subject = "Continuum Pulse: URGENT - Medical/Legal Release"
-        body = f"We have escalated to Tier 3. Critical medical directives and entry codes have now been unlocked for your viewing in the Guardian Portal."
-    elif tier_number == 4:
-        subject = "Continuum Pulse: EMERGENCY - Full Vault Access"
-        body = f"This is a Tier 4 Emergency. Full access to the digital vault has been granted. Please verify the user's safety immediately."
-
-    # 1. Send Real Email
-    email_service.send_email(
-        to_email=contact.email, 
+    return f"{frontend_url}/portal/{contact.portal_token}"
+
+def enqueue_email(session: Session, contact: PulseContact, subject: str, body: str, portal_link: str, log_message: str) -> PulseNotification:
+    # 1. Queue the email in the outbox (same transaction as the caller's state change).
+    # notification_dispatcher delivers it, so a slow render/send never holds this transaction open.
+    notification = PulseNotification(
+        user_id=contact.user_id,
+        contact_id=contact.id,
+        channel="email",
+        to_address=contact.email,
         recipient_name=contact.name,
         subject=subject,
         body=body,
-        user_id=contact.user_id,
         action_url=portal_link,
-        action_label="Open Guardian Portal"
+        action_label="Open Guardian Portal",
+        # Nothing to deliver to: record it as failed rather than retrying forever
+        status="pending" if contact.email else "failed",
+        last_error=None if contact.email else "Contact has no email address",
+        next_attempt_at=clock.utcnow(),
+        created_at=clock.utcnow()
     )
+    session.add(notification)
 
     # 2. Log Communication
     log_msg = PulseMessage(
         user_id=contact.user_id,
         contact_id=contact.id,
         direction="user_to_contact", # System acting on behalf of user
-        message=f"[System Alert Tier {tier_number}] {subject}"
+        message=log_message,
+        sent_at=clock.utcnow()
     )
     session.add(log_msg)
+    return notification
@@ -1,6 +1,8 @@
 from typing import Optional
 from datetime import datetime
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
+from backend.compression import CompressedText
 
 class PulseSettings(SQLModel, table=True):
     __tablename__ = "pulse_settings"
@@ -12,7 +14,7 @@ class PulseSettings(SQLModel, table=True):
     elderly_mode: bool = Field(default=False)
     notify_contacts_on_checkin: bool = Field(default=False)
     send_weekly_summary: bool = Field(default=False)
-    checkin_token: Optional[str] = Field(default=None) # Permanent magic link token
+    checkin_token: Optional[str] = Field(default=None, unique=True, index=True) # Permanent magic link token
     
     # New Compelling Features
     ghost_mode_until: Optional[datetime] = Field(default=None)
@@ -34,16 +36,27 @@ class PulseSettings(SQLModel, table=True):
     biometric_extension_enabled: bool = Field(default=False)
     biometric_extension_hours: int = Field(default=24) # Default 24h extension
 
+    # Scheduler index: when the sweep next needs to look at this user (None = nothing pending)
+    next_due_at: Optional[datetime] = Field(default=None, index=True)
+
 class PulseVault(SQLModel, table=True):
     __tablename__ = "pulse_vault"
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="users.id")
+    user_id: int = Field(foreign_key="users.id", index=True)
     name: str 
-    encrypted_content: bytes
+    # Accepted inline on create/update, then moved to the blob store: stays empty in the database
+    encrypted_content: bytes = Field(default=b"")
     unlock_condition: str # "tier_4_escalation"
+    # JSON array of the content's chunk hashes, in order (backend/vault_blobs.py)
+    content_manifest: Optional[str] = None
+    content_size: int = Field(default=0)
 
 class PulseCheckin(SQLModel, table=True):
     __tablename__ = "pulse_checkins"
+    __table_args__ = (
+        # History pages: WHERE user_id = ? ORDER BY timestamp DESC, id DESC
+        Index("ix_pulse_checkins_user_timestamp", "user_id", "timestamp", "id"),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="users.id")
     timestamp: datetime = Field(default_factory=datetime.utcnow)
@@ -56,15 +69,49 @@ class PulseCheckin(SQLModel, table=True):
 
 class PulseEscalationLog(SQLModel, table=True):
     __tablename__ = "pulse_escalation_log"
+    __table_args__ = (
+        # Outage history per user: WHERE user_id = ? AND triggered_at > ? (highest tier first)
+        Index("ix_pulse_escalation_log_user_triggered", "user_id", "triggered_at", "tier_number"),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="users.id")
     tier_number: int
     triggered_at: datetime = Field(default_factory=datetime.utcnow)
     medical_safe_pass_triggered: bool = Field(default=False)
+
+class PulseState(SQLModel, table=True):
+    """
+    Per-user projection of pulse_checkins + pulse_escalation_log, written in the same
+    transaction as every check-in and escalation (see pulse_state.py).
+    """
+    __tablename__ = "pulse_state"
+    user_id: int = Field(primary_key=True, foreign_key="users.id")
+    last_checkin_at: Optional[datetime] = Field(default=None)
+    last_checkin_method: Optional[str] = Field(default=None)
+
+    # Current outage (all None/0 since the last check-in)
+    outage_started_at: Optional[datetime] = Field(default=None)
+    current_tier: int = Field(default=0)
+    current_tier_at: Optional[datetime] = Field(default=None)
+
+    # Bumped on every change, so readers can tell whether their copy is stale (ETags, see etags.py).
+    # state_version covers the fields above; the others cover the user's settings, tiers and safety timers.
+    state_version: int = Field(default=0)
+    settings_version: int = Field(default=0)
+    tiers_version: int = Field(default=0)
+    timers_version: int = Field(default=0)
+
+class PulseSweepLease(SQLModel, table=True):
+    """Claim on a user for one sweep worker (used where the DB has no SKIP LOCKED, i.e. SQLite)."""
+    __tablename__ = "pulse_sweep_leases"
+    user_id: int = Field(primary_key=True, foreign_key="users.id")
+    owner: str
+    expires_at: datetime
+
 class PulseEscalationTier(SQLModel, table=True):
     __tablename__ = "pulse_escalation_tiers"
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="users.id")
+    user_id: int = Field(foreign_key="users.id", index=True)
     tier_number: int # 1, 2, 3, 4
     delay_hours: int = Field(default=6)
     notification_method: str = Field(default="email") # 'email', 'sms', 'both'
@@ -72,7 +119,7 @@ class PulseEscalationTier(SQLModel, table=True):
 class PulseContact(SQLModel, table=True):
     __tablename__ = "pulse_contacts"
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="users.id")
+    user_id: int = Field(foreign_key="users.id", index=True)
     
     # Global Contact Fields
     name: str
@@ -86,7 +133,7 @@ class PulseContact(SQLModel, table=True):
     # Pulse Specific (Optional - only if they are a Guardian)
     tier_id: Optional[int] = Field(default=None, foreign_key="pulse_escalation_tiers.id")
     priority: int = Field(default=1)
-    portal_token: Optional[str] = Field(default=None)
+    portal_token: Optional[str] = Field(default=None, unique=True, index=True)
     portal_token_expires: Optional[datetime] = Field(default=None)
     can_view_history: bool = Field(default=True)
     
@@ -96,6 +143,12 @@ class PulseContact(SQLModel, table=True):
 
 class PulseSafetyTimer(SQLModel, table=True):
     __tablename__ = "pulse_safety_timers"
+    __table_args__ = (
+        # The user's running timer: WHERE user_id = ? AND is_active
+        Index("ix_pulse_safety_timers_user_active", "user_id", "is_active"),
+        # Workers polling for timers started elsewhere: WHERE started_at >= ?
+        Index("ix_pulse_safety_timers_started_at", "started_at"),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="users.id")
     started_at: datetime = Field(default_factory=datetime.utcnow)
@@ -105,18 +158,48 @@ class PulseSafetyTimer(SQLModel, table=True):
 
 class PulseMessage(SQLModel, table=True):
     __tablename__ = "pulse_messages"
+    __table_args__ = (
+        # Message pages: WHERE user_id = ? ORDER BY sent_at DESC, id DESC
+        Index("ix_pulse_messages_user_sent_at", "user_id", "sent_at", "id"),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="users.id")
     contact_id: int = Field(foreign_key="pulse_contacts.id")
     direction: str # 'user_to_contact' or 'contact_to_user'
-    message: str
+    message: str = Field(sa_type=CompressedText("pulse_messages.message"))
     sent_at: datetime = Field(default_factory=datetime.utcnow)
     read_at: Optional[datetime] = Field(default=None)
 
+class PulseNotification(SQLModel, table=True):
+    """Transactional outbox: written alongside the escalation, delivered by notification_dispatcher."""
+    __tablename__ = "pulse_notifications"
+    __table_args__ = (
+        Index("ix_pulse_notifications_status_next_attempt", "status", "next_attempt_at"),
+    )
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="users.id")
+    contact_id: Optional[int] = Field(default=None, foreign_key="pulse_contacts.id")
+    channel: str = Field(default="email") # 'email' (sms to follow)
+    to_address: Optional[str] = Field(default=None)
+    recipient_name: str
+    subject: str
+    body: str
+    action_url: Optional[str] = Field(default=None)
+    action_label: Optional[str] = Field(default=None)
+
+    # Delivery state
+    status: str = Field(default="pending") # pending, sending, sent, failed
+    attempts: int = Field(default=0)
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow) # Also the claim expiry while 'sending'
+    claimed_by: Optional[str] = Field(default=None)
+    last_error: Optional[str] = Field(default=None)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    sent_at: Optional[datetime] = Field(default=None)
+
 class PulseCredential(SQLModel, table=True):
     __tablename__ = "pulse_credentials"
     id: Optional[str] = Field(default=None, primary_key=True)  # Credential ID (base64url)
-    user_id: int = Field(foreign_key="users.id")
+    user_id: int = Field(foreign_key="users.id", index=True)
     public_key: str  # COSE Key (base64url)
     sign_count: int = Field(default=0)
     created_at: datetime = Field(default_factory=datetime.utcnow)
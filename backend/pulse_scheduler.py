@@ -1,9 +1,18 @@
-from apscheduler.schedulers.background import BackgroundScheduler
+from datetime import datetime, timezone
 from sqlmodel import Session, create_engine
 from backend.database import engine
 from backend.pulse_logic import check_and_escalate_all
+from backend.notification_dispatcher import dispatch_pending
+from backend import metrics
+import os
 
-scheduler = BackgroundScheduler()
+# Created by start_scheduler; apscheduler isn't imported until then
+scheduler = None
+
+def record_lag(event):
+    """How late each job started relative to its scheduled run time."""
+    lag = datetime.now(timezone.utc) - max(event.scheduled_run_times)
+    metrics.SCHEDULER_LAG.set(max(lag.total_seconds(), 0), job=event.job_id)
 
 def pulse_job():
     """
@@ -12,14 +21,35 @@ def pulse_job():
     with Session(engine) as session:
         check_and_escalate_all(session)
 
+def dispatch_job():
+    """Delivers queued escalation notifications independently of the sweep."""
+    with Session(engine) as session:
+        dispatch_pending(session)
+
+def blob_gc_job():
+    """Deletes vault blobs nothing references any more."""
+    from backend.vault_blobs import collect_garbage
+    with Session(engine) as session:
+        collect_garbage(session)
+
 def start_scheduler():
+    global scheduler
+    if scheduler is None:
+        from apscheduler.events import EVENT_JOB_SUBMITTED
+        from apscheduler.schedulers.background import BackgroundScheduler
+        scheduler = BackgroundScheduler()
+        scheduler.add_listener(record_lag, EVENT_JOB_SUBMITTED)
     # Avoid adding duplicate jobs if reload is active
     if not scheduler.get_jobs():
         # check_and_escalate_all runs every hour (or every minute for testing)
         scheduler.add_job(pulse_job, 'interval', minutes=1, id='pulse_check')
+        scheduler.add_job(dispatch_job, 'interval', seconds=int(os.getenv("NOTIFY_DISPATCH_SECONDS", "5")), id='notification_dispatch')
+        scheduler.add_job(blob_gc_job, 'interval', hours=int(os.getenv("BLOB_GC_HOURS", "24")), id='blob_gc')
         scheduler.start()
         print("⏰ Pulse Scheduler Started")
 
 def stop_scheduler():
+    if scheduler is None or not scheduler.running:
+        return
     scheduler.shutdown()
     print("⏰ Pulse Scheduler Stopped")
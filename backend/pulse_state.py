@@ -0,0 +1,202 @@
+"""
+Maintains pulse_state, the per-user projection of check-in and escalation history.
+
+Writers call apply_checkin / apply_escalation inside their own transaction, so the
+projection can never disagree with the history it summarises. Readers (status,
+portal, the sweep) then need a single primary-key lookup instead of scanning
+pulse_checkins and pulse_escalation_log, which grow without bound.
+
+If the projection is ever lost or suspected wrong, regenerate it from history:
+
+    python -m backend.pulse_state rebuild [--user-id 42 ...]
+"""
+import argparse
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import bindparam, func, insert, or_, union, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from backend.pulse_models import PulseCheckin, PulseEscalationLog, PulseSettings, PulseState
+
+REBUILD_CHUNK_SIZE = 1000
+
+def get_state(session: Session, user_id: int) -> Optional[PulseState]:
+    return session.get(PulseState, user_id)
+
+def _state_for_update(session: Session, user_id: int) -> PulseState:
+    state = session.get(PulseState, user_id)
+    if state is None:
+        try:
+            # Insert now so the version bump below is a plain UPDATE of an existing row
+            with session.begin_nested():
+                state = PulseState(user_id=user_id)
+                session.add(state)
+        except IntegrityError:
+            # A concurrent first write for this user created it
+            state = session.get(PulseState, user_id)
+    return state
+
+def _bump(state: PulseState, column: str = "state_version"):
+    # Incremented in SQL, so two concurrent writers can't both write version n+1
+    setattr(state, column, getattr(PulseState, column) + 1)
+
+def bump_version(session: Session, user_id: int, kind: str):
+    """Marks a user's "settings", "tiers" or "timers" as changed (no commit)."""
+    state = _state_for_update(session, user_id)
+    _bump(state, f"{kind}_version")
+    session.add(state)
+
+def apply_checkin(session: Session, checkin: PulseCheckin):
+    """A check-in closes any outage in progress (no commit)."""
+    state = _state_for_update(session, checkin.user_id)
+    if state.last_checkin_at is None or checkin.timestamp >= state.last_checkin_at:
+        state.last_checkin_at = checkin.timestamp
+        state.last_checkin_method = checkin.method
+        state.outage_started_at = None
+        state.current_tier = 0
+        state.current_tier_at = None
+    _bump(state)
+    session.add(state)
+
+def apply_escalation(session: Session, log_entry: PulseEscalationLog):
+    """Records that a tier fired for the current outage (no commit)."""
+    state = _state_for_update(session, log_entry.user_id)
+    if log_entry.tier_number >= state.current_tier:
+        state.current_tier = log_entry.tier_number
+        state.current_tier_at = log_entry.triggered_at
+        if state.outage_started_at is None:
+            state.outage_started_at = log_entry.triggered_at
+    _bump(state)
+    session.add(state)
+
+def history_statement(user_ids: Optional[List[int]] = None):
+    """
+    One row per user with history, computed the slow way: the latest check-in and
+    the outage since it (highest tier, when it fired, when the outage began).
+    """
+    def restrict(statement, column):
+        return statement.where(column.in_(user_ids)) if user_ids is not None else statement
+
+    users = union(
+        restrict(select(PulseSettings.user_id), PulseSettings.user_id),
+        restrict(select(PulseCheckin.user_id), PulseCheckin.user_id),
+        restrict(select(PulseEscalationLog.user_id), PulseEscalationLog.user_id),
+    ).subquery("users")
+
+    checkins = (
+        restrict(select(
+            PulseCheckin.user_id,
+            PulseCheckin.timestamp,
+            PulseCheckin.method,
+            func.row_number().over(
+                partition_by=PulseCheckin.user_id,
+                order_by=(PulseCheckin.timestamp.desc(), PulseCheckin.id.desc())
+            ).label("rank")
+        ), PulseCheckin.user_id)
+        .subquery("checkins")
+    )
+    last_checkin = select(checkins).where(checkins.c.rank == 1).subquery("last_checkin")
+
+    outage_logs = (
+        restrict(select(
+            PulseEscalationLog.user_id,
+            PulseEscalationLog.tier_number,
+            PulseEscalationLog.triggered_at,
+            func.row_number().over(
+                partition_by=PulseEscalationLog.user_id,
+                order_by=(PulseEscalationLog.tier_number.desc(), PulseEscalationLog.id.desc())
+            ).label("rank"),
+            func.min(PulseEscalationLog.triggered_at).over(
+                partition_by=PulseEscalationLog.user_id
+            ).label("outage_started_at")
+        ), PulseEscalationLog.user_id)
+        .join(last_checkin, last_checkin.c.user_id == PulseEscalationLog.user_id, isouter=True)
+        .where(or_(
+            last_checkin.c.timestamp == None,
+            PulseEscalationLog.triggered_at > last_checkin.c.timestamp
+        ))
+        .subquery("outage_logs")
+    )
+
+    return (
+        select(
+            users.c.user_id,
+            last_checkin.c.timestamp.label("last_checkin_at"),
+            last_checkin.c.method.label("last_checkin_method"),
+            outage_logs.c.outage_started_at,
+            func.coalesce(outage_logs.c.tier_number, 0).label("current_tier"),
+            outage_logs.c.triggered_at.label("current_tier_at")
+        )
+        .join(last_checkin, last_checkin.c.user_id == users.c.user_id, isouter=True)
+        .join(outage_logs, (outage_logs.c.user_id == users.c.user_id) & (outage_logs.c.rank == 1), isouter=True)
+    )
+
+def rebuild(session: Session, user_ids: Optional[List[int]] = None) -> int:
+    """
+    Regenerates pulse_state from history (no commit). Existing rows keep counting
+    versions upwards, so nobody holding an old version mistakes it for current.
+    Returns the number of users written.
+    """
+    existing_stmt = select(PulseState.user_id)
+    if user_ids is not None:
+        existing_stmt = existing_stmt.where(PulseState.user_id.in_(user_ids))
+    existing = set(session.exec(existing_stmt).all())
+
+    bump = (
+        update(PulseState.__table__)
+        .where(PulseState.__table__.c.user_id == bindparam("b_user_id"))
+        .values(
+            last_checkin_at=bindparam("last_checkin_at"),
+            last_checkin_method=bindparam("last_checkin_method"),
+            outage_started_at=bindparam("outage_started_at"),
+            current_tier=bindparam("current_tier"),
+            current_tier_at=bindparam("current_tier_at"),
+            state_version=PulseState.__table__.c.state_version + 1
+        )
+    )
+
+    written = 0
+    updates: List[Dict] = []
+    inserts: List[Dict] = []
+
+    def flush():
+        if updates:
+            session.connection().execute(bump, updates)
+            updates.clear()
+        if inserts:
+            session.execute(insert(PulseState.__table__), inserts)
+            inserts.clear()
+
+    for row in session.exec(history_statement(user_ids).execution_options(yield_per=REBUILD_CHUNK_SIZE)):
+        values = dict(row._mapping)
+        if row.user_id in existing:
+            values["b_user_id"] = values.pop("user_id")
+            updates.append(values)
+        else:
+            inserts.append({**values, "state_version": 1, "settings_version": 0, "tiers_version": 0, "timers_version": 0})
+        written += 1
+        if len(updates) + len(inserts) >= REBUILD_CHUNK_SIZE:
+            flush()
+    flush()
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the pulse_state projection.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild_cmd = sub.add_parser("rebuild", help="regenerate pulse_state from check-in and escalation history")
+    rebuild_cmd.add_argument("--user-id", type=int, nargs="+", help="only these users (default: everyone)")
+    args = parser.parse_args()
+
+    from backend.database import engine
+    from backend.pulse_logic import backfill_next_due
+
+    with Session(engine) as session:
+        started = datetime.utcnow()
+        written = rebuild(session, args.user_id)
+        # next_due_at is derived from the projection, so recompute it too
+        backfill_next_due(session)
+        session.commit()
+        print(f"✅ Rebuilt pulse_state for {written} users in {(datetime.utcnow() - started).total_seconds():.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -1,53 +1,78 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlmodel import Session, select
-from typing import List
-from backend.database import get_session
+from typing import List, Optional, Union
+from backend.database import get_db, Database
 from backend.pulse_models import PulseContact
+from backend.search import index_item, remove_item
+from backend.token_cache import forget_portal_token
+from backend.pagination import Page, paginate, wants_page
 
 router = APIRouter(prefix="/api/contacts", tags=["contacts"])
 
-@router.get("/", response_model=List[PulseContact])
-def get_contacts(user_id: int, session: Session = Depends(get_session)):
-    """Fetch all contacts for the user (both Guardians and Non-Guardians)."""
+def _get_contacts(session: Session, user_id: int, page_size: Optional[int], cursor: Optional[str]):
     statement = select(PulseContact).where(PulseContact.user_id == user_id)
+    if wants_page(page_size, cursor):
+        return paginate(session, statement, (PulseContact.id,), page_size, cursor)
     return session.exec(statement).all()
 
-@router.post("/", response_model=PulseContact)
-def create_contact(user_id: int, contact: PulseContact, session: Session = Depends(get_session)):
-    """Create a new global contact."""
+@router.get("/", response_model=Union[List[PulseContact], Page[PulseContact]])
+async def get_contacts(user_id: int, page_size: Optional[int] = None, cursor: Optional[str] = None, db: Database = Depends(get_db)):
+    """Fetch all contacts for the user (both Guardians and Non-Guardians), or one page of them."""
+    return await db.run_sync(_get_contacts, user_id, page_size, cursor)
+
+def _create_contact(session: Session, user_id: int, contact: PulseContact):
     contact.user_id = user_id
     # Default to no tier if not provided
     if contact.tier_id == 0:
         contact.tier_id = None
         
     session.add(contact)
+    session.flush()
+    index_item(session, "contacts", contact)
     session.commit()
     session.refresh(contact)
     return contact
 
-@router.put("/{contact_id}", response_model=PulseContact)
-def update_contact(user_id: int, contact_id: int, updated: PulseContact, session: Session = Depends(get_session)):
-    """Update a contact."""
+@router.post("/", response_model=PulseContact)
+async def create_contact(user_id: int, contact: PulseContact, db: Database = Depends(get_db)):
+    """Create a new global contact."""
+    return await db.run_sync(_create_contact, user_id, contact)
+
+def _update_contact(session: Session, user_id: int, contact_id: int, updated: PulseContact):
     contact = session.get(PulseContact, contact_id)
     if not contact or contact.user_id != user_id:
         raise HTTPException(status_code=404, detail="Contact not found")
     
+    old_token = contact.portal_token
     data = updated.dict(exclude_unset=True)
     for key, val in data.items():
         if key != "id": setattr(contact, key, val)
     
     session.add(contact)
+    index_item(session, "contacts", contact)
     session.commit()
+    forget_portal_token(old_token)
     session.refresh(contact)
     return contact
 
-@router.delete("/{contact_id}")
-def delete_contact(user_id: int, contact_id: int, session: Session = Depends(get_session)):
-    """Delete a contact."""
+@router.put("/{contact_id}", response_model=PulseContact)
+async def update_contact(user_id: int, contact_id: int, updated: PulseContact, db: Database = Depends(get_db)):
+    """Update a contact."""
+    return await db.run_sync(_update_contact, user_id, contact_id, updated)
+
+def _delete_contact(session: Session, user_id: int, contact_id: int):
     contact = session.get(PulseContact, contact_id)
     if not contact or contact.user_id != user_id:
         raise HTTPException(status_code=404, detail="Contact not found")
     
+    old_token = contact.portal_token
     session.delete(contact)
+    remove_item(session, "contacts", contact_id)
     session.commit()
+    forget_portal_token(old_token)
     return {"status": "deleted"}
+
+@router.delete("/{contact_id}")
+async def delete_contact(user_id: int, contact_id: int, db: Database = Depends(get_db)):
+    """Delete a contact."""
+    return await db.run_sync(_delete_contact, user_id, contact_id)
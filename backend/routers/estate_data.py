@@ -1,7 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlmodel import Session, select
-from typing import List, Any
-from backend.database import get_session
+from typing import List, Any, Optional
+from backend.database import get_db, Database
+from backend.pagination import paginate, wants_page
+from backend.bulk_import import BulkError, NATURAL_KEYS, import_rows, parse_rows
+from backend.estate_summary import forget_summary, get_summary
+from backend.search import KINDS as SEARCH_KINDS, index_item, reindex, remove_item
 from backend.estate_models import (
     Asset, FinancialAccount, Vendor, HomeAccess, Utility, 
     Document, Letter, JournalEntry, Subscription, CalendarEvent
@@ -23,17 +27,30 @@ MODEL_MAP = {
     "calendar_events": CalendarEvent
 }
 
-@router.get("/{data_type}")
-def get_items(data_type: str, user_id: int, session: Session = Depends(get_session)):
+@router.get("/summary")
+async def get_summary_route(user_id: int, db: Database = Depends(get_db)):
+    """
+    Counts, one key total and the latest (for calendar_events: next upcoming) items
+    of every type, for the dashboard: one query instead of a full fetch per type.
+    Declared before /{data_type}, which would otherwise take "summary" as a type.
+    """
+    return await db.run_sync(get_summary, user_id)
+
+def _get_items(session: Session, data_type: str, user_id: int, page_size: Optional[int], cursor: Optional[str]):
     model = MODEL_MAP.get(data_type)
     if not model:
         raise HTTPException(status_code=400, detail=f"Invalid type: {data_type}")
     
     statement = select(model).where(model.user_id == user_id)
+    if wants_page(page_size, cursor):
+        return paginate(session, statement, (model.id,), page_size, cursor)
     return session.exec(statement).all()
 
-@router.post("/{data_type}")
-def create_item(data_type: str, item: dict, user_id: int, session: Session = Depends(get_session)):
+@router.get("/{data_type}")
+async def get_items(data_type: str, user_id: int, page_size: Optional[int] = None, cursor: Optional[str] = None, db: Database = Depends(get_db)):
+    return await db.run_sync(_get_items, data_type, user_id, page_size, cursor)
+
+def _create_item(session: Session, data_type: str, item: dict, user_id: int):
     model = MODEL_MAP.get(data_type)
     if not model:
         raise HTTPException(status_code=400, detail=f"Invalid type: {data_type}")
@@ -44,15 +61,58 @@ def create_item(data_type: str, item: dict, user_id: int, session: Session = Dep
         # Create instance
         db_item = model.model_validate(item)
         session.add(db_item)
+        session.flush()
+        index_item(session, data_type, db_item)
         session.commit()
+        forget_summary(user_id)
         session.refresh(db_item)
         return db_item
     except Exception as e:
         print(f"Error creating {data_type}: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.put("/{data_type}/{item_id}")
-def update_item(data_type: str, item_id: int, updates: dict, user_id: int, session: Session = Depends(get_session)):
+@router.post("/{data_type}")
+async def create_item(data_type: str, item: dict, user_id: int, db: Database = Depends(get_db)):
+    return await db.run_sync(_create_item, data_type, item, user_id)
+
+@router.post("/{data_type}/bulk")
+async def bulk_create_items(data_type: str, request: Request, user_id: int, upsert: bool = False, key: Optional[str] = None, db: Database = Depends(get_db)):
+    """
+    Imports many items at once from a JSON array or NDJSON body. With upsert=true,
+    rows matching an existing item on the type's natural key (or the comma-separated
+    `key` columns) update it. Bad rows are listed in "errors" by index; the rest
+    are still written.
+    """
+    model = MODEL_MAP.get(data_type)
+    if not model:
+        raise HTTPException(status_code=400, detail=f"Invalid type: {data_type}")
+
+    upsert_key = None
+    if upsert or key:
+        upsert_key = tuple(k.strip() for k in key.split(",")) if key else NATURAL_KEYS.get(data_type)
+        unknown = [k for k in upsert_key if k not in model.__table__.c or k in ("id", "user_id")]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Invalid upsert key: {', '.join(unknown)}")
+
+    try:
+        rows = parse_rows(await request.body())
+    except (BulkError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    result = await db.run_sync(import_rows, model, user_id, rows, upsert_key)
+    if result["inserted"] or result["updated"]:
+        forget_summary(user_id)
+        if data_type in SEARCH_KINDS:
+            # The import writes rows in bulk without their ids: re-index the user's items of this type
+            await db.run_sync(_reindex_items, data_type, user_id)
+    print(f"📥 Bulk {data_type} for user {user_id}: {result['inserted']} inserted, {result['updated']} updated, {result['failed']} failed")
+    return result
+
+def _reindex_items(session: Session, data_type: str, user_id: int):
+    reindex(session, [data_type], user_id)
+    session.commit()
+
+def _update_item(session: Session, data_type: str, item_id: int, updates: dict, user_id: int):
     model = MODEL_MAP.get(data_type)
     if not model:
         raise HTTPException(status_code=400, detail="Invalid data type")
@@ -68,12 +128,17 @@ def update_item(data_type: str, item_id: int, updates: dict, user_id: int, sessi
              setattr(db_item, key, value)
              
     session.add(db_item)
+    index_item(session, data_type, db_item)
     session.commit()
+    forget_summary(user_id)
     session.refresh(db_item)
     return db_item
 
-@router.delete("/{data_type}/{item_id}")
-def delete_item(data_type: str, item_id: int, user_id: int, session: Session = Depends(get_session)):
+@router.put("/{data_type}/{item_id}")
+async def update_item(data_type: str, item_id: int, updates: dict, user_id: int, db: Database = Depends(get_db)):
+    return await db.run_sync(_update_item, data_type, item_id, updates, user_id)
+
+def _delete_item(session: Session, data_type: str, item_id: int, user_id: int):
     model = MODEL_MAP.get(data_type)
     if not model:
         raise HTTPException(status_code=400, detail="Invalid data type")
@@ -85,5 +150,11 @@ def delete_item(data_type: str, item_id: int, user_id: int, session: Session = D
         raise HTTPException(status_code=403, detail="Not authorized")
         
     session.delete(db_item)
+    remove_item(session, data_type, item_id)
     session.commit()
+    forget_summary(user_id)
     return {"status": "deleted"}
+
+@router.delete("/{data_type}/{item_id}")
+async def delete_item(data_type: str, item_id: int, user_id: int, db: Database = Depends(get_db)):
+    return await db.run_sync(_delete_item, data_type, item_id, user_id)
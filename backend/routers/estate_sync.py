@@ -0,0 +1,116 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlmodel import Session
+from typing import List, Optional
+from pydantic import BaseModel
+from backend.database import get_db, Database
+from backend.json_patch import PatchConflict, PatchError
+from backend.estate_sync import (
+    HASH_PATTERN, VAULT_CHUNK_MAX_BYTES, MissingChunks, VersionConflict,
+    apply_delta, missing_chunks, owns_chunk, register_chunk, register_chunks, validate_manifest, vault_manifest
+)
+from backend.vault_blobs import VAULT_MAX_BYTES, Chunks, TooLarge, manifest_response, store_stream
+
+# Delta saves for the estate document (see backend/estate_sync.py).
+# GET/POST /api/estate (whole document) stay in main.py.
+router = APIRouter(prefix="/api/estate", tags=["estate"])
+
+class EstateDelta(BaseModel):
+    base_version: int
+    transparent_patch: Optional[List[dict]] = None  # RFC 6902 JSON Patch
+    vault_manifest: Optional[List[str]] = None      # every chunk hash of the new vault, in order
+
+def _patch_estate(session: Session, delta: EstateDelta, user_id: int):
+    try:
+        version = apply_delta(session, user_id, delta.base_version, delta.transparent_patch, delta.vault_manifest)
+    except VersionConflict as e:
+        raise HTTPException(status_code=409, detail={"error": "version_conflict", "current_version": e.current_version})
+    except PatchConflict as e:
+        raise HTTPException(status_code=409, detail={"error": "patch_test_failed", "message": str(e)})
+    except MissingChunks as e:
+        raise HTTPException(status_code=422, detail={"error": "missing_chunks", "missing": e.missing})
+    except (PatchError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"status": "saved", "version": version}
+
+@router.patch("")
+async def patch_estate(delta: EstateDelta, user_id: int, db: Database = Depends(get_db)):
+    """
+    Delta save. Applies `transparent_patch` to transparent_data and/or replaces the
+    vault with the chunks named in `vault_manifest`, only if the estate is still at
+    `base_version`. 409 means another device saved first (refetch and rebase);
+    422 with "missing_chunks" lists chunks to upload before retrying.
+    """
+    return await db.run_sync(_patch_estate, delta, user_id)
+
+def _missing_chunks(session: Session, hashes: List[str], user_id: int):
+    try:
+        validate_manifest(hashes)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"missing": missing_chunks(session, user_id, hashes)}
+
+@router.post("/vault/chunks/missing")
+async def get_missing_chunks(hashes: List[str], user_id: int, db: Database = Depends(get_db)):
+    """Which of these chunk hashes the server doesn't have yet, i.e. what to upload."""
+    return await db.run_sync(_missing_chunks, hashes, user_id)
+
+def _check_upload_size(request: Request, limit: int):
+    if int(request.headers.get("content-length") or 0) > limit:
+        raise HTTPException(status_code=413, detail=f"Uploads here are limited to {limit} bytes")
+
+def _register_chunk(session: Session, chunk_hash: str, size: int, user_id: int):
+    return {"hash": chunk_hash, "stored": register_chunk(session, user_id, chunk_hash, size)}
+
+@router.put("/vault/chunks/{chunk_hash}")
+async def upload_chunk(chunk_hash: str, user_id: int, request: Request, db: Database = Depends(get_db)):
+    """Raw chunk bytes (application/octet-stream), streamed to the blob store. Idempotent: the hash is the chunk's identity."""
+    if not HASH_PATTERN.match(chunk_hash):
+        raise HTTPException(status_code=422, detail="Invalid chunk hash")
+    _check_upload_size(request, VAULT_CHUNK_MAX_BYTES)
+    try:
+        chunks = await store_stream(request.stream(), max_bytes=VAULT_CHUNK_MAX_BYTES)
+    except TooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    stored = chunks[0][0] if chunks else None
+    if stored != chunk_hash:
+        # Whatever was stored under the real hash is unreferenced and gets collected
+        raise HTTPException(status_code=422, detail="Chunk content does not match its hash")
+    return await db.run_sync(_register_chunk, chunk_hash, chunks[0][1], user_id)
+
+@router.get("/vault/chunks/{chunk_hash}")
+async def download_chunk(chunk_hash: str, user_id: int, request: Request, db: Database = Depends(get_db)):
+    """One chunk, streamed; supports Range. Content-addressed, so clients can cache it for good."""
+    if not HASH_PATTERN.match(chunk_hash) or not await db.run_sync(owns_chunk, user_id, chunk_hash):
+        raise HTTPException(status_code=404, detail="Chunk not found")
+    return manifest_response(request, [chunk_hash], etag=f'"{chunk_hash}"',
+                             cache_control="private, max-age=31536000, immutable")
+
+@router.get("/vault")
+async def download_vault(user_id: int, request: Request, db: Database = Depends(get_db)):
+    """
+    The whole encrypted vault, streamed from its chunks; supports Range (and If-Range)
+    to fetch a slice or resume a download. The ETag changes whenever the vault does.
+    """
+    manifest = await db.run_sync(vault_manifest, user_id)
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="Estate not found")
+    return manifest_response(request, manifest)
+
+def _save_vault(session: Session, chunks: Chunks, base_version: int, user_id: int):
+    register_chunks(session, user_id, chunks)
+    session.flush()
+    return _patch_estate(session, EstateDelta(base_version=base_version, vault_manifest=[h for h, _ in chunks]), user_id)
+
+@router.put("/vault")
+async def upload_vault(user_id: int, base_version: int, request: Request, db: Database = Depends(get_db)):
+    """
+    Replaces the whole encrypted vault with the raw request body, for clients that
+    don't chunk themselves. The body is streamed into chunks as it arrives; chunks
+    the server already has aren't stored again. Same version check as PATCH.
+    """
+    _check_upload_size(request, VAULT_MAX_BYTES)
+    try:
+        chunks = await store_stream(request.stream())
+    except TooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return await db.run_sync(_save_vault, chunks, base_version, user_id)
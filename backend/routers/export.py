@@ -0,0 +1,135 @@
+import base64
+import json
+import zlib
+from datetime import date, datetime
+from typing import Iterator, Optional, Tuple
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import tuple_
+from sqlmodel import Session, select
+from backend.database import engine, Estate, EstateVaultChunk
+from backend.routers.estate_data import MODEL_MAP
+from backend.pagination import encode_cursor, typed_keys
+from backend.pulse_models import PulseContact, PulseCheckin, PulseMessage, PulseVault
+from backend.blob_store import blob_store
+from backend.vault_blobs import load_manifest
+
+router = APIRouter(prefix="/api/export", tags=["export"])
+
+# Export order: (type, model, keyset columns). The keys follow the (user_id, ...) index
+# each table has, so every batch is an index seek however deep into the export it is.
+SECTIONS = [("estate", Estate, ("id",)), ("estate_vault_chunks", EstateVaultChunk, ("hash",))] + [(name, model, ("id",)) for name, model in MODEL_MAP.items()] + [
+    ("pulse_contacts", PulseContact, ("id",)),
+    ("pulse_checkins", PulseCheckin, ("timestamp", "id")),
+    ("pulse_messages", PulseMessage, ("sent_at", "id")),
+    ("pulse_vault", PulseVault, ("id",)),
+]
+SECTION_INDEX = {name: i for i, (name, _, _) in enumerate(SECTIONS)}
+# Rows whose bytes are in the blob store: each is followed by a {"type": "blob"} line per chunk
+BLOB_HASHES = {
+    "estate_vault_chunks": lambda row: [row.hash],
+    "pulse_vault": lambda row: load_manifest(row.content_manifest),
+}
+
+# Rows fetched per query (one checkpoint line per full batch) and bytes buffered per write
+FETCH_SIZE = 500
+CHUNK_BYTES = 64 * 1024
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        # Encrypted blobs (vault items, estate vault) are exported base64-encoded
+        return base64.b64encode(value).decode()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def _line(record: dict) -> bytes:
+    return (json.dumps(record, default=_json_default, separators=(",", ":")) + "\n").encode()
+
+def parse_resume(resume: Optional[str]) -> Tuple[int, Optional[list]]:
+    """`resume` is the token of the last "checkpoint" line the client received."""
+    if not resume:
+        return 0, None
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(resume + "=" * (-len(resume) % 4)))
+        index = SECTION_INDEX[raw[0]]
+        _, model, keys = SECTIONS[index]
+        if len(raw) != len(keys) + 1:
+            raise ValueError("wrong number of keys")
+        return index, typed_keys([model.__table__.c[k] for k in keys], raw[1:])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid resume token")
+
+def export_lines(user_id: int, start_section: int = 0, after: Optional[list] = None) -> Iterator[bytes]:
+    """
+    Yields the NDJSON export in ~64KB chunks. Opens its own session: the request's
+    session is closed by the time a StreamingResponse body is iterated.
+
+    Rows are read in keyset batches of FETCH_SIZE and the read transaction ends
+    before each batch is written out, so a slow client never holds a transaction
+    open (which on SQLite would block every writer until the export finished).
+    """
+    buffer = bytearray()
+    records = 0
+    buffer += _line({"type": "export", "version": 1, "user_id": user_id,
+                     "exported_at": datetime.utcnow(), "resumed": after is not None})
+
+    with Session(engine) as session:
+        for index in range(start_section, len(SECTIONS)):
+            name, model, keys = SECTIONS[index]
+            table = model.__table__
+            key_columns = [table.c[k] for k in keys]
+            position = after if index == start_section else None
+            while True:
+                # Plain rows rather than ORM objects: nothing here needs identity tracking
+                statement = select(table).where(table.c.user_id == user_id)
+                if position is not None:
+                    statement = statement.where(tuple_(*key_columns) > tuple_(*position))
+                rows = session.execute(statement.order_by(*key_columns).limit(FETCH_SIZE)).all()
+                session.rollback()
+
+                for row in rows:
+                    buffer += _line({"type": name, "id": row.id, "data": dict(row._mapping)})
+                    for blob_hash in BLOB_HASHES[name](row) if name in BLOB_HASHES else ():
+                        buffer += _line({"type": "blob", "hash": blob_hash, "data": b"".join(blob_store.read(blob_hash))})
+                        if len(buffer) >= CHUNK_BYTES:
+                            yield bytes(buffer)
+                            buffer.clear()
+                    if len(buffer) >= CHUNK_BYTES:
+                        yield bytes(buffer)
+                        buffer.clear()
+                records += len(rows)
+                if len(rows) < FETCH_SIZE:
+                    break
+                position = [getattr(rows[-1], k) for k in keys]
+                # Everything before this line is complete; resume=<token> continues right after it
+                buffer += _line({"type": "checkpoint", "resume": encode_cursor([name] + position)})
+
+    # Lets the client tell a complete export from a truncated one
+    buffer += _line({"type": "export_complete", "records": records})
+    yield bytes(buffer)
+
+def gzipped(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+@router.get("")
+def export_estate(user_id: int, gzip: bool = False, resume: Optional[str] = None):
+    """
+    Streams the user's whole estate as newline-delimited JSON: an "export" header
+    line, one {"type", "id", "data"} record per row (vault rows followed by a
+    {"type": "blob", "hash", "data"} line per chunk of their content), a
+    "checkpoint" line after each full batch and an "export_complete" trailer. To continue an interrupted export,
+    pass the last checkpoint's token as `resume` and drop records received after it.
+    """
+    start_section, after = parse_resume(resume)
+    body = export_lines(user_id, start_section, after)
+    headers = {"Content-Disposition": f'attachment; filename="continuum-export-{user_id}.ndjson"'}
+    if gzip:
+        body = gzipped(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type="application/x-ndjson", headers=headers)
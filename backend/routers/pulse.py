@@ -1,7 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlmodel import Session, select
 from datetime import datetime, timedelta
-from backend.database import get_session, User
+from typing import Optional
+from backend.database import get_db, Database, User
+from backend.pulse_logic import refresh_next_due
+from backend.checkin_writer import checkin_writer
+from backend.search import index_item, remove_item
+from backend.token_cache import (
+    get_portal_contact, resolve_checkin_token,
+    forget_portal_token, forget_checkin_token
+)
+from backend.pulse_state import get_state, bump_version
+from backend.etags import etag_for, conditional, stamp
+from backend.pagination import paginate, wants_page
+from backend.safety_timers import timer_engine
+from fastapi.concurrency import run_in_threadpool
+from backend.vault_blobs import TooLarge, dump_manifest, load_manifest, manifest_response, store_bytes, store_stream
 import secrets
 from backend.pulse_models import (
     PulseSettings, PulseCheckin, PulseVault, 
@@ -12,127 +26,185 @@ from backend.pulse_models import (
 router = APIRouter(prefix="/api/pulse", tags=["pulse"])
 
 @router.post("/checkin")
-def checkin(user_id: int, method: str = "manual", note: str = None, session: Session = Depends(get_session)):
-    checkin = PulseCheckin(user_id=user_id, method=method, note=note)
-    session.add(checkin)
-    session.commit()
-    return {"status": "success", "timestamp": checkin.timestamp}
+async def checkin(user_id: int, method: str = "manual", note: str = None, db: Database = Depends(get_db)):
+    timestamp = await checkin_writer.write_async(db, user_id, method, note)
+    return {"status": "success", "timestamp": timestamp}
 
-@router.get("/status")
-def get_status(user_id: int, session: Session = Depends(get_session)):
+def _get_status(session: Session, user_id: int, request: Request, response: Response):
     settings = session.get(PulseSettings, user_id)
     if not settings:
         return {"status": "not_configured"}
     if not settings.enabled:
         return {"status": "disabled"}
 
-    statement = select(PulseCheckin).where(PulseCheckin.user_id == user_id).order_by(PulseCheckin.timestamp.desc())
-    last_checkin = session.exec(statement).first()
+    state = get_state(session, user_id)
+    last_checkin_at = state.last_checkin_at if state else None
     
     # Calculate next expected (simplified)
     freq = settings.frequency_days or 2
-    next_time = (last_checkin.timestamp if last_checkin else datetime.utcnow()) + timedelta(days=freq)
+    next_time = (last_checkin_at or datetime.utcnow()) + timedelta(days=freq)
+    current = "active" if (last_checkin_at and last_checkin_at > datetime.utcnow() - timedelta(days=freq+1)) else "grace"
+    next_nudge = next_time.strftime("%Y-%m-%d %H:%M")
+
+    # "active"/"grace" and next_nudge also move with the clock, so they are part of the tag
+    etag = etag_for("status", user_id, state.settings_version if state else 0, state.state_version if state else 0, current, next_nudge)
+    not_modified = conditional(request, response, etag)
+    if not_modified:
+        return not_modified
     
     return {
-        "status": "active" if (last_checkin and last_checkin.timestamp > datetime.utcnow() - timedelta(days=freq+1)) else "grace",
-        "last_checkin": last_checkin.timestamp if last_checkin else None,
-        "next_nudge": next_time.strftime("%Y-%m-%d %H:%M")
+        "status": current,
+        "last_checkin": last_checkin_at,
+        "next_nudge": next_nudge
     }
 
-@router.get("/settings")
-def get_settings(user_id: int, session: Session = Depends(get_session)):
+@router.get("/status")
+async def get_status(user_id: int, request: Request, response: Response, db: Database = Depends(get_db)):
+    return await db.run_sync(_get_status, user_id, request, response)
+
+def _get_settings(session: Session, user_id: int, request: Request, response: Response):
+    state = get_state(session, user_id)
+    if state:
+        not_modified = conditional(request, response, etag_for("settings", user_id, state.settings_version))
+        if not_modified:
+            return not_modified
+
     settings = session.get(PulseSettings, user_id)
     if not settings:
         settings = PulseSettings(user_id=user_id, checkin_token=secrets.token_urlsafe(16))
         session.add(settings)
+        bump_version(session, user_id, "settings")
         session.commit()
+        session.refresh(settings)
     elif not settings.checkin_token:
         settings.checkin_token = secrets.token_urlsafe(16)
         session.add(settings)
+        bump_version(session, user_id, "settings")
         session.commit()
-    return settings
+        session.refresh(settings)
 
-@router.post("/settings")
-def update_settings(user_id: int, new_settings: PulseSettings, session: Session = Depends(get_session)):
+    state = get_state(session, user_id)
+    stamp(response, etag_for("settings", user_id, state.settings_version if state else 0))
+    # next_due_at is scheduler bookkeeping (changes on check-ins), not a setting
+    return settings.model_dump(exclude={"next_due_at"})
+
+@router.get("/settings")
+async def get_settings(user_id: int, request: Request, response: Response, db: Database = Depends(get_db)):
+    return await db.run_sync(_get_settings, user_id, request, response)
+
+def _update_settings(session: Session, user_id: int, new_settings: PulseSettings):
     settings = session.get(PulseSettings, user_id)
     if not settings:
         settings = PulseSettings(user_id=user_id)
         session.add(settings)
     
+    old_token = settings.checkin_token
     settings_data = new_settings.dict(exclude_unset=True)
     for key, value in settings_data.items():
         setattr(settings, key, value)
         
     session.add(settings)
+    session.flush()
+    refresh_next_due(session, user_id)
+    bump_version(session, user_id, "settings")
     session.commit()
+    if settings.checkin_token != old_token:
+        forget_checkin_token(old_token)
     return {"status": "updated"}
 
-@router.get("/history")
-def get_history(user_id: int, limit: int = 10, session: Session = Depends(get_session)):
+@router.post("/settings")
+async def update_settings(user_id: int, new_settings: PulseSettings, db: Database = Depends(get_db)):
+    return await db.run_sync(_update_settings, user_id, new_settings)
+
+def _get_history(session: Session, user_id: int, limit: int, page_size: Optional[int], cursor: Optional[str]):
+    if wants_page(page_size, cursor):
+        statement = select(PulseCheckin).where(PulseCheckin.user_id == user_id)
+        return paginate(session, statement, (PulseCheckin.timestamp, PulseCheckin.id), page_size, cursor, descending=True)
     statement = select(PulseCheckin).where(PulseCheckin.user_id == user_id).order_by(PulseCheckin.timestamp.desc()).limit(limit)
     return session.exec(statement).all()
 
-@router.get("/contacts")
-def get_contacts(user_id: int, session: Session = Depends(get_session)):
+@router.get("/history")
+async def get_history(user_id: int, limit: int = 10, page_size: Optional[int] = None, cursor: Optional[str] = None, db: Database = Depends(get_db)):
+    return await db.run_sync(_get_history, user_id, limit, page_size, cursor)
+
+def _get_contacts(session: Session, user_id: int, page_size: Optional[int], cursor: Optional[str]):
     statement = select(PulseContact).where(PulseContact.user_id == user_id)
+    if wants_page(page_size, cursor):
+        return paginate(session, statement, (PulseContact.id,), page_size, cursor)
     return session.exec(statement).all()
 
-@router.post("/contacts")
-def create_contact(user_id: int, contact: PulseContact, session: Session = Depends(get_session)):
+@router.get("/contacts")
+async def get_contacts(user_id: int, page_size: Optional[int] = None, cursor: Optional[str] = None, db: Database = Depends(get_db)):
+    return await db.run_sync(_get_contacts, user_id, page_size, cursor)
+
+def _create_contact(session: Session, user_id: int, contact: PulseContact):
     contact.user_id = user_id
     contact.portal_token = secrets.token_urlsafe(32) # Grant portal access immediately
     session.add(contact)
+    session.flush()
+    index_item(session, "contacts", contact)
     session.commit()
     session.refresh(contact)
     return contact
 
-@router.put("/contacts/{contact_id}")
-def update_contact(user_id: int, contact_id: int, updated: PulseContact, session: Session = Depends(get_session)):
+@router.post("/contacts")
+async def create_contact(user_id: int, contact: PulseContact, db: Database = Depends(get_db)):
+    return await db.run_sync(_create_contact, user_id, contact)
+
+def _update_contact(session: Session, user_id: int, contact_id: int, updated: PulseContact):
     contact = session.get(PulseContact, contact_id)
     if not contact or contact.user_id != user_id:
         raise HTTPException(status_code=404, detail="Contact not found")
     
+    old_token = contact.portal_token
     data = updated.dict(exclude_unset=True)
     for key, val in data.items():
         if key != "id": setattr(contact, key, val)
     
     session.add(contact)
+    index_item(session, "contacts", contact)
     session.commit()
+    forget_portal_token(old_token)
     return contact
 
-@router.delete("/contacts/{contact_id}")
-def delete_contact(user_id: int, contact_id: int, session: Session = Depends(get_session)):
+@router.put("/contacts/{contact_id}")
+async def update_contact(user_id: int, contact_id: int, updated: PulseContact, db: Database = Depends(get_db)):
+    return await db.run_sync(_update_contact, user_id, contact_id, updated)
+
+def _delete_contact(session: Session, user_id: int, contact_id: int):
     contact = session.get(PulseContact, contact_id)
     if not contact or contact.user_id != user_id:
         raise HTTPException(status_code=404, detail="Contact not found")
+    old_token = contact.portal_token
     session.delete(contact)
+    remove_item(session, "contacts", contact_id)
     session.commit()
+    forget_portal_token(old_token)
     return {"status": "deleted"}
 
+@router.delete("/contacts/{contact_id}")
+async def delete_contact(user_id: int, contact_id: int, db: Database = Depends(get_db)):
+    return await db.run_sync(_delete_contact, user_id, contact_id)
+
 # --- Guardian Portal (Public Access) ---
 
-@router.get("/portal/{token}")
-def get_portal_view(token: str, session: Session = Depends(get_session)):
+def _get_portal_view(session: Session, token: str):
     # 1. Verify Token
-    statement = select(PulseContact).where(PulseContact.portal_token == token)
-    contact = session.exec(statement).first()
+    contact = get_portal_contact(session, token)
     if not contact:
         raise HTTPException(status_code=404, detail="Invalid portal token")
         
     # 2. Get User Status
     user_id = contact.user_id
     user = session.get(User, user_id)
-    user_checkin_stmt = select(PulseCheckin).where(PulseCheckin.user_id == user_id).order_by(PulseCheckin.timestamp.desc())
-    last_checkin = session.exec(user_checkin_stmt).first()
-    
-    # Check active escalation for sensitive data
-    escalation_stmt = select(PulseEscalationLog).where(PulseEscalationLog.user_id == user_id).order_by(PulseEscalationLog.id.desc())
-    last_escalation = session.exec(escalation_stmt).first()
+    state = get_state(session, user_id)
+    last_checkin_at = state.last_checkin_at if state else None
     
+    # Check active escalation for sensitive data (current outage only; a check-in re-locks it)
     show_sensitive = False
-    if last_escalation:
+    if state and state.current_tier:
         tier = session.get(PulseEscalationTier, contact.tier_id)
-        if tier and last_escalation.tier_number >= tier.tier_number:
+        if tier and state.current_tier >= tier.tier_number:
             show_sensitive = True
 
     return {
@@ -140,8 +212,8 @@ def get_portal_view(token: str, session: Session = Depends(get_session)):
         "contact_id": contact.id,
         "contact_name": contact.name,
         "user_name": user.email.split('@')[0].capitalize() if user else "Estate Owner",
-        "user_status": "active" if (last_checkin and last_checkin.timestamp > datetime.utcnow() - timedelta(hours=48)) else "grace",
-        "last_checkin": last_checkin.timestamp if last_checkin else None,
+        "user_status": "active" if (last_checkin_at and last_checkin_at > datetime.utcnow() - timedelta(hours=48)) else "grace",
+        "last_checkin": last_checkin_at,
         "show_sensitive": show_sensitive,
         "sensitive_data": {
              "medical_proxy": "Active" if show_sensitive else "Locked",
@@ -149,28 +221,35 @@ def get_portal_view(token: str, session: Session = Depends(get_session)):
         }
     }
 
+@router.get("/portal/{token}")
+async def get_portal_view(token: str, db: Database = Depends(get_db)):
+    return await db.run_sync(_get_portal_view, token)
+
 @router.post("/respond/{token}")
-def guardian_respond(token: str, action: str, session: Session = Depends(get_session)):
-    contact = session.exec(select(PulseContact).where(PulseContact.portal_token == token)).first()
+async def guardian_respond(token: str, action: str, db: Database = Depends(get_db)):
+    contact = await db.run_sync(get_portal_contact, token)
     if not contact: raise HTTPException(status_code=404, detail="Invalid token")
         
     if action == "snooze":
-        checkin_rec = PulseCheckin(user_id=contact.user_id, method="guardian_snooze", note=f"Snoozed by {contact.name}")
-        session.add(checkin_rec)
-        session.commit()
+        await checkin_writer.write_async(db, contact.user_id, "guardian_snooze", f"Snoozed by {contact.name}")
         return {"status": "snoozed"}
     
     return {"status": "acknowledged"}
 
 # --- Messaging ---
 
-@router.get("/messages")
-def get_messages(user_id: int, session: Session = Depends(get_session)):
+def _get_messages(session: Session, user_id: int, page_size: Optional[int], cursor: Optional[str]):
+    if wants_page(page_size, cursor):
+        statement = select(PulseMessage).where(PulseMessage.user_id == user_id)
+        return paginate(session, statement, (PulseMessage.sent_at, PulseMessage.id), page_size, cursor, descending=True)
     statement = select(PulseMessage).where(PulseMessage.user_id == user_id).order_by(PulseMessage.sent_at.desc())
     return session.exec(statement).all()
 
-@router.post("/messages")
-def send_message(user_id: int, contact_id: int, message: str, session: Session = Depends(get_session)):
+@router.get("/messages")
+async def get_messages(user_id: int, page_size: Optional[int] = None, cursor: Optional[str] = None, db: Database = Depends(get_db)):
+    return await db.run_sync(_get_messages, user_id, page_size, cursor)
+
+def _send_message(session: Session, user_id: int, contact_id: int, message: str):
     contact = session.get(PulseContact, contact_id)
     if not contact or contact.user_id != user_id:
         raise HTTPException(status_code=404, detail="Contact not found")
@@ -180,35 +259,65 @@ def send_message(user_id: int, contact_id: int, message: str, session: Session =
     session.commit()
     return {"status": "sent"}
 
+@router.post("/messages")
+async def send_message(user_id: int, contact_id: int, message: str, db: Database = Depends(get_db)):
+    return await db.run_sync(_send_message, user_id, contact_id, message)
+
 # --- Vault & Instructions ---
 
-@router.get("/vault")
-def get_vault(user_id: int, session: Session = Depends(get_session)):
+def _get_vault(session: Session, user_id: int):
     return session.exec(select(PulseVault).where(PulseVault.user_id == user_id)).all()
 
-@router.post("/vault")
-def add_vault_item(item: PulseVault, session: Session = Depends(get_session)):
+@router.get("/vault")
+async def get_vault(user_id: int, db: Database = Depends(get_db)):
+    """Item metadata only: each item's content is at /vault/{item_id}/content."""
+    return await db.run_sync(_get_vault, user_id)
+
+async def _move_content_to_blobs(item: PulseVault):
+    # Content sent inline goes to the blob store like a streamed upload; the row keeps the manifest.
+    # Called by the handlers before db.run_sync: hashing and fsyncs stay off the event loop
+    content = item.encrypted_content
+    if isinstance(content, str):
+        content = content.encode()
+    if content:
+        chunks = await run_in_threadpool(store_bytes, content)
+        item.content_manifest = dump_manifest([h for h, _ in chunks])
+        item.content_size = len(content)
+        item.encrypted_content = b""
+
+def _add_vault_item(session: Session, item: PulseVault):
     session.add(item)
     session.commit()
     session.refresh(item)
     return item
 
-@router.delete("/vault/{item_id}")
-def delete_vault_item(item_id: int, user_id: int, session: Session = Depends(get_session)):
+@router.post("/vault")
+async def add_vault_item(item: PulseVault, db: Database = Depends(get_db)):
+    await _move_content_to_blobs(item)
+    return await db.run_sync(_add_vault_item, item)
+
+def _delete_vault_item(session: Session, item_id: int, user_id: int):
     item = session.get(PulseVault, item_id)
     if item and item.user_id == user_id:
         session.delete(item)
         session.commit()
     return {"status": "deleted"}
 
-@router.put("/vault/{item_id}")
-def update_vault_item(item_id: int, updated: PulseVault, user_id: int, session: Session = Depends(get_session)):
+@router.delete("/vault/{item_id}")
+async def delete_vault_item(item_id: int, user_id: int, db: Database = Depends(get_db)):
+    return await db.run_sync(_delete_vault_item, item_id, user_id)
+
+def _update_vault_item(session: Session, item_id: int, updated: PulseVault, user_id: int):
     item = session.get(PulseVault, item_id)
     if not item or item.user_id != user_id:
         raise HTTPException(status_code=404, detail="Item not found")
     
     item.name = updated.name
-    item.content = updated.content
+    if updated.content_manifest:
+        # New content, already in the blob store (update_vault_item)
+        item.content_manifest = updated.content_manifest
+        item.content_size = updated.content_size
+        item.encrypted_content = b""
     item.unlock_condition = updated.unlock_condition
     
     session.add(item)
@@ -216,8 +325,46 @@ def update_vault_item(item_id: int, updated: PulseVault, user_id: int, session:
     session.refresh(item)
     return item
 
-@router.post("/nudge")
-def send_nudge(contact_id: int, session: Session = Depends(get_session)):
+@router.put("/vault/{item_id}")
+async def update_vault_item(item_id: int, updated: PulseVault, user_id: int, db: Database = Depends(get_db)):
+    # Only content sent in this request may set the manifest, never one named in the body
+    updated.content_manifest, updated.content_size = None, 0
+    await _move_content_to_blobs(updated)
+    return await db.run_sync(_update_vault_item, item_id, updated, user_id)
+
+def _vault_item(session: Session, item_id: int, user_id: int) -> PulseVault:
+    item = session.get(PulseVault, item_id)
+    if not item or item.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return item
+
+def _set_vault_content(session: Session, item_id: int, manifest: str, size: int, user_id: int):
+    item = _vault_item(session, item_id, user_id)
+    item.content_manifest = manifest
+    item.content_size = size
+    item.encrypted_content = b""
+    session.add(item)
+    session.commit()
+    return {"status": "saved", "size": size}
+
+@router.put("/vault/{item_id}/content")
+async def upload_vault_content(item_id: int, user_id: int, request: Request, db: Database = Depends(get_db)):
+    """Replaces the item's encrypted content with the raw request body, streamed to the blob store."""
+    await db.run_sync(_vault_item, item_id, user_id)
+    try:
+        chunks = await store_stream(request.stream())
+    except TooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    manifest = dump_manifest([h for h, _ in chunks])
+    return await db.run_sync(_set_vault_content, item_id, manifest, sum(size for _, size in chunks), user_id)
+
+@router.get("/vault/{item_id}/content")
+async def download_vault_content(item_id: int, user_id: int, request: Request, db: Database = Depends(get_db)):
+    """The item's encrypted content, streamed; supports Range."""
+    item = await db.run_sync(_vault_item, item_id, user_id)
+    return manifest_response(request, load_manifest(item.content_manifest))
+
+def _send_nudge(session: Session, contact_id: int):
     # In a real app, this would trigger an email/SMS to the user
     # For now, we'll log it or perhaps create a system message
     contact = session.get(PulseContact, contact_id)
@@ -238,64 +385,85 @@ def send_nudge(contact_id: int, session: Session = Depends(get_session)):
     
     return {"status": "nudge_sent"}
 
+@router.post("/nudge")
+async def send_nudge(contact_id: int, db: Database = Depends(get_db)):
+    return await db.run_sync(_send_nudge, contact_id)
+
 @router.post("/confirm/{token}")
-def confirm_contact(token: str, session: Session = Depends(get_session)):
-    contact = session.exec(select(PulseContact).where(PulseContact.portal_token == token)).first()
+async def confirm_contact(token: str, db: Database = Depends(get_db)):
+    contact = await db.run_sync(get_portal_contact, token)
     if not contact:
         raise HTTPException(status_code=404, detail="Invalid token")
     
     # Resetting the user's safety timer or logging a 'spoken to' event
     # This effectively acts as a proxy check-in
-    checkin = PulseCheckin(
-        user_id=contact.user_id, 
-        method="guardian_confirmation", 
-        note=f"Confirmed by {contact.name}"
-    )
-    session.add(checkin)
-    session.commit()
+    await checkin_writer.write_async(db, contact.user_id, "guardian_confirmation", f"Confirmed by {contact.name}")
     
     return {"status": "confirmed"}
 
 # --- Safety & Monitoring ---
 
-@router.post("/safety/start")
-def start_safety_timer(user_id: int, minutes: int, purpose: str = "Walking home", session: Session = Depends(get_session)):
+def _start_safety_timer(session: Session, user_id: int, minutes: int, purpose: str):
     existing = session.exec(select(PulseSafetyTimer).where(PulseSafetyTimer.user_id == user_id, PulseSafetyTimer.is_active == True)).all()
     for t in existing: t.is_active = False; session.add(t)
         
     expires = datetime.utcnow() + timedelta(minutes=minutes)
     timer = PulseSafetyTimer(user_id=user_id, expires_at=expires, purpose=purpose)
     session.add(timer)
+    bump_version(session, user_id, "timers")
     session.commit()
+
+    for t in existing: timer_engine.cancel(t.id)
+    timer_engine.schedule(timer.id, timer.expires_at)
     return timer
 
-@router.get("/safety/status")
-def get_safety_status(user_id: int, session: Session = Depends(get_session)):
+@router.post("/safety/start")
+async def start_safety_timer(user_id: int, minutes: int, purpose: str = "Walking home", db: Database = Depends(get_db)):
+    return await db.run_sync(_start_safety_timer, user_id, minutes, purpose)
+
+def _get_safety_status(session: Session, user_id: int, request: Request, response: Response):
+    state = get_state(session, user_id)
+    not_modified = conditional(request, response, etag_for("safety", user_id, state.timers_version if state else 0))
+    if not_modified:
+        return not_modified
     return session.exec(select(PulseSafetyTimer).where(PulseSafetyTimer.user_id == user_id, PulseSafetyTimer.is_active == True)).first()
 
-@router.post("/safety/cancel")
-def cancel_safety_timer(user_id: int, session: Session = Depends(get_session)):
+@router.get("/safety/status")
+async def get_safety_status(user_id: int, request: Request, response: Response, db: Database = Depends(get_db)):
+    return await db.run_sync(_get_safety_status, user_id, request, response)
+
+def _cancel_safety_timer(session: Session, user_id: int):
     timer = session.exec(select(PulseSafetyTimer).where(PulseSafetyTimer.user_id == user_id, PulseSafetyTimer.is_active == True)).first()
     if timer:
         timer.is_active = False
         session.add(timer)
+        bump_version(session, user_id, "timers")
         session.commit()
+        timer_engine.cancel(timer.id)
     return {"status": "cancelled"}
 
+@router.post("/safety/cancel")
+async def cancel_safety_timer(user_id: int, db: Database = Depends(get_db)):
+    return await db.run_sync(_cancel_safety_timer, user_id)
+
 # --- Magic Link ---
 
 @router.get("/verify/{token}")
-def verify_checkin_token(token: str, session: Session = Depends(get_session)):
-    settings = session.exec(select(PulseSettings).where(PulseSettings.checkin_token == token)).first()
-    if not settings: raise HTTPException(status_code=404, detail="Invalid token")
+async def verify_checkin_token(token: str, db: Database = Depends(get_db)):
+    user_id = await db.run_sync(resolve_checkin_token, token)
+    if user_id is None: raise HTTPException(status_code=404, detail="Invalid token")
         
-    checkin_rec = PulseCheckin(user_id=settings.user_id, method="magic_link", note="One-Click Link")
-    session.add(checkin_rec)
-    session.commit()
-    return {"status": "success", "user_id": settings.user_id}
+    # Check-ins go through write_async so a group-commit wait never blocks the event loop
+    await checkin_writer.write_async(db, user_id, "magic_link", "One-Click Link")
+    return {"status": "success", "user_id": user_id}
+
+def _get_tiers(session: Session, user_id: int, request: Request, response: Response):
+    state = get_state(session, user_id)
+    if state:
+        not_modified = conditional(request, response, etag_for("tiers", user_id, state.tiers_version))
+        if not_modified:
+            return not_modified
 
-@router.get("/tiers")
-def get_tiers(user_id: int, session: Session = Depends(get_session)):
     tiers = session.exec(select(PulseEscalationTier).where(PulseEscalationTier.user_id == user_id).order_by(PulseEscalationTier.tier_number)).all()
     if not tiers:
         # Auto-initialize defaults
@@ -307,14 +475,22 @@ def get_tiers(user_id: int, session: Session = Depends(get_session)):
         ]
         for t in defaults:
             session.add(t)
+        session.flush()
+        refresh_next_due(session, user_id)
+        bump_version(session, user_id, "tiers")
         session.commit()
         # Refresh to get IDs
         tiers = session.exec(select(PulseEscalationTier).where(PulseEscalationTier.user_id == user_id).order_by(PulseEscalationTier.tier_number)).all()
-    
+
+    state = get_state(session, user_id)
+    stamp(response, etag_for("tiers", user_id, state.tiers_version if state else 0))
     return tiers
 
-@router.put("/tiers/{tier_id}")
-def update_tier(user_id: int, tier_id: int, updated: PulseEscalationTier, session: Session = Depends(get_session)):
+@router.get("/tiers")
+async def get_tiers(user_id: int, request: Request, response: Response, db: Database = Depends(get_db)):
+    return await db.run_sync(_get_tiers, user_id, request, response)
+
+def _update_tier(session: Session, user_id: int, tier_id: int, updated: PulseEscalationTier):
     tier = session.get(PulseEscalationTier, tier_id)
     if not tier or tier.user_id != user_id:
         raise HTTPException(status_code=404, detail="Tier not found")
@@ -323,17 +499,23 @@ def update_tier(user_id: int, tier_id: int, updated: PulseEscalationTier, sessio
     tier.notification_method = updated.notification_method
     
     session.add(tier)
+    session.flush()
+    refresh_next_due(session, user_id)
+    bump_version(session, user_id, "tiers")
     session.commit()
     return tier
 
+@router.put("/tiers/{tier_id}")
+async def update_tier(user_id: int, tier_id: int, updated: PulseEscalationTier, db: Database = Depends(get_db)):
+    return await db.run_sync(_update_tier, user_id, tier_id, updated)
+
 from backend.security import get_registration_options, verify_registration
 from backend.pulse_models import PulseCredential
 
 # Simple in-memory challenge store (Use Redis in production)
 PENDING_CHALLENGES = {} 
 
-@router.post("/auth/webauthn/register/start")
-def register_webauthn_start(user_id: int, session: Session = Depends(get_session)):
+def _register_webauthn_start(session: Session, user_id: int):
     user = session.get(User, user_id)
     if not user:
          # Fallback for dev mode if User table not populated or using fake ID
@@ -349,8 +531,11 @@ def register_webauthn_start(user_id: int, session: Session = Depends(get_session
     # Convert to JSON-compatible dict (webauthn helper does this but we ensure dict)
     return options.to_dict()
 
-@router.post("/auth/webauthn/register/finish")
-def register_webauthn_finish(user_id: int, payload: dict, session: Session = Depends(get_session)):
+@router.post("/auth/webauthn/register/start")
+async def register_webauthn_start(user_id: int, db: Database = Depends(get_db)):
+    return await db.run_sync(_register_webauthn_start, user_id)
+
+def _register_webauthn_finish(session: Session, user_id: int, payload: dict):
     challenge = PENDING_CHALLENGES.pop(str(user_id), None)
     if not challenge:
         raise HTTPException(status_code=400, detail="Challenge expired or not found")
@@ -388,3 +573,7 @@ def register_webauthn_finish(user_id: int, payload: dict, session: Session = Dep
     except Exception as e:
         print(f"WebAuthn Error: {e}")
         raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/auth/webauthn/register/finish")
+async def register_webauthn_finish(user_id: int, payload: dict, db: Database = Depends(get_db)):
+    return await db.run_sync(_register_webauthn_finish, user_id, payload)
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends, Query
+from typing import List, Optional
+from backend.database import get_db, Database
+from backend.search import search
+
+router = APIRouter(prefix="/api/search", tags=["search"])
+
+@router.get("")
+async def search_items(user_id: int, q: str, type: Optional[List[str]] = Query(None), page_size: Optional[int] = None,
+                       cursor: Optional[str] = None, db: Database = Depends(get_db)):
+    """
+    Searches the user's letters, journal entries, documents, vendors, assets and
+    contacts; `type` (repeatable) narrows it to some of them. Words match by stem
+    and the last one as a prefix; "quoted words" match as a phrase. Returns
+    {"items": [{type, id, title, snippet, score}], "next_cursor"}, best match
+    first, with matches in <mark> tags.
+    """
+    return await db.run_sync(search, user_id, q, type, page_size, cursor)
@@ -0,0 +1,162 @@
+"""
+In-process expiry engine for PulseSafetyTimer ("walking home" timers).
+
+Active timers live in a min-heap keyed on expires_at. A single thread sleeps until
+the earliest expiry (not a fixed tick), so a timer fires within milliseconds of its
+deadline. Insert is O(log n); cancel is O(1) and lazy: cancelled entries are skipped
+when they reach the top of the heap and compacted away when they pile up.
+
+Firing is a conditional UPDATE (still active -> inactive), so when several workers
+hold the same timer only one of them notifies contacts. Each worker also picks up
+timers started elsewhere by polling for active timers started since its last poll
+(with some overlap, for commits that land late and clocks that disagree).
+"""
+import heapq
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import update
+from sqlmodel import Session, select
+from backend.database import engine
+from backend.pulse_models import PulseSafetyTimer
+from backend.pulse_logic import notify_safety_contacts
+from backend.pulse_state import bump_version
+from backend.notification_dispatcher import dispatch_soon
+
+# How often to look for timers started by other workers (a range seek on started_at)
+SYNC_SECONDS = float(os.getenv("SAFETY_TIMER_SYNC_SECONDS", "15"))
+# Each poll reaches this far back before the previous one started; timers already held are skipped
+SYNC_OVERLAP_SECONDS = float(os.getenv("SAFETY_TIMER_SYNC_OVERLAP_SECONDS", "120"))
+FIRE_RETRY_SECONDS = 5
+
+class SafetyTimerEngine:
+    def __init__(self):
+        self._heap: List[Tuple[datetime, int]] = []
+        self._live: Dict[int, datetime] = {}  # timer_id -> expires_at, for active entries only
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._synced_from: Optional[datetime] = None  # when the last successful poll started
+        self._last_sync = datetime.min
+
+    def start(self):
+        """Loads every active timer once and starts the expiry thread."""
+        if self._running:
+            return
+        self._running = True
+        self.sync()
+        self._thread = threading.Thread(target=self._run, name="safety-timers", daemon=True)
+        self._thread.start()
+        print(f"⏱️ Safety Timer Engine Started ({len(self._live)} active)")
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def schedule(self, timer_id: int, expires_at: datetime):
+        with self._cond:
+            self._live[timer_id] = expires_at
+            heapq.heappush(self._heap, (expires_at, timer_id))
+            # Only wake the thread if this timer is now the earliest
+            if self._heap[0][1] == timer_id:
+                self._cond.notify()
+
+    def cancel(self, timer_id: int):
+        with self._cond:
+            if self._live.pop(timer_id, None) is not None and len(self._heap) > 2 * len(self._live) + 64:
+                self._heap = [(at, tid) for at, tid in self._heap if self._live.get(tid) == at]
+                heapq.heapify(self._heap)
+
+    def pending(self) -> int:
+        return len(self._live)
+
+    def sync(self):
+        """
+        Adds active timers started since the last poll that we don't hold yet (all
+        of them on the first call). Only this moves the watermark: a timer this
+        worker schedules itself says nothing about timers other workers started.
+        """
+        started = datetime.utcnow()
+        statement = select(PulseSafetyTimer.id, PulseSafetyTimer.expires_at).where(PulseSafetyTimer.is_active == True)
+        if self._synced_from is not None:
+            statement = statement.where(
+                PulseSafetyTimer.started_at >= self._synced_from - timedelta(seconds=SYNC_OVERLAP_SECONDS)
+            )
+        with Session(engine) as session:
+            rows = session.exec(statement).all()
+        for timer_id, expires_at in rows:
+            if timer_id not in self._live:
+                self.schedule(timer_id, expires_at)
+        self._synced_from = started
+        self._last_sync = datetime.utcnow()
+
+    def _next_due(self) -> Tuple[Optional[int], float]:
+        """Pops the earliest live timer if it has expired; otherwise returns how long to sleep."""
+        while self._heap:
+            expires_at, timer_id = self._heap[0]
+            if self._live.get(timer_id) != expires_at:
+                heapq.heappop(self._heap)  # cancelled or rescheduled
+                continue
+            delay = (expires_at - datetime.utcnow()).total_seconds()
+            if delay > 0:
+                return None, delay
+            heapq.heappop(self._heap)
+            del self._live[timer_id]
+            return timer_id, 0
+        return None, SYNC_SECONDS
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                timer_id, delay = self._next_due()
+                if timer_id is None:
+                    until_sync = SYNC_SECONDS - (datetime.utcnow() - self._last_sync).total_seconds()
+                    self._cond.wait(timeout=max(0, min(delay, until_sync)))
+
+            try:
+                if timer_id is not None:
+                    self._fire(timer_id)
+                elif (datetime.utcnow() - self._last_sync).total_seconds() >= SYNC_SECONDS:
+                    self.sync()
+            except Exception as e:
+                print(f"ERROR in safety timer engine: {e}")
+                if timer_id is not None:
+                    # Don't lose the timer over a transient DB error
+                    self.schedule(timer_id, datetime.utcnow() + timedelta(seconds=FIRE_RETRY_SECONDS))
+
+    def _fire(self, timer_id: int):
+        with Session(engine) as session:
+            claimed = session.execute(
+                update(PulseSafetyTimer)
+                .where(
+                    PulseSafetyTimer.id == timer_id,
+                    PulseSafetyTimer.is_active == True,
+                    PulseSafetyTimer.expires_at <= datetime.utcnow()
+                )
+                .values(is_active=False)
+            ).rowcount
+            if not claimed:
+                # Cancelled, or another worker already fired it
+                session.rollback()
+                return
+
+            timer = session.get(PulseSafetyTimer, timer_id)
+            print(f"⏱️ [SAFETY TIMER] Timer {timer_id} for User {timer.user_id} expired ({timer.purpose})")
+            notifications = notify_safety_contacts(session, timer)
+            bump_version(session, timer.user_id, "timers")
+            session.flush()
+            pending = [n.id for n in notifications if n.status == "pending"]
+            session.commit()
+
+        # Deliver these alerts right away instead of waiting for the next dispatcher
+        # tick, but on the dispatcher's pool: this thread goes straight back to the heap
+        dispatch_soon(pending)
+
+# Singleton instance
+timer_engine = SafetyTimerEngine()
@@ -0,0 +1,266 @@
+"""
+Full-text search over estate content: letters, journal entries, documents,
+vendors, assets and contacts.
+
+The index holds one row per item (its title and its searchable text) and is
+written in the same transaction as the item, by the routers that change them
+(estate_data, contacts, pulse). It can't be kept by database triggers: letters
+and journal entries are stored compressed (backend/compression.py), so their
+text only exists in Python.
+
+- SQLite: an FTS5 table with porter stemming, ranked by bm25 with titles
+  weighted above the rest, highlighted with highlight() and snippet().
+- Postgres: a table with a generated, weighted tsvector and a GIN index,
+  ranked by ts_rank_cd, highlighted with ts_headline.
+
+An item's index row id is item_id * 16 + its kind's code, so updating or
+removing it is a primary-key operation.
+
+    python -m backend.search rebuild [--user-id N] [--kind letters]
+"""
+import argparse
+import html
+import os
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy import Integer, bindparam, column, text
+from sqlmodel import Session, select
+from backend.estate_models import Asset, Document, JournalEntry, Letter, Vendor
+from backend.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor
+from backend.pulse_models import PulseContact
+
+# Postgres text search configuration; it's baked into the generated column, so
+# changing it takes a new migration
+SEARCH_LANGUAGE = os.getenv("SEARCH_LANGUAGE", "english")
+SEARCH_REBUILD_BATCH = int(os.getenv("SEARCH_REBUILD_BATCH", "500"))
+# Words of context around the matches in a snippet (SQLite)
+SNIPPET_TOKENS = 24
+
+# kind -> (model, code, title columns (the first non-empty one is the title), text columns)
+KINDS: Dict[str, Tuple] = {
+    "letters": (Letter, 1, ("title",), ("recipient_name", "content")),
+    "journal_entries": (JournalEntry, 2, ("title", "type"), ("content", "tags")),
+    "documents": (Document, 3, ("title", "name"), ("name", "category", "location_physical", "location", "notes")),
+    "vendors": (Vendor, 4, ("name",), ("category", "notes")),
+    "assets": (Asset, 5, ("name",), ("type", "notes")),
+    "contacts": (PulseContact, 6, ("name",), ("relation", "notes")),
+}
+KIND_BY_CODE = {code: kind for kind, (_, code, _, _) in KINDS.items()}
+KIND_CODES = 16
+
+# Highlight markers: private-use characters, so the text around them can be
+# HTML-escaped before they become <mark> tags
+MARK_OPEN, MARK_CLOSE = "\ue000", "\ue001"
+TERM_PATTERN = re.compile(r'"([^"]*)"|(\w+)')
+WORD_PATTERN = re.compile(r"\w+")
+# Stands in for a column in decode_cursor: search pages by offset, not keyset
+OFFSET_KEY = column("offset", Integer)
+
+def index_id(kind: str, item_id: int) -> int:
+    return item_id * KIND_CODES + KINDS[kind][1]
+
+def _dialect(session: Session) -> str:
+    return session.connection().dialect.name
+
+def _document(kind: str, item) -> Tuple[str, str]:
+    _, _, title_columns, text_columns = KINDS[kind]
+    values = lambda columns: [str(v) for v in (getattr(item, c, None) for c in columns) if v not in (None, "")]
+    title = next(iter(values(title_columns)), "")
+    body = "\n".join(values(text_columns))
+    strip = str.maketrans("", "", MARK_OPEN + MARK_CLOSE)
+    return title.translate(strip), body.translate(strip)
+
+# --- Schema ---
+
+def create_index(session: Session):
+    if _dialect(session) == "postgresql":
+        session.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS search_index (
+                id BIGINT PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                kind SMALLINT NOT NULL,
+                title TEXT NOT NULL DEFAULT '',
+                body TEXT NOT NULL DEFAULT '',
+                document tsvector GENERATED ALWAYS AS (
+                    setweight(to_tsvector('{SEARCH_LANGUAGE}', title), 'A') ||
+                    setweight(to_tsvector('{SEARCH_LANGUAGE}', body), 'B')
+                ) STORED
+            )
+        """))
+        session.execute(text("CREATE INDEX IF NOT EXISTS ix_search_index_document ON search_index USING GIN (document)"))
+        session.execute(text("CREATE INDEX IF NOT EXISTS ix_search_index_user_id ON search_index (user_id, kind)"))
+    else:
+        # owner ("u<user_id>") and kind ("k<code>") are indexed too, so a user's
+        # rows are found through the full-text index like any other term
+        session.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS search_index "
+            "USING fts5(title, body, owner, kind, tokenize = 'porter unicode61')"
+        ))
+
+# --- Incremental updates ---
+
+def index_item(session: Session, kind: str, item):
+    """Adds or replaces the item's index row. Call before committing the change (after a flush, for a new item)."""
+    if kind not in KINDS:
+        return
+    title, body = _document(kind, item)
+    params = {"id": index_id(kind, item.id), "user_id": item.user_id, "kind": KINDS[kind][1], "title": title, "body": body}
+    if _dialect(session) == "postgresql":
+        session.execute(text(
+            "INSERT INTO search_index (id, user_id, kind, title, body) VALUES (:id, :user_id, :kind, :title, :body) "
+            "ON CONFLICT (id) DO UPDATE SET title = excluded.title, body = excluded.body"
+        ), params)
+    else:
+        session.execute(text("DELETE FROM search_index WHERE rowid = :id"), params)
+        session.execute(text(
+            "INSERT INTO search_index (rowid, title, body, owner, kind) "
+            "VALUES (:id, :title, :body, 'u' || :user_id, 'k' || :kind)"
+        ), params)
+
+def remove_item(session: Session, kind: str, item_id: int):
+    if kind not in KINDS:
+        return
+    key = "id" if _dialect(session) == "postgresql" else "rowid"
+    session.execute(text(f"DELETE FROM search_index WHERE {key} = :id"), {"id": index_id(kind, item_id)})
+
+def reindex(session: Session, kinds: Optional[Iterable[str]] = None, user_id: Optional[int] = None) -> int:
+    """
+    Rewrites the index rows of `kinds` (default: all), for one user or everyone,
+    from the tables. Returns the number of items indexed; the caller commits.
+    """
+    kinds = [kind for kind in (kinds or KINDS) if kind in KINDS]
+    postgres = _dialect(session) == "postgresql"
+    indexed = 0
+    for kind in kinds:
+        model, code = KINDS[kind][0], KINDS[kind][1]
+        if postgres:
+            scope = " AND user_id = :user_id" if user_id is not None else ""
+            session.execute(text(f"DELETE FROM search_index WHERE kind = :code{scope}"), {"code": code, "user_id": user_id})
+        else:
+            terms = f"kind:k{code}" + (f" AND owner:u{int(user_id)}" if user_id is not None else "")
+            session.execute(text(
+                "DELETE FROM search_index WHERE rowid IN (SELECT rowid FROM search_index WHERE search_index MATCH :terms)"
+            ), {"terms": terms})
+
+        # In id order, a batch at a time: every batch is a seek, and only one is in memory
+        _, _, title_columns, text_columns = KINDS[kind]
+        columns = [getattr(model, c) for c in dict.fromkeys(("id", "user_id") + title_columns + text_columns)]
+        after = 0
+        while True:
+            statement = select(*columns).where(model.id > after)
+            if user_id is not None:
+                statement = statement.where(model.user_id == user_id)
+            items = session.exec(statement.order_by(model.id).limit(SEARCH_REBUILD_BATCH)).all()
+            if not items:
+                break
+            for item in items:
+                index_item(session, kind, item)
+            indexed += len(items)
+            after = items[-1].id
+    if not postgres and user_id is None:
+        # Merges the index's segments after a full rebuild
+        session.execute(text("INSERT INTO search_index (search_index) VALUES ('optimize')"))
+    return indexed
+
+# --- Queries ---
+
+def parse_query(query: str) -> List[Tuple[str, bool]]:
+    """The query's terms as (words, is_phrase): bare words, and "quoted phrases"."""
+    terms = []
+    for phrase, word in TERM_PATTERN.findall(query):
+        if phrase:
+            words = WORD_PATTERN.findall(phrase)
+            if words:
+                terms.append((" ".join(words), True))
+        else:
+            terms.append((word, False))
+    return terms
+
+def fts5_query(terms: List[Tuple[str, bool]], user_id: int, codes: List[int]) -> str:
+    # Every term is quoted, so nothing the user types is read as FTS5 syntax.
+    # The last bare word matches as a prefix: results keep up with typing
+    parts = [f'"{words}"' for words, _ in terms]
+    if not terms[-1][1]:
+        parts[-1] += "*"
+    match = f"owner:u{int(user_id)} AND {{title body}}: ({' AND '.join(parts)})"
+    if len(codes) < len(KINDS):
+        match += " AND kind:(" + " OR ".join(f"k{code}" for code in codes) + ")"
+    return match
+
+def _marked(value: Optional[str]) -> str:
+    return html.escape(value or "").replace(MARK_OPEN, "<mark>").replace(MARK_CLOSE, "</mark>")
+
+def search(session: Session, user_id: int, query: str, kinds: Optional[List[str]] = None,
+           page_size: Optional[int] = None, cursor: Optional[str] = None) -> dict:
+    """
+    One page of the user's items matching `query`, best first. Titles and
+    snippets come back HTML-escaped, with the matched words in <mark> tags.
+    """
+    unknown = [kind for kind in kinds or [] if kind not in KINDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Invalid type: {', '.join(unknown)}")
+    codes = sorted(KINDS[kind][1] for kind in (kinds or KINDS))
+    size = min(max(page_size or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+    # Ranked results have no stable key to seek from, so the cursor is an offset;
+    # a user's matches are few enough for that to stay cheap
+    offset = decode_cursor(cursor, (OFFSET_KEY,))[0] if cursor else 0
+    if not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    terms = parse_query(query)
+    if not terms:
+        return {"items": [], "next_cursor": None}
+
+    params = {"limit": size + 1, "offset": offset, "user_id": user_id}
+    if _dialect(session) == "postgresql":
+        marks = f"StartSel={MARK_OPEN}, StopSel={MARK_CLOSE}"
+        statement = text(f"""
+            SELECT id, kind,
+                   ts_headline('{SEARCH_LANGUAGE}', title, query, 'HighlightAll=true, {marks}') AS title,
+                   ts_headline('{SEARCH_LANGUAGE}', body, query, 'MaxFragments=2, {marks}') AS snippet,
+                   ts_rank_cd(document, query) AS score
+            FROM search_index, websearch_to_tsquery('{SEARCH_LANGUAGE}', :query) AS query
+            WHERE user_id = :user_id AND kind IN :codes AND document @@ query
+            ORDER BY score DESC, id LIMIT :limit OFFSET :offset
+        """).bindparams(bindparam("codes", expanding=True))
+        params.update(query=" ".join(f'"{words}"' if phrase else words for words, phrase in terms), codes=codes)
+    else:
+        # bm25 is lower for better matches; a title hit counts four times a body hit
+        statement = text(f"""
+            SELECT rowid AS id, kind,
+                   highlight(search_index, 0, :open, :close) AS title,
+                   snippet(search_index, 1, :open, :close, '…', {SNIPPET_TOKENS}) AS snippet,
+                   -bm25(search_index, 4.0, 1.0, 0.0, 0.0) AS score
+            FROM search_index WHERE search_index MATCH :match
+            ORDER BY bm25(search_index, 4.0, 1.0, 0.0, 0.0), rowid LIMIT :limit OFFSET :offset
+        """)
+        params.update(match=fts5_query(terms, user_id, codes), open=MARK_OPEN, close=MARK_CLOSE)
+
+    rows = session.execute(statement, params).all()
+    next_cursor = encode_cursor([offset + size]) if len(rows) > size else None
+    items = [
+        {
+            "type": KIND_BY_CODE[row.id % KIND_CODES], "id": row.id // KIND_CODES,
+            "title": _marked(row.title), "snippet": _marked(row.snippet), "score": float(row.score),
+        }
+        for row in rows[:size]
+    ]
+    return {"items": items, "next_cursor": next_cursor}
+
+def main():
+    from backend.database import engine
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--user-id", type=int)
+    parser.add_argument("--kind", action="append", choices=list(KINDS), help="repeatable; default: every kind")
+    args = parser.parse_args()
+    started = time.perf_counter()
+    with Session(engine) as session:
+        create_index(session)
+        indexed = reindex(session, args.kind, args.user_id)
+        session.commit()
+    print(f"🔎 Indexed {indexed} item(s) in {time.perf_counter() - started:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,6 @@
 import os
-from webauthn import (
-    generate_registration_options,
-    verify_registration_response,
-    generate_authentication_options,
-    verify_authentication_response,
-    options_to_json,
-)
-from webauthn.helpers.structs import (
-    AttestationConveyancePreference,
-    AuthenticatorSelectionCriteria,
-    AuthenticatorAttachment,
-    UserVerificationRequirement,
-    ResidentKeyRequirement,
-)
+# webauthn (and the cryptography stack under it) is imported inside each helper:
+# it costs ~150ms at startup and is only needed when someone registers or logs in
 
 RP_ID = os.getenv("RP_ID", "localhost")
 RP_NAME = "Continuum Estate"
@@ -20,6 +8,14 @@ ORIGIN = os.getenv("ORIGIN", "http://localhost:5173")
 
 def get_registration_options(user_id: str, email: str):
     """Generates options for WebAuthn registration (Passkey creation)."""
+    from webauthn import generate_registration_options
+    from webauthn.helpers.structs import (
+        AttestationConveyancePreference,
+        AuthenticatorSelectionCriteria,
+        AuthenticatorAttachment,
+        UserVerificationRequirement,
+        ResidentKeyRequirement,
+    )
     print(f"DEBUG: user_id type: {type(user_id)}")
     print(f"DEBUG: user_id value: {user_id}")
     return generate_registration_options(
@@ -37,6 +33,7 @@ def get_registration_options(user_id: str, email: str):
 
 def verify_registration(options: dict, response: dict):
     """Verifies the registration response from the client."""
+    from webauthn import verify_registration_response
     return verify_registration_response(
         credential=response,
         expected_challenge=options["challenge"],
@@ -47,6 +44,8 @@ def verify_registration(options: dict, response: dict):
 
 def get_authentication_options():
     """Generates options for WebAuthn authentication (Passkey login)."""
+    from webauthn import generate_authentication_options
+    from webauthn.helpers.structs import UserVerificationRequirement
     return generate_authentication_options(
         rp_id=RP_ID,
         user_verification=UserVerificationRequirement.REQUIRED,
@@ -54,6 +53,7 @@ def get_authentication_options():
 
 def verify_authentication(options: dict, response: dict, public_key: str, sign_count: int):
     """Verifies the authentication response (assertion) from the client."""
+    from webauthn import verify_authentication_response
     return verify_authentication_response(
         credential=response,
         expected_challenge=options["challenge"],
@@ -0,0 +1,96 @@
+"""
+Production profile for SQLite deployments, applied to every new connection.
+
+WAL journaling lets readers keep reading while one connection writes (with the
+default rollback journal, the minutely sweep and a dashboard poll lock each other
+out), and busy_timeout makes a writer wait for the lock instead of failing with
+"database is locked". Each pragma can be overridden through SQLITE_* variables.
+
+With SQLITE_SINGLE_WRITER on, connections in this process also take turns for the
+write lock here, before SQLite is involved: a request thread, the scheduler and
+the check-in writer queue on a Python lock instead of spinning in SQLite's busy
+handler. Reads never wait for it.
+"""
+import os
+import threading
+import time
+from sqlalchemy import event
+from backend import metrics
+
+JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")          # durable in WAL mode except on power loss
+MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))       # negative = KiB, i.e. 64MB per connection
+TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY")
+SINGLE_WRITER = os.getenv("SQLITE_SINGLE_WRITER", "false").lower() in ("1", "true", "yes")
+
+# Statements that never take the write lock; anything else (DML, DDL) is a write
+READ_ONLY_PREFIXES = ("SELECT", "PRAGMA", "EXPLAIN", "WITH")
+
+def is_sqlite_file(url: str) -> bool:
+    return url.startswith("sqlite") and ":memory:" not in url and url.split("://", 1)[-1] not in ("", "/")
+
+def _set_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA synchronous={SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size={CACHE_SIZE}")
+    cursor.execute(f"PRAGMA temp_store={TEMP_STORE}")
+    cursor.close()
+
+class WriteLock:
+    """
+    One writer at a time per process. A connection takes the lock before its first
+    write statement (when pysqlite issues BEGIN) and gives it back when that
+    transaction commits or rolls back.
+    """
+    def __init__(self, timeout_seconds: float):
+        self._lock = threading.Lock()
+        self.timeout_seconds = timeout_seconds
+
+    def acquire(self, info: dict):
+        if info.get("holds_write_lock") or info.get("write_lock_skipped"):
+            return
+        started = time.monotonic()
+        if self._lock.acquire(timeout=self.timeout_seconds):
+            info["holds_write_lock"] = True
+        else:
+            # Never deadlock (e.g. a thread writing on two connections at once):
+            # fall back to SQLite's own busy handling for the rest of this
+            # transaction, rather than waiting out the timeout on every write in it
+            info["write_lock_skipped"] = True
+            metrics.SQLITE_WRITE_LOCK_TIMEOUTS.inc()
+            print(f"⚠️ SQLite write lock not acquired after {self.timeout_seconds:.0f}s, writing without it")
+        metrics.SQLITE_WRITE_LOCK_WAIT.observe(time.monotonic() - started)
+
+    def release(self, info: dict):
+        info.pop("write_lock_skipped", None)
+        if info.pop("holds_write_lock", False):
+            self._lock.release()
+
+write_lock = WriteLock(BUSY_TIMEOUT_MS / 1000)
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if not statement.lstrip()[:7].upper().startswith(READ_ONLY_PREFIXES):
+        # conn.info lives on the pooled DBAPI connection, so it survives across Connection objects
+        write_lock.acquire(conn.info)
+
+def _end_transaction(conn):
+    # Fires just before COMMIT/ROLLBACK runs; a writer that slips in first waits in busy_timeout
+    write_lock.release(conn.info)
+
+def _checkin(dbapi_connection, connection_record):
+    # Safety net for a connection returned to the pool mid-transaction
+    write_lock.release(connection_record.info)
+
+def tune_sqlite(engine, single_writer: bool = SINGLE_WRITER):
+    """Installs the profile on a sync Engine (or an AsyncEngine's .sync_engine)."""
+    event.listen(engine, "connect", _set_pragmas)
+    if single_writer:
+        event.listen(engine, "before_cursor_execute", _before_execute)
+        event.listen(engine, "commit", _end_transaction)
+        event.listen(engine, "rollback", _end_transaction)
+        event.listen(engine, "checkin", _checkin)
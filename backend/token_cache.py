@@ -0,0 +1,65 @@
+"""
+Resolves the public tokens (Guardian Portal portal_token, magic-link checkin_token)
+through an in-process LRU in front of their unique indexes.
+
+The cache maps token -> (user_id, contact_id) for portal tokens and token -> user_id
+for check-in tokens. Writers in this process call forget_* after committing, so
+local invalidation is exact; other workers may keep serving a rotated or deleted
+token for at most TOKEN_CACHE_TTL_SECONDS. Callers that load the contact anyway use
+get_portal_contact, which re-checks the token on the row and is never stale.
+"""
+import os
+from typing import Optional, Tuple
+from sqlmodel import Session, select
+from backend.cache import TTLCache
+from backend.pulse_models import PulseContact, PulseSettings
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "60"))
+
+portal_tokens = TTLCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL_SECONDS)   # portal_token -> (user_id, contact_id)
+checkin_tokens = TTLCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL_SECONDS)  # checkin_token -> user_id
+
+def resolve_portal_token(session: Session, token: str) -> Optional[Tuple[int, int]]:
+    ids = portal_tokens.get(token)
+    if ids is None:
+        row = session.exec(
+            select(PulseContact.user_id, PulseContact.id).where(PulseContact.portal_token == token)
+        ).first()
+        if row is None:
+            return None
+        ids = (row[0], row[1])
+        portal_tokens.set(token, ids)
+    return ids
+
+def resolve_checkin_token(session: Session, token: str) -> Optional[int]:
+    user_id = checkin_tokens.get(token)
+    if user_id is None:
+        user_id = session.exec(
+            select(PulseSettings.user_id).where(PulseSettings.checkin_token == token)
+        ).first()
+        if user_id is None:
+            return None
+        checkin_tokens.set(token, user_id)
+    return user_id
+
+def get_portal_contact(session: Session, token: str) -> Optional[PulseContact]:
+    """The contact behind a portal token, loaded by primary key and verified against the row."""
+    ids = resolve_portal_token(session, token)
+    if ids is None:
+        return None
+    contact = session.get(PulseContact, ids[1])
+    if contact and contact.portal_token == token:
+        return contact
+
+    # Rotated or deleted by another worker since we cached it
+    portal_tokens.pop(token)
+    return session.exec(select(PulseContact).where(PulseContact.portal_token == token)).first()
+
+def forget_portal_token(token: Optional[str]):
+    """Call after a contact is updated or deleted, with its token as it was before the change."""
+    portal_tokens.pop(token)
+
+def forget_checkin_token(token: Optional[str]):
+    """Call after a user's checkin_token is rotated."""
+    checkin_tokens.pop(token)
@@ -0,0 +1,244 @@
+"""
+Vault contents in the blob store (backend/blob_store.py).
+
+The estate vault and every pulse vault item are stored as chunks of at most
+VAULT_CHUNK_MAX_BYTES, and the database keeps only each one's manifest: its
+chunk hashes, in order, as a JSON list. Identical chunks are stored once.
+
+- Uploads stream: the body is cut into chunks as it arrives (store_stream), so
+  a large upload never sits in memory whole.
+- Downloads stream the chunks back from memory-mapped files and honour a single
+  HTTP Range (manifest_response), so a client can fetch a slice or resume.
+- Blobs no manifest references any more are deleted by collect_garbage (a daily
+  scheduler job) once they are older than the grace period.
+
+    python -m backend.vault_blobs gc       # collect garbage now
+    python -m backend.vault_blobs stats    # stored vs referenced bytes
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session, select
+from backend.blob_store import BlobWriter, blob_store
+from backend.etags import if_none_match
+
+VAULT_CHUNK_MAX_BYTES = int(os.getenv("VAULT_CHUNK_MAX_BYTES", str(1024 * 1024)))
+VAULT_MAX_CHUNKS = int(os.getenv("VAULT_MAX_CHUNKS", "4096"))
+VAULT_MAX_BYTES = VAULT_CHUNK_MAX_BYTES * VAULT_MAX_CHUNKS
+# Unreferenced chunks younger than this survive: a client may be about to commit a manifest naming them
+CHUNK_GRACE_SECONDS = int(os.getenv("VAULT_CHUNK_GRACE_SECONDS", "3600"))
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# (hash, size) of each chunk, in order
+Chunks = List[Tuple[str, int]]
+
+class TooLarge(ValueError):
+    pass
+
+def dump_manifest(hashes: List[str]) -> str:
+    return json.dumps(hashes, separators=(",", ":"))
+
+def load_manifest(manifest: Optional[str]) -> List[str]:
+    return json.loads(manifest) if manifest else []
+
+def manifest_etag(hashes: List[str]) -> str:
+    # Content-addressed: the same chunk list is the same content
+    return '"' + hashlib.sha256("".join(hashes).encode()).hexdigest() + '"'
+
+# --- Upload ---
+
+class _Chunker:
+    """Cuts a byte stream into VAULT_CHUNK_MAX_BYTES blobs as it arrives."""
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.total = 0
+        self.chunks: Chunks = []
+        self._writer: Optional[BlobWriter] = None
+
+    def feed(self, data: bytes) -> List[BlobWriter]:
+        """Writes `data`; returns the chunks it filled, ready to commit."""
+        self.total += len(data)
+        if self.total > self.max_bytes:
+            raise TooLarge(f"Upload is over the {self.max_bytes} byte limit")
+        full = []
+        view = memoryview(data)
+        while view:
+            if self._writer is None:
+                self._writer = blob_store.writer()
+            take = min(len(view), VAULT_CHUNK_MAX_BYTES - self._writer.size)
+            self._writer.write(view[:take])
+            view = view[take:]
+            if self._writer.size == VAULT_CHUNK_MAX_BYTES:
+                full.append(self._writer)
+                self._writer = None
+        return full
+
+    def finish(self) -> Optional[BlobWriter]:
+        writer, self._writer = self._writer, None
+        return writer
+
+    def abort(self):
+        # Chunks already committed are collected as garbage if nothing claims them
+        if self._writer is not None:
+            self._writer.abort()
+            self._writer = None
+
+async def store_stream(stream: AsyncIterator[bytes], max_bytes: int = VAULT_MAX_BYTES) -> Chunks:
+    """Stores a request body as it arrives; returns its chunks."""
+    from starlette.concurrency import run_in_threadpool
+    chunker = _Chunker(max_bytes)
+    try:
+        async for data in stream:
+            for writer in chunker.feed(data):
+                # commit fsyncs: keep that off the event loop
+                chunker.chunks.append((await run_in_threadpool(writer.commit), writer.size))
+        last = chunker.finish()
+        if last is not None:
+            chunker.chunks.append((await run_in_threadpool(last.commit), last.size))
+    except BaseException:
+        chunker.abort()
+        raise
+    return chunker.chunks
+
+def store_bytes(data: bytes) -> Chunks:
+    """store_stream for content that is already in memory (inline JSON uploads, migrations)."""
+    chunker = _Chunker(VAULT_MAX_BYTES)
+    try:
+        for writer in chunker.feed(data):
+            chunker.chunks.append((writer.commit(), writer.size))
+        last = chunker.finish()
+        if last is not None:
+            chunker.chunks.append((last.commit(), last.size))
+    except BaseException:
+        chunker.abort()
+        raise
+    return chunker.chunks
+
+# --- Download ---
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    [start, end) for a single "bytes=" range, or None to send everything (no
+    header, or one this server doesn't honour, like several ranges at once).
+    Raises 416 for a range that starts past the end.
+    """
+    match = RANGE_PATTERN.match(header.strip()) if header else None
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        start, end = max(size - int(last), 0), size
+    else:
+        start = int(first)
+        end = size if last == "" else min(int(last) + 1, size)
+        if last != "" and int(last) < start:
+            return None
+    if start >= size:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+def stream_chunks(hashes: List[str], sizes: List[int], start: int, end: int) -> Iterator[bytes]:
+    """Bytes [start, end) of the chunks' concatenation, touching only the chunks that overlap it."""
+    offset = 0
+    for blob_hash, size in zip(hashes, sizes):
+        if offset >= end:
+            break
+        if offset + size > start:
+            yield from blob_store.read(blob_hash, max(start - offset, 0), min(end - offset, size))
+        offset += size
+
+def manifest_response(request: Request, hashes: List[str], etag: Optional[str] = None,
+                      cache_control: str = "private, no-cache") -> Response:
+    """Streams the content a manifest names, as a 200, a 206 for a Range, or a 304."""
+    etag = etag or manifest_etag(hashes)
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Accept-Ranges": "bytes"}
+    if if_none_match(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    sizes = [blob_store.size(h) for h in hashes]
+    if None in sizes:
+        print(f"❌ [VAULT] Chunk {hashes[sizes.index(None)]} is missing from the blob store")
+        raise HTTPException(status_code=500, detail="Vault content is incomplete")
+    total = sum(sizes)
+
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    # If-Range: the client's partial copy is of another version, so send it all
+    if if_range is None or if_range.strip() == etag:
+        byte_range = parse_range(request.headers.get("range"), total)
+    start, end = byte_range or (0, total)
+    headers["Content-Length"] = str(end - start)
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{total}"
+    return StreamingResponse(
+        stream_chunks(hashes, sizes, start, end), status_code=206 if byte_range else 200,
+        media_type="application/octet-stream", headers=headers
+    )
+
+# --- Garbage collection ---
+
+def live_hashes(session: Session) -> set:
+    from backend.database import EstateVaultChunk
+    from backend.pulse_models import PulseVault
+    # Estate manifests only name chunks in the per-user ledger, so the ledger covers them
+    live = set(session.exec(select(EstateVaultChunk.hash)).all())
+    for manifest in session.exec(select(PulseVault.content_manifest).where(PulseVault.content_manifest.is_not(None))):
+        live.update(load_manifest(manifest))
+    return live
+
+def collect_garbage(session: Session, grace_seconds: int = CHUNK_GRACE_SECONDS) -> int:
+    """Deletes blobs nothing references that are older than the grace period. Returns how many."""
+    cutoff = time.time() - grace_seconds
+    # Listed before the references are read: a blob stored after this point is spared anyway
+    candidates = [blob_hash for blob_hash, stored_at in blob_store.list() if stored_at < cutoff]
+    live = live_hashes(session)
+    session.rollback()
+    deleted = 0
+    for blob_hash in candidates:
+        if blob_hash in live:
+            continue
+        # An upload may have deduped onto this blob after it was listed, and its
+        # manifest committed after the live set was read: the refreshed time shows it
+        stored_at = blob_store.stored_at(blob_hash)
+        if stored_at is None or stored_at >= cutoff:
+            continue
+        blob_store.delete(blob_hash)
+        deleted += 1
+    blob_store.discard_stale_uploads(cutoff)
+    if deleted:
+        print(f"🧹 [VAULT] Deleted {deleted} unreferenced blob(s)")
+    return deleted
+
+def stats(session: Session) -> dict:
+    from sqlalchemy import func
+    from backend.database import EstateVaultChunk
+    from backend.pulse_models import PulseVault
+    stored = [blob_store.size(h) or 0 for h, _ in blob_store.list()]
+    referenced = (session.exec(select(func.coalesce(func.sum(EstateVaultChunk.size), 0))).one()
+                  + session.exec(select(func.coalesce(func.sum(PulseVault.content_size), 0))).one())
+    return {"blobs": len(stored), "stored_bytes": sum(stored), "referenced_bytes": referenced}
+
+def main():
+    from backend.database import engine
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["gc", "stats"])
+    parser.add_argument("--grace-seconds", type=int, default=CHUNK_GRACE_SECONDS)
+    args = parser.parse_args()
+    with Session(engine) as session:
+        if args.command == "gc":
+            print(f"🧹 {collect_garbage(session, args.grace_seconds)} blob(s) deleted")
+        else:
+            result = stats(session)
+            print(f"📦 {result['blobs']} blobs, {result['stored_bytes']} bytes stored for "
+                  f"{result['referenced_bytes']} bytes referenced")
+
+if __name__ == "__main__":
+    main()